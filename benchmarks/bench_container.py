@@ -0,0 +1,182 @@
+# encoding: utf-8
+"""
+Benchmarks for the daemon round trips made by Container's hot paths.
+
+Each operation runs against a dockorm.fake.FakeClient pre-populated with a
+number of unrelated containers, and reports median wall time, API calls and
+bytes the daemon would have sent.  Call and byte counts are deterministic, so
+they are compared against the recorded baseline to catch regressions.
+
+Usage:
+
+    python -m benchmarks.bench_container [--sizes 10,100] [--save-baseline]
+"""
+from __future__ import print_function, unicode_literals
+import argparse
+from collections import namedtuple, OrderedDict
+import json
+import os
+import sys
+import time
+
+from dockorm.container import Container
+from dockorm.fake import FakeClient
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+SIZES = (10, 100, 1000, 10000)
+REPEAT = 5
+
+# Allowed growth over the baseline before a result counts as a regression.
+BYTES_TOLERANCE = 1.1
+
+SLEEP = ['sleep', '2147483647']
+
+
+def noop(container):
+    pass
+
+
+def start(container):
+    container.run(SLEEP)
+
+
+def start_and_finish(container):
+    container.run(['sh', '-c', 'echo foo; echo bar'])
+    container.join()
+
+
+def remove(container):
+    container.purge(stop_first=False)
+
+
+def unfiltered(setup):
+    def wrapped(container):
+        container.filter_on_daemon = False
+        setup(container)
+    return wrapped
+
+
+Benchmark = namedtuple('Benchmark', ['setup', 'operation', 'teardown'])
+
+BENCHMARKS = OrderedDict([
+    ('run', Benchmark(noop, start, remove)),
+    ('instances', Benchmark(start, lambda c: c.instances(), remove)),
+    ('instances_unfiltered', Benchmark(
+        unfiltered(start), lambda c: c.instances(), remove,
+    )),
+    ('running', Benchmark(start, lambda c: c.running(), remove)),
+    ('purge', Benchmark(start, lambda c: c.purge(), noop)),
+    ('logs', Benchmark(
+        start_and_finish, lambda c: c.logs(all=True), remove,
+    )),
+])
+
+
+def make_host(size):
+    """
+    Return a FakeClient with `size` unrelated containers, half of them
+    running.
+    """
+    client = FakeClient()
+    client.populate(size // 2, running=True)
+    client.populate(size - size // 2)
+    return client
+
+
+def measure(benchmark, size, repeat=REPEAT):
+    """
+    Run one benchmark, returning its median time, calls and bytes.
+    """
+    client = make_host(size)
+    times = []
+    for _ in range(repeat):
+        container = Container(image='busybox', tag='latest', name='bench')
+        container.client = client
+        benchmark.setup(container)
+        client.reset_calls()
+        start_time = time.time()
+        benchmark.operation(container)
+        times.append(time.time() - start_time)
+        calls = sum(client.calls.values())
+        received = sum(client.received.values())
+        benchmark.teardown(container)
+    times.sort()
+    return OrderedDict([
+        ('seconds', times[len(times) // 2]),
+        ('calls', calls),
+        ('bytes', received),
+    ])
+
+
+def run_all(sizes):
+    results = OrderedDict()
+    for name, benchmark in BENCHMARKS.items():
+        for size in sizes:
+            results['%s[%d]' % (name, size)] = measure(benchmark, size)
+    return results
+
+
+def regressions(results, baseline):
+    """
+    Return a list of descriptions of results that are worse than baseline.
+
+    Call counts must not grow at all; byte counts may grow by
+    BYTES_TOLERANCE.  Wall time is reported but never fails, since it
+    depends on the machine.
+    """
+    out = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if result['calls'] > expected['calls']:
+            out.append('%s: %d calls (baseline %d)' % (
+                key, result['calls'], expected['calls'],
+            ))
+        if result['bytes'] > expected['bytes'] * BYTES_TOLERANCE:
+            out.append('%s: %d bytes (baseline %d)' % (
+                key, result['bytes'], expected['bytes'],
+            ))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--sizes',
+        default=','.join(str(s) for s in SIZES),
+        help='Comma-separated numbers of containers on the host.',
+    )
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='Record these results as the new baseline.',
+    )
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    results = run_all(sizes)
+    print('%-28s %12s %8s %12s' % ('benchmark', 'seconds', 'calls', 'bytes'))
+    for key, result in results.items():
+        print('%-28s %12.6f %8d %12d' % (
+            key, result['seconds'], result['calls'], result['bytes'],
+        ))
+
+    if args.save_baseline:
+        with open(BASELINE, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        return 0
+
+    if not os.path.exists(BASELINE):
+        return 0
+    with open(BASELINE) as f:
+        found = regressions(results, json.load(f))
+    for line in found:
+        print('REGRESSION ' + line, file=sys.stderr)
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
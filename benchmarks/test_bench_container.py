@@ -0,0 +1,18 @@
+# encoding: utf-8
+"""
+Check the benchmark hot paths against the recorded baseline.
+"""
+from __future__ import unicode_literals
+import json
+
+from .bench_container import (
+    BASELINE,
+    regressions,
+    run_all,
+)
+
+
+def test_no_regressions():
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+    assert regressions(run_all([10, 100]), baseline) == []
@@ -1,3 +1,22 @@
+import sys
+
 from .container import Container
+from .fleet import Fleet
+from .group import (
+    ContainerGroup,
+    wait_all,
+    wait_any,
+    wait_ready_all,
+)
+from .pool import ContainerPool
+from .stats import StatsAggregator
+
+__all__ = [
+    'Container', 'ContainerGroup', 'ContainerPool', 'Fleet',
+    'StatsAggregator', 'wait_all', 'wait_any', 'wait_ready_all',
+]
 
-__all__ = ['Container']
+# AsyncContainer uses asyncio.get_running_loop, new in Python 3.7.
+if sys.version_info >= (3, 7):
+    from .aio import AsyncContainer  # noqa
+    __all__.append('AsyncContainer')
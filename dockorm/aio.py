@@ -0,0 +1,233 @@
+# encoding: utf-8
+"""
+AsyncContainer class.
+
+Requires Python 3.7 or later.
+"""
+from __future__ import unicode_literals
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+
+from traitlets import (
+    Float,
+    HasTraits,
+    Instance,
+    Integer,
+)
+
+from .attach import (
+    _binary,
+    FrameReader,
+)
+from .container import Container
+
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor(max_workers=32):
+    """
+    Return the executor shared by all AsyncContainers.
+
+    `max_workers` only has an effect on the first call.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers)
+        return _executor
+
+
+async def _feed_stdin(loop, attachment, stdin):
+    try:
+        if isinstance(stdin, bytes):
+            await loop.sock_sendall(attachment._sock, stdin)
+        else:
+            while True:
+                data = await stdin.read(attachment.bufsize)
+                if not data:
+                    break
+                await loop.sock_sendall(attachment._sock, data)
+    except OSError:
+        pass
+    finally:
+        attachment.close_stdin()
+
+
+async def pump_attachment(attachment, stdin=None, stdout=None, stderr=None):
+    """
+    The asyncio counterpart of `Attachment.pump`.
+
+    Reads and writes the attach socket from the event loop without tying up
+    a thread.  `stdin` may be bytes, or a stream with a coroutine
+    `read(n)` method such as asyncio.StreamReader.  Output is written to
+    the (blocking) file objects `stdout` and `stderr`; stderr defaults to
+    stdout.
+    """
+    loop = asyncio.get_running_loop()
+    attachment._sock.setblocking(False)
+    feeder = None
+    if stdin is not None:
+        feeder = asyncio.ensure_future(
+            _feed_stdin(loop, attachment, stdin)
+        )
+    else:
+        attachment.close_stdin()
+    if stderr is None:
+        stderr = stdout
+    targets = {
+        'stdout': stdout and _binary(stdout),
+        'stderr': stderr and _binary(stderr),
+    }
+    reader = FrameReader(attachment.tty, attachment.bufsize)
+    try:
+        while True:
+            n = await loop.sock_recv_into(attachment._sock, reader.target())
+            if not n:
+                break
+            out = reader.filled(n)
+            if out is None:
+                continue
+            target = targets.get(out[0])
+            if target is not None:
+                target.write(out[1])
+                target.flush()
+    finally:
+        if feeder is not None and not feeder.done():
+            feeder.cancel()
+        attachment.close()
+
+
+class AsyncContainer(HasTraits):
+    """
+    Awaitable versions of the daemon operations of a Container.
+
+    The Container is wrapped rather than extended, so it keeps its blocking
+    methods and can still be handed to code such as ContainerGroup.
+    Blocking docker calls are made on a shared, bounded executor; waiting in
+    `join` polls from the event loop instead of holding an executor thread
+    for the lifetime of the container.
+    """
+
+    container = Instance(Container)
+
+    def __init__(self, container, **kwargs):
+        super(AsyncContainer, self).__init__(container=container, **kwargs)
+
+    def __str__(self):
+        return (
+            "AsyncContainer(name={c.name!r}, "
+            "image={c.image!r})".format(c=self.container)
+        )
+
+    max_workers = Integer(
+        default_value=32,
+        config=True,
+        help="Size of the executor shared by all AsyncContainers.",
+    )
+
+    join_poll_interval = Float(
+        default_value=0.05,
+        config=True,
+        help="Initial interval in seconds between checks in join().",
+    )
+
+    join_poll_max_interval = Float(
+        default_value=2.0,
+        config=True,
+        help="Maximum interval in seconds between checks in join().",
+    )
+
+    async def _call(self, method, *args, **kwargs):
+        func = partial(getattr(self.container, method), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(
+            get_executor(self.max_workers), func,
+        )
+
+    async def build(self, tag=None, rm=True):
+        """
+        Build the container, returning the raw build output.
+        """
+        return await self._call('build', tag=tag, display=False, rm=rm)
+
+    async def run(self, command=None, tag=None, attach=False, rm=False,
+                  stdin=None, stdout=None, stderr=None):
+        """
+        Run this container.
+
+        If `attach` is True, copy `stdin` (bytes or a StreamReader) to the
+        instance and its output to `stdout` and `stderr` from the event loop
+        until it exits, then remove it if `rm` is True.  See
+        `pump_attachment`.
+        """
+        if not attach:
+            return await self._call('run', command=command, tag=tag, rm=rm)
+        container = await self._call(
+            'create', command=command, tag=tag, attach=True,
+        )
+        attachment = await self._call('attach', container['Id'], tty=True)
+        await self._call_client('start', container)
+        await pump_attachment(attachment, stdin, stdout, stderr)
+        if rm:
+            await self._call_client('wait', container)
+            await self._call_client('remove_container', container)
+        return attachment
+
+    async def _call_client(self, method, *args, **kwargs):
+        func = partial(
+            getattr(self.container.client, method), *args, **kwargs
+        )
+        return await asyncio.get_running_loop().run_in_executor(
+            get_executor(self.max_workers), func,
+        )
+
+    async def instances(self, all=True, status=None, label=None):
+        return await self._call(
+            'instances', all=all, status=status, label=label,
+        )
+
+    async def running(self):
+        return await self._call('running')
+
+    async def stop(self):
+        return await self._call('stop')
+
+    async def purge(self, stop_first=True, remove_volumes=False):
+        return await self._call(
+            'purge', stop_first=stop_first, remove_volumes=remove_volumes,
+        )
+
+    async def inspect(self, tag=None):
+        return await self._call('inspect', tag=tag)
+
+    async def images(self):
+        return await self._call('images')
+
+    async def remove_images(self):
+        return await self._call('remove_images')
+
+    async def logs(self, all=False):
+        return await self._call('logs', all=all)
+
+    async def join(self, timeout=None):
+        """
+        Wait until there are no instances of this container running.
+
+        Polls with exponential backoff rather than blocking a thread on the
+        daemon's wait endpoint.  Raises asyncio.TimeoutError if `timeout`
+        seconds pass first.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        interval = self.join_poll_interval
+        while await self.running() is not None:
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                interval = min(interval, remaining)
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.join_poll_max_interval)
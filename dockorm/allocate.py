@@ -0,0 +1,231 @@
+# encoding: utf-8
+"""
+Spreading containers over a host's CPUs and NUMA nodes.
+
+    topology = Topology.local()
+    allocations = spread(group.containers, topology)
+
+gives each Container its own `cpuset_cpus`, packed onto a single NUMA node
+where possible, with `cpuset_mems` set to match.
+"""
+from __future__ import division, unicode_literals
+from collections import namedtuple, OrderedDict
+from glob import glob
+import math
+import multiprocessing
+import os
+import re
+from threading import Lock
+
+from six import iteritems
+
+
+def parse_cpuset(text):
+    """
+    Parse a cpuset list such as '0-3,8' into a sorted list of ints.
+    """
+    out = set()
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition('-')
+        if sep:
+            out.update(range(int(start), int(end) + 1))
+        else:
+            out.add(int(start))
+    return sorted(out)
+
+
+def format_cpuset(cpus):
+    """
+    Format an iterable of ints as a cpuset list such as '0-3,8'.
+    """
+    cpus = sorted(set(cpus))
+    ranges = []
+    for cpu in cpus:
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(
+        str(a) if a == b else '%d-%d' % (a, b) for a, b in ranges
+    )
+
+
+class Allocation(namedtuple('Allocation', ['cpus', 'nodes'])):
+    """
+    A set of CPUs, and the NUMA nodes they belong to.
+    """
+    __slots__ = ()
+
+    @property
+    def cpuset_cpus(self):
+        return format_cpuset(self.cpus)
+
+    @property
+    def cpuset_mems(self):
+        return format_cpuset(self.nodes)
+
+    def resources(self):
+        """
+        The Container resource traits for this allocation.
+        """
+        return {
+            'cpuset_cpus': self.cpuset_cpus,
+            'cpuset_mems': self.cpuset_mems,
+        }
+
+
+class Topology(object):
+    """
+    The CPUs of each NUMA node on a host.
+    """
+
+    def __init__(self, nodes):
+        self.nodes = OrderedDict(
+            (node, sorted(cpus)) for node, cpus in sorted(iteritems(nodes))
+        )
+
+    def __repr__(self):
+        return 'Topology({})'.format(', '.join(
+            '{}: {}'.format(node, format_cpuset(cpus))
+            for node, cpus in iteritems(self.nodes)
+        ))
+
+    @property
+    def cpus(self):
+        return sorted(cpu for cpus in self.nodes.values() for cpu in cpus)
+
+    @classmethod
+    def local(cls, sysfs='/sys/devices/system/node'):
+        """
+        Read the topology of this machine, falling back to a single node if
+        NUMA information is not available.
+
+        Only meaningful when the docker daemon runs on this machine.
+        """
+        nodes = {}
+        for path in glob(os.path.join(sysfs, 'node[0-9]*', 'cpulist')):
+            match = re.search(r'node(\d+)', path)
+            with open(path) as f:
+                cpus = parse_cpuset(f.read())
+            if cpus:
+                nodes[int(match.group(1))] = cpus
+        if not nodes:
+            nodes = {0: list(range(multiprocessing.cpu_count()))}
+        return cls(nodes)
+
+    @classmethod
+    def from_client(cls, client):
+        """
+        A single-node topology with as many CPUs as the daemon reports.
+
+        The daemon does not report NUMA layout, so use `local` or construct
+        a Topology directly when that matters.
+        """
+        return cls({0: list(range(client.info()['NCPU']))})
+
+
+class CPUAllocator(object):
+    """
+    Hands out disjoint sets of CPUs from a Topology.
+
+    Each request is served from the single NUMA node with the most free
+    CPUs if any node can hold it, and otherwise spans the fewest nodes.
+    """
+
+    def __init__(self, topology):
+        self.topology = topology
+        self._lock = Lock()
+        self._free = OrderedDict(
+            (node, list(cpus)) for node, cpus in iteritems(topology.nodes)
+        )
+
+    def free(self):
+        with self._lock:
+            return sum(len(cpus) for cpus in self._free.values())
+
+    def allocate(self, count):
+        """
+        Reserve `count` CPUs, returning an Allocation.  Raises ValueError if
+        too few CPUs are free.
+        """
+        if count < 1:
+            raise ValueError("Must allocate at least one CPU.")
+        with self._lock:
+            if sum(len(cpus) for cpus in self._free.values()) < count:
+                raise ValueError(
+                    "Cannot allocate %d CPUs from %s" % (count, self.topology)
+                )
+            by_space = sorted(
+                self._free, key=lambda node: (-len(self._free[node]), node),
+            )
+            if len(self._free[by_space[0]]) >= count:
+                order = by_space[:1]
+            else:
+                order = by_space
+            cpus, nodes = [], []
+            for node in order:
+                if len(cpus) == count:
+                    break
+                take = self._free[node][:count - len(cpus)]
+                self._free[node] = self._free[node][len(take):]
+                cpus.extend(take)
+                nodes.append(node)
+            return Allocation(tuple(sorted(cpus)), tuple(sorted(nodes)))
+
+    def release(self, allocation):
+        with self._lock:
+            for node, cpus in iteritems(self.topology.nodes):
+                mine = set(allocation.cpus) & set(cpus)
+                if mine:
+                    self._free[node] = sorted(set(self._free[node]) | mine)
+
+
+def cpu_demand(container, default):
+    """
+    The number of CPUs a Container needs: its `nano_cpus` rounded up, or
+    `default`.
+    """
+    if container.nano_cpus:
+        return int(math.ceil(container.nano_cpus / 1e9))
+    return default
+
+
+def spread(containers, topology, cpus=None, apply=True):
+    """
+    Give each of `containers` a disjoint set of CPUs.
+
+    Each container gets `cpus` CPUs, or as many as its `nano_cpus` limit
+    needs, or an equal share of the host.  Larger requests are placed first.
+    If `apply` is True, the containers' `cpuset_cpus` and `cpuset_mems`
+    traits are set.  Returns an OrderedDict mapping each Container to its
+    Allocation, in input order.
+    """
+    containers = list(containers)
+    if not containers:
+        return OrderedDict()
+    share = max(len(topology.cpus) // len(containers), 1)
+    demands = OrderedDict(
+        (c, cpus or cpu_demand(c, share)) for c in containers
+    )
+    allocator = CPUAllocator(topology)
+    placed = {}
+    for container in sorted(containers, key=lambda c: -demands[c]):
+        placed[container] = allocator.allocate(demands[container])
+    out = OrderedDict((c, placed[c]) for c in containers)
+    if apply:
+        for container, allocation in iteritems(out):
+            container.cpuset_cpus = allocation.cpuset_cpus
+            container.cpuset_mems = allocation.cpuset_mems
+    return out
+
+
+def spread_replicas(count, cpus, topology):
+    """
+    Return `count` disjoint Allocations of `cpus` CPUs each, for passing to
+    `Container.run(replicas=count, allocations=...)` or `Container.scale`.
+    """
+    allocator = CPUAllocator(topology)
+    return [allocator.allocate(cpus) for _ in range(count)]
@@ -0,0 +1,222 @@
+# encoding: utf-8
+"""
+In-process attach to a container's stdio over the daemon's hijacked attach
+socket.
+"""
+from __future__ import unicode_literals
+import socket
+from threading import Thread
+
+from .logs import (
+    _HEADER,
+    _STREAMS,
+    STDOUT,
+)
+
+
+DEFAULT_BUFSIZE = 64 * 1024
+
+
+def _raw_socket(sock):
+    """
+    Unwrap the socket returned by docker-py's attach_socket, which may be a
+    SocketIO or SSL wrapper around the real socket.
+    """
+    return getattr(sock, '_sock', sock)
+
+
+def _binary(fileobj):
+    return getattr(fileobj, 'buffer', fileobj)
+
+
+class FrameReader(object):
+    """
+    Incrementally demultiplex attach output into a reusable buffer.
+
+    Callers repeatedly fill `target()` with received bytes and report how
+    many arrived to `filled`, which returns a (stream, memoryview) pair when
+    output is ready.  The memoryview points into the shared buffer and is
+    only valid until the next read.  Frames larger than the buffer are
+    returned in pieces.
+    """
+
+    def __init__(self, tty=False, bufsize=DEFAULT_BUFSIZE):
+        self.tty = tty
+        self._buffer = memoryview(bytearray(bufsize))
+        self._header = memoryview(bytearray(_HEADER.size))
+        self._header_pos = 0
+        self._stream = STDOUT
+        self._remaining = 0
+
+    def target(self):
+        if self.tty:
+            return self._buffer
+        if self._remaining:
+            return self._buffer[:min(self._remaining, len(self._buffer))]
+        return self._header[self._header_pos:]
+
+    def filled(self, n):
+        if self.tty:
+            return STDOUT, self._buffer[:n]
+        if self._remaining:
+            self._remaining -= n
+            return self._stream, self._buffer[:n]
+        self._header_pos += n
+        if self._header_pos == _HEADER.size:
+            self._header_pos = 0
+            stream_id, self._remaining = _HEADER.unpack(
+                self._header.tobytes()
+            )
+            self._stream = _STREAMS.get(stream_id, STDOUT)
+        return None
+
+
+class Attachment(object):
+    """
+    A connection to an instance's stdin, stdout and stderr.
+
+    Create one with `Container.attach` before starting the instance to see
+    all of its output.  `pump` copies between the socket and local files on
+    the calling thread; `start` does the same on a background thread.  See
+    `dockorm.aio.pump_attachment` for use from asyncio.
+    """
+
+    def __init__(self, sock, tty=False, bufsize=DEFAULT_BUFSIZE):
+        # Keep the wrapper alive: docker-py hangs the HTTP response off it.
+        self.socket = sock
+        self.tty = tty
+        self.bufsize = bufsize
+        self._sock = _raw_socket(sock)
+        self._thread = None
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def send(self, data):
+        self._sock.sendall(data)
+
+    def close_stdin(self):
+        """
+        Signal end of input to the instance.
+        """
+        try:
+            self._sock.shutdown(socket.SHUT_WR)
+        except (OSError, socket.error):
+            pass
+
+    def close(self):
+        self._sock.close()
+
+    def iter_output(self):
+        """
+        Yield (stream, memoryview) pairs of output until the instance exits.
+
+        Each memoryview is only valid until the next item is requested.
+        """
+        reader = FrameReader(self.tty, self.bufsize)
+        while True:
+            n = self._sock.recv_into(reader.target())
+            if not n:
+                return
+            out = reader.filled(n)
+            if out is not None:
+                yield out
+
+    def _pump_stdin(self, stdin):
+        source = _binary(stdin)
+        readinto = (
+            getattr(source, 'readinto1', None) or
+            getattr(source, 'readinto', None)
+        )
+        buf = memoryview(bytearray(self.bufsize))
+        try:
+            while True:
+                if readinto is not None:
+                    n = readinto(buf)
+                    data = buf[:n]
+                else:
+                    data = source.read(self.bufsize)
+                    n = len(data)
+                if not n:
+                    break
+                self.send(data)
+        except (OSError, IOError, socket.error):
+            pass
+        finally:
+            self.close_stdin()
+
+    def pump(self, stdin=None, stdout=None, stderr=None):
+        """
+        Copy `stdin` to the instance and its output to `stdout` and
+        `stderr` until it exits.
+
+        `stdin` is read on a daemon thread and may be None to send nothing.
+        Output for a stream with no file is discarded; stderr defaults to
+        stdout.  TTY instances send all output as stdout.
+        """
+        if stdin is not None:
+            thread = Thread(target=self._pump_stdin, args=(stdin,))
+            thread.daemon = True
+            thread.start()
+        else:
+            self.close_stdin()
+        if stderr is None:
+            stderr = stdout
+        targets = {
+            'stdout': stdout and _binary(stdout),
+            'stderr': stderr and _binary(stderr),
+        }
+        try:
+            for stream, data in self.iter_output():
+                target = targets.get(stream)
+                if target is not None:
+                    target.write(data)
+                    target.flush()
+        finally:
+            self.close()
+
+    def start(self, stdin=None, stdout=None, stderr=None, on_exit=None):
+        """
+        Run `pump` on a daemon thread, calling `on_exit()` when it ends.
+        """
+        def run():
+            try:
+                self.pump(stdin, stdout, stderr)
+            finally:
+                if on_exit is not None:
+                    on_exit()
+
+        self._thread = Thread(target=run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        """
+        Wait for a pump started with `start` to finish.  Returns True if it
+        has finished.
+        """
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+def attach(client, container, tty=None, stdin=True, logs=False,
+           bufsize=DEFAULT_BUFSIZE):
+    """
+    Open an Attachment to `container`.
+
+    If `tty` is None, the instance is inspected to find out whether its
+    output is multiplexed.
+    """
+    if tty is None:
+        tty = client.inspect_container(container)['Config']['Tty']
+    sock = client.attach_socket(container, params={
+        'stdin': int(stdin),
+        'stdout': 1,
+        'stderr': 1,
+        'stream': 1,
+        'logs': int(logs),
+    })
+    return Attachment(sock, tty=tty, bufsize=bufsize)
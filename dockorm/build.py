@@ -0,0 +1,363 @@
+# encoding: utf-8
+"""
+Utilities for consuming docker build output.
+"""
+from __future__ import print_function, unicode_literals
+from collections import namedtuple
+import hashlib
+import json
+import os
+import stat
+import tarfile
+from tempfile import (
+    mkstemp,
+    TemporaryFile,
+)
+from threading import Lock
+
+from docker.utils.build import exclude_paths
+from six import binary_type
+
+
+# Image label recording the digest of the context an image was built from.
+CONTEXT_DIGEST_LABEL = 'dockorm.context_digest'
+
+_READ_SIZE = 64 * 1024
+
+
+class BuildError(Exception):
+    """
+    Raised when a docker build reports an error.
+    """
+
+
+class BuildEvent(namedtuple('BuildEvent', ['kind', 'message', 'raw'])):
+    """
+    A single message from a docker build.
+
+    `kind` is one of 'stream', 'status', 'progress', 'error', 'aux' or
+    'unknown'.  `message` is the human-readable payload for the kind (the
+    'aux' payload for 'aux' events), and `raw` is the decoded JSON message.
+    """
+    __slots__ = ()
+
+    @property
+    def failed(self):
+        return self.kind in ('error', 'unknown')
+
+
+def _classify(raw):
+    if 'stream' in raw:
+        return BuildEvent('stream', raw['stream'], raw)
+    elif 'error' in raw:
+        return BuildEvent('error', raw['error'], raw)
+    elif 'status' in raw:
+        if raw.get('progressDetail') or 'progress' in raw:
+            return BuildEvent('progress', raw['status'], raw)
+        return BuildEvent('status', raw['status'], raw)
+    elif 'aux' in raw:
+        return BuildEvent('aux', raw['aux'], raw)
+    return BuildEvent('unknown', raw, raw)
+
+
+class BuildOutputParser(object):
+    """
+    Incremental parser for the JSON message stream produced by a build.
+
+    Chunks may split messages at arbitrary byte offsets; incomplete lines are
+    buffered until the rest arrives, so memory use is bounded by the longest
+    single message rather than the whole log.
+    """
+    _decoder = json.JSONDecoder()
+
+    def __init__(self):
+        self._buffer = b''
+
+    def feed(self, chunk):
+        """
+        Consume a chunk of output, returning a list of complete BuildEvents.
+        """
+        if isinstance(chunk, dict):
+            return [_classify(chunk)]
+        if not isinstance(chunk, binary_type):
+            chunk = chunk.encode('utf-8')
+        lines = (self._buffer + chunk).split(b'\n')
+        self._buffer = lines.pop()
+        events = []
+        for line in lines:
+            events.extend(self._parse_line(line))
+        return events
+
+    def close(self):
+        """
+        Flush any buffered output, returning a list of BuildEvents.
+
+        A trailing partial message is reported as an 'error' event.
+        """
+        line, self._buffer = self._buffer, b''
+        try:
+            return self._parse_line(line)
+        except ValueError:
+            message = 'Truncated build output: %r' % line
+            return [BuildEvent('error', message, {'error': message})]
+
+    def _parse_line(self, line):
+        text = line.decode('utf-8').strip()
+        events = []
+        # Some daemons emit several objects on one line without separators.
+        while text:
+            raw, end = self._decoder.raw_decode(text)
+            events.append(_classify(raw))
+            text = text[end:].lstrip()
+        return events
+
+
+def iter_build_events(build_output):
+    """
+    Lazily convert raw build output chunks into BuildEvents.
+    """
+    parser = BuildOutputParser()
+    for chunk in build_output:
+        for event in parser.feed(chunk):
+            yield event
+    for event in parser.close():
+        yield event
+
+
+def print_build_event(event):
+    """
+    Write a BuildEvent to stdout in the format of the docker CLI.
+    """
+    if event.kind == 'stream':
+        print(event.message, end="")
+    elif event.kind in ('status', 'progress', 'error'):
+        print(event.message)
+    elif event.kind == 'unknown':
+        print("Unknown message during build: %s" % event.message)
+
+
+def consume_build_events(events, callback=print_build_event):
+    """
+    Pass each event to `callback`, returning True if the build succeeded.
+    """
+    success = True
+    for event in events:
+        if event.failed:
+            success = False
+        if callback is not None:
+            callback(event)
+    return success
+
+
+def read_dockerignore(path):
+    """
+    Return the list of exclusion patterns in `path`/.dockerignore.
+    """
+    dockerignore = os.path.join(path, '.dockerignore')
+    if not os.path.exists(dockerignore):
+        return []
+    with open(dockerignore) as f:
+        return [
+            line for line in (raw.strip() for raw in f.read().splitlines())
+            if line and not line.startswith('#')
+        ]
+
+
+def context_paths(path):
+    """
+    Return the sorted relative paths sent to the daemon when building `path`.
+    """
+    return sorted(exclude_paths(path, read_dockerignore(path)))
+
+
+def context_manifest(path):
+    """
+    Return (relpath, mode, size, mtime) for every file in the build context.
+
+    Only file metadata is read, so this is cheap enough to compute on every
+    build.
+    """
+    out = []
+    for relpath in context_paths(path):
+        info = os.lstat(os.path.join(path, relpath))
+        out.append((relpath, info.st_mode, info.st_size, info.st_mtime))
+    return out
+
+
+def write_context(path, fileobj, gzip=False):
+    """
+    Write the build context rooted at `path` to `fileobj` as a tar stream.
+
+    .dockerignore is applied before any file is opened, and files are copied
+    into the stream one block at a time, so memory use does not depend on
+    the size of the context.
+    """
+    mode = 'w|gz' if gzip else 'w|'
+    with tarfile.open(fileobj=fileobj, mode=mode) as tar:
+        for relpath in context_paths(path):
+            fullpath = os.path.join(path, relpath)
+            info = tar.gettarinfo(fullpath, arcname=relpath)
+            if info is None:
+                # Sockets and other special files can't be archived.
+                continue
+            if info.isfile():
+                with open(fullpath, 'rb') as f:
+                    tar.addfile(info, f)
+            else:
+                tar.addfile(info)
+
+
+def packed_context(path, gzip=False):
+    """
+    Return a temporary file holding the packed build context, rewound.
+    """
+    fileobj = TemporaryFile()
+    write_context(path, fileobj, gzip=gzip)
+    fileobj.seek(0)
+    return fileobj
+
+
+class ContextCache(object):
+    """
+    An on-disk cache of packed build contexts.
+
+    Entries are keyed by the path, mode, size and mtime of every file in the
+    context, so an unchanged context is packed once and reused without
+    reading any file contents.  The least recently used entries beyond
+    `max_entries` are deleted.
+    """
+
+    def __init__(self, directory, max_entries=32):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, path, gzip=False):
+        digest = hashlib.sha256()
+        digest.update(os.path.abspath(path).encode('utf-8'))
+        digest.update(repr((gzip, context_manifest(path))).encode('utf-8'))
+        return digest.hexdigest()
+
+    def open(self, path, gzip=False):
+        """
+        Return an open file holding the packed context for `path`, packing it
+        first if it is not cached.
+        """
+        filename = os.path.join(
+            self.directory,
+            self.key(path, gzip) + ('.tar.gz' if gzip else '.tar'),
+        )
+        if os.path.exists(filename):
+            os.utime(filename, None)
+        else:
+            fd, tmpname = mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    write_context(path, f, gzip=gzip)
+                os.rename(tmpname, filename)
+            except Exception:
+                os.remove(tmpname)
+                raise
+            self._evict()
+        return open(filename, 'rb')
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(
+                (os.path.join(self.directory, name)
+                 for name in os.listdir(self.directory)
+                 if name.endswith(('.tar', '.tar.gz'))),
+                key=os.path.getmtime,
+                reverse=True,
+            )
+            for filename in entries[self.max_entries:]:
+                try:
+                    os.remove(filename)
+                except OSError:
+                    pass
+
+
+def context_digest(path):
+    """
+    Return a sha256 hex digest of the build context rooted at `path`.
+
+    The digest covers the name, mode, size and contents of every file
+    that survives .dockerignore, read in fixed-size blocks.
+    """
+    digest = hashlib.sha256()
+    for relpath in context_paths(path):
+        fullpath = os.path.join(path, relpath)
+        info = os.lstat(fullpath)
+        digest.update(relpath.encode('utf-8') + b'\0')
+        digest.update(('%o %d\0' % (
+            stat.S_IMODE(info.st_mode), info.st_size,
+        )).encode('ascii'))
+        if stat.S_ISLNK(info.st_mode):
+            digest.update(b'L' + os.readlink(fullpath).encode('utf-8'))
+        elif stat.S_ISREG(info.st_mode):
+            digest.update(b'F')
+            with open(fullpath, 'rb') as f:
+                for block in iter(lambda: f.read(_READ_SIZE), b''):
+                    digest.update(block)
+        else:
+            digest.update(b'D')
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _logical_lines(f):
+    """
+    Yield the instructions in a Dockerfile, joining continuation lines.
+    """
+    pending = ''
+    for raw in f:
+        line = raw.strip()
+        if not pending and (not line or line.startswith('#')):
+            continue
+        if line.endswith('\\'):
+            pending += line[:-1] + ' '
+            continue
+        yield pending + line
+        pending = ''
+    if pending:
+        yield pending
+
+
+def normalize_image_name(name):
+    """
+    Add the implicit ':latest' tag to an image reference without one.
+    """
+    if '@' in name or ':' in name.rsplit('/', 1)[-1]:
+        return name
+    return name + ':latest'
+
+
+def dockerfile_parents(path, dockerfile='Dockerfile'):
+    """
+    Return the images named by FROM instructions in a Dockerfile.
+
+    References to earlier stages of a multi-stage build are omitted.  Names
+    are normalized with `normalize_image_name`.
+    """
+    parents = []
+    stages = set()
+    with open(os.path.join(path, dockerfile)) as f:
+        for line in _logical_lines(f):
+            words = line.split()
+            if words[0].upper() != 'FROM':
+                continue
+            words = [w for w in words[1:] if not w.startswith('--')]
+            if not words:
+                continue
+            image = words[0]
+            is_stage = image.lower() in stages
+            if len(words) >= 3 and words[1].upper() == 'AS':
+                stages.add(words[2].lower())
+            if is_stage:
+                continue
+            parent = normalize_image_name(image)
+            if parent not in parents:
+                parents.append(parent)
+    return parents
@@ -0,0 +1,220 @@
+# encoding: utf-8
+"""
+StateCache class.
+"""
+from __future__ import unicode_literals
+from collections import defaultdict
+from copy import deepcopy
+import logging
+import re
+from threading import (
+    Event,
+    RLock,
+    Thread,
+)
+
+from six import itervalues
+
+
+log = logging.getLogger(__name__)
+
+_LIVE_STATES = ('running', 'paused')
+
+
+class StateCache(object):
+    """
+    An in-memory index of the containers on a docker daemon.
+
+    The cache lists every container once, then follows the daemon's events
+    stream, refreshing only the containers named in each event.  If the
+    stream disconnects, the cache reconnects and performs a full resync.
+
+    Lookups return dicts in the format of `client.containers()`, so a cache
+    can be attached to a Container via its `state_cache` trait to serve
+    `instances()` and `running()` without a round trip to the daemon.  Such
+    a Container refreshes the instances it changes itself, so its own
+    lookups are not stale while the corresponding events are in flight.
+    """
+
+    def __init__(self, client, reconnect_delay=1.0):
+        self.client = client
+        self.reconnect_delay = reconnect_delay
+        self._lock = RLock()
+        self._by_id = {}
+        self._by_name = defaultdict(set)
+        self._by_state = defaultdict(set)
+        self._by_image = defaultdict(set)
+        self._synced = Event()
+        self._stopped = Event()
+        self._stream = None
+        self._thread = None
+
+    def start(self, timeout=None):
+        """
+        Start following the events stream, and wait for the first sync.
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = Thread(target=self._follow, name='dockorm-state-cache')
+        self._thread.daemon = True
+        self._thread.start()
+        if not self._synced.wait(timeout):
+            raise RuntimeError("Timed out waiting for the initial sync.")
+
+    def stop(self):
+        """
+        Stop following the events stream.
+        """
+        self._stopped.set()
+        stream = self._stream
+        if stream is not None and hasattr(stream, 'close'):
+            stream.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._synced.clear()
+
+    def _follow(self):
+        while not self._stopped.is_set():
+            try:
+                # Subscribe before listing, so no event between the two is
+                # lost.  Replayed events just cause redundant refreshes.
+                self._stream = self.client.events(
+                    decode=True,
+                    filters={'type': 'container'},
+                )
+                self.resync()
+                self._synced.set()
+                for event in self._stream:
+                    if self._stopped.is_set():
+                        break
+                    self.handle_event(event)
+            except Exception:
+                if not self._stopped.is_set():
+                    log.exception("Docker events stream failed.")
+            finally:
+                self._stream = None
+            self._stopped.wait(self.reconnect_delay)
+
+    def resync(self):
+        """
+        Replace the index with a full listing from the daemon.
+        """
+        containers = self.client.containers(all=True)
+        with self._lock:
+            self._by_id.clear()
+            self._by_name.clear()
+            self._by_state.clear()
+            self._by_image.clear()
+            for container in containers:
+                self._add(container)
+
+    def handle_event(self, event):
+        """
+        Update the index for a single decoded docker event.
+        """
+        if event.get('Type', 'container') != 'container':
+            return
+        action = event.get('Action') or event.get('status') or ''
+        container_id = event.get('Actor', {}).get('ID') or event.get('id')
+        if not container_id or action.startswith('exec_'):
+            return
+        if action == 'destroy':
+            with self._lock:
+                self._remove(container_id)
+            return
+        self.refresh(container_id)
+
+    def refresh(self, container_id):
+        """
+        Re-read a single container from the daemon.
+        """
+        found = self.client.containers(
+            all=True,
+            filters={'id': container_id},
+        )
+        with self._lock:
+            self._remove(container_id)
+            for container in found:
+                self._add(container)
+
+    def refresh_name(self, name):
+        """
+        Re-read the container with the given name from the daemon.
+        """
+        name = '/' + name.lstrip('/')
+        found = self.client.containers(
+            all=True,
+            filters={'name': '^{}$'.format(re.escape(name))},
+        )
+        with self._lock:
+            for container_id in list(self._by_name.get(name, ())):
+                self._remove(container_id)
+            for container in found:
+                if name in (container.get('Names') or ()):
+                    self._add(container)
+
+    def _add(self, container):
+        container_id = container['Id']
+        self._by_id[container_id] = container
+        for name in container.get('Names') or ():
+            self._by_name[name].add(container_id)
+        self._by_state[container.get('State')].add(container_id)
+        self._by_image[container.get('Image')].add(container_id)
+
+    def _remove(self, container_id):
+        container = self._by_id.pop(container_id, None)
+        if container is None:
+            return
+        for name in container.get('Names') or ():
+            self._discard(self._by_name, name, container_id)
+        self._discard(self._by_state, container.get('State'), container_id)
+        self._discard(self._by_image, container.get('Image'), container_id)
+
+    @staticmethod
+    def _discard(index, key, container_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(container_id)
+            if not ids:
+                del index[key]
+
+    def containers(self, all=True, name=None, status=None, image=None):
+        """
+        Return cached containers, in the format of `client.containers()`.
+
+        `name` matches a container name exactly (with or without the leading
+        slash).  If all is False and no `status` is given, only running (or
+        paused) containers are returned, as with `docker ps`; as on the
+        daemon, a `status` filter implies all.
+        """
+        if not all and status is None:
+            return [
+                c for c in self.containers(name=name, image=image)
+                if c.get('State') in _LIVE_STATES
+            ]
+        with self._lock:
+            candidates = None
+            if name is not None:
+                if not name.startswith('/'):
+                    name = '/' + name
+                candidates = set(self._by_name.get(name, ()))
+            for index, key in ((self._by_state, status),
+                               (self._by_image, image)):
+                if key is None:
+                    continue
+                ids = index.get(key, set())
+                if candidates is None:
+                    candidates = set(ids)
+                else:
+                    candidates &= ids
+            if candidates is None:
+                found = list(itervalues(self._by_id))
+            else:
+                found = [self._by_id[i] for i in candidates]
+            return deepcopy(sorted(
+                found,
+                key=lambda c: c.get('Created', 0),
+                reverse=True,
+            ))
@@ -0,0 +1,80 @@
+# encoding: utf-8
+"""
+Process-wide registry of docker API clients.
+
+Every APIClient owns an HTTP connection pool and, when created with
+version='auto', makes an extra round trip to negotiate the API version.
+Containers that talk to the same daemon share a single client instead.
+"""
+from __future__ import unicode_literals
+from os import environ
+from threading import Lock
+
+from docker import APIClient as Client
+from docker.utils import kwargs_from_env
+
+
+_ENV_KEYS = ('DOCKER_HOST', 'DOCKER_CERT_PATH', 'DOCKER_TLS_VERIFY')
+
+_lock = Lock()
+_clients = {}
+_versions = {}
+
+
+def _env_key(environment):
+    return tuple(environment.get(key) for key in _ENV_KEYS)
+
+
+def client_kwargs(assert_hostname=None, max_pool_size=None,
+                  environment=None):
+    """
+    Return the keyword arguments for a Client for the given settings.
+    """
+    # docker-py 7 dropped assert_hostname, so only pass it when it is set.
+    if assert_hostname is None:
+        kwargs = kwargs_from_env(environment=environment)
+    else:
+        kwargs = kwargs_from_env(
+            assert_hostname=assert_hostname,
+            environment=environment,
+        )
+    if max_pool_size is not None:
+        kwargs['max_pool_size'] = max_pool_size
+    return kwargs
+
+
+def get_client(assert_hostname=None, max_pool_size=None, environment=None):
+    """
+    Return the shared client for the given docker environment settings.
+
+    Clients are keyed by the DOCKER_* environment variables read by
+    kwargs_from_env, `assert_hostname` and `max_pool_size`.  The API version
+    negotiated by the first client for a daemon is reused by every later
+    client created for that daemon.
+    """
+    if environment is None:
+        environment = environ
+    env_key = _env_key(environment)
+    key = (env_key, assert_hostname, max_pool_size)
+
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+
+        kwargs = client_kwargs(assert_hostname, max_pool_size, environment)
+        client = Client(version=_versions.get(env_key, 'auto'), **kwargs)
+        _versions.setdefault(env_key, client.api_version)
+        _clients[key] = client
+        return client
+
+
+def clear_clients():
+    """
+    Close and forget all shared clients and cached API versions.
+    """
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _versions.clear()
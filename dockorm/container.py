@@ -3,13 +3,27 @@
 Container class.
 """
 from __future__ import print_function, unicode_literals
+from collections import OrderedDict
 from itertools import chain
 import json
-from subprocess import call
+import re
+import sys
+from threading import Event
+from time import time
 
 from docker import APIClient as Client
-from docker.utils import kwargs_from_env
+from docker.errors import (
+    APIError,
+    DockerException,
+)
+from docker.utils import parse_bytes
+from requests.exceptions import (
+    ConnectionError,
+    ReadTimeout,
+)
+from requests.packages.urllib3.exceptions import ReadTimeoutError
 from six import (
+    integer_types,
     iteritems,
     itervalues,
     string_types,
@@ -19,35 +33,103 @@ from six import (
 
 from traitlets import (
     Any,
+    Bool,
     Dict,
     HasTraits,
     Instance,
+    Integer,
     List,
-    Unicode,
     TraitError,
+    TraitType,
+    Unicode,
 )
 
+from .allocate import format_cpuset
+from .attach import attach as attach_instance
+from .build import (
+    consume_build_events,
+    CONTEXT_DIGEST_LABEL,
+    context_digest,
+    ContextCache,
+    iter_build_events,
+    packed_context,
+)
+from .cache import StateCache
+from .clients import (
+    client_kwargs,
+    get_client,
+)
+from .execute import exec_stream
+from .logs import (
+    merge_streams,
+    stream_log_lines,
+)
+from .parallel import (
+    DEFAULT_MAX_WORKERS,
+    map_concurrent,
+    Result,
+)
 from .py3compat_utils import strict_map
+from .ready import (
+    as_checks,
+    NotReady,
+)
+from .registry import (
+    is_current,
+    pull_events,
+    pull_image,
+    push_events,
+    push_image,
+    split_image_name,
+)
+from .stats import iter_stats
+
+
+# Label applied to every instance, identifying the Container that created it.
+NAME_LABEL = 'dockorm.name'
+
+# Label holding the index of a replica started with run(replicas=...).
+REPLICA_LABEL = 'dockorm.replica'
+
+
+def _matches_state(container, status=None, label=None):
+    if status is not None and container.get('State') != status:
+        return False
+    if label is not None:
+        labels = container.get('Labels') or {}
+        for key, value in iteritems(_label_dict(label)):
+            if key not in labels:
+                return False
+            if value is not None and labels[key] != value:
+                return False
+    return True
 
 
 def print_build_output(build_output):
-    success = True
-    for raw_messages in build_output:
-        for raw_message in raw_messages.splitlines():
-            message = json.loads(raw_message.decode('utf-8'))
-            if 'stream' in message:
-                print(message['stream'], end="")
-            elif 'status' in message:
-                print(message['status'])
-            elif 'error' in message:
-                success = False
-                print(message['error'])
-            elif 'aux' in message:
-                continue
-            else:
-                success = False
-                print("Unknown message during build: %s" % message)
-    return success
+    return consume_build_events(iter_build_events(build_output))
+
+
+def replica_index(container):
+    """
+    Return the replica index of an instance from its labels, or None.
+    """
+    value = (container.get('Labels') or {}).get(REPLICA_LABEL)
+    return None if value is None else int(value)
+
+
+def _label_dict(label):
+    """
+    Normalize a label filter into a dict of key -> value (or None).
+    """
+    if isinstance(label, string_types):
+        label = [label]
+    if isinstance(label, dict):
+        return dict(label)
+    out = {}
+    for item in label:
+        key, sep, value = item.partition('=')
+        out[key] = value if sep else None
+    return out
 
 
 def scalar(l):
@@ -58,6 +140,40 @@ def scalar(l):
     return l[0]
 
 
+class WaitTimeout(Exception):
+    """
+    Raised when a container does not exit, or become ready, before a wait's
+    timeout.
+    """
+
+
+class WaitCancelled(Exception):
+    """
+    Raised when a wait is cancelled before the container exits.
+    """
+
+
+def _is_read_timeout(error):
+    """
+    Whether a requests error means a wait slice ran out, rather than that
+    the daemon could not be reached.
+
+    requests reports read timeouts on streamed responses as ConnectionErrors
+    wrapping urllib3's ReadTimeoutError.
+    """
+    if isinstance(error, ReadTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    return isinstance(reason, ReadTimeoutError)
+
+
+def _exit_code(wait_result):
+    # docker-py >= 3.0 returns the full response body.
+    if isinstance(wait_result, dict):
+        return wait_result['StatusCode']
+    return wait_result
+
+
 class UnicodeOrFalse(Unicode):
     info_text = 'a unicode string or False'
 
@@ -67,6 +183,62 @@ class UnicodeOrFalse(Unicode):
         return super(UnicodeOrFalse, self).validate(obj, value)
 
 
+class ByteSize(TraitType):
+    """
+    A size in bytes, given as an int or a string such as '512m'.  Stored as
+    an int.
+    """
+    default_value = None
+    info_text = "a size in bytes, such as 536870912 or '512m'"
+
+    def validate(self, obj, value):
+        if value is None:
+            return value
+        if isinstance(value, string_types):
+            try:
+                value = parse_bytes(value)
+            except DockerException:
+                self.error(obj, value)
+        if isinstance(value, bool) or not isinstance(value, integer_types):
+            self.error(obj, value)
+        if value < 0:
+            self.error(obj, value)
+        return value
+
+
+class CPUSet(Unicode):
+    """
+    A cpuset list such as '0-3,8', or a list of ints.
+    """
+    info_text = "a cpuset list such as '0-3,8'"
+    _pattern = re.compile(r'^(\d+(-\d+)?(,\d+(-\d+)?)*)?$')
+
+    def validate(self, obj, value):
+        if isinstance(value, (list, tuple)):
+            value = format_cpuset(int(v) for v in value)
+        value = super(CPUSet, self).validate(obj, value)
+        if not self._pattern.match(value):
+            self.error(obj, value)
+        return value
+
+
+class PositiveInteger(Integer):
+    """
+    An Integer of at least `minimum`, or None.
+    """
+
+    def __init__(self, minimum=0, **kwargs):
+        self.minimum = minimum
+        kwargs.setdefault('allow_none', True)
+        super(PositiveInteger, self).__init__(**kwargs)
+
+    def validate(self, obj, value):
+        value = super(PositiveInteger, self).validate(obj, value)
+        if value is not None and value < self.minimum:
+            self.error(obj, value)
+        return value
+
+
 class Container(HasTraits):
     """
     A specification for creation of a container.
@@ -106,6 +278,45 @@ class Container(HasTraits):
 
     build_path = Unicode()
 
+    skip_unchanged_builds = Bool(
+        default_value=False, config=True,
+        help="If True, build() does nothing when an image with this tag was "
+        "already built from an identical build context.",
+    )
+
+    gzip_context = Bool(
+        default_value=False, config=True,
+        help="If True, send the build context to the daemon gzipped.",
+    )
+
+    context_cache = Instance(
+        ContextCache,
+        allow_none=True,
+        help="If set, reuse build contexts packed by this cache.  If unset "
+        "and gzip_context is False, docker-py packs the context in memory.",
+    )
+
+    def _open_context(self):
+        if self.context_cache is not None:
+            return self.context_cache.open(
+                self.build_path,
+                gzip=self.gzip_context,
+            )
+        return packed_context(self.build_path, gzip=self.gzip_context)
+
+    def built_image(self, tag=None, digest=None):
+        """
+        Return the image with this tag built from a context with the given
+        digest, or None.
+        """
+        if digest is None:
+            digest = context_digest(self.build_path)
+        images = self.client.images(
+            self.full_imagename(tag=tag),
+            filters={'label': '{}={}'.format(CONTEXT_DIGEST_LABEL, digest)},
+        )
+        return images[0] if images else None
+
     links = List(Instance(__name__ + '.Link'))
 
     def format_links(self):
@@ -187,6 +398,16 @@ class Container(HasTraits):
 
     environment = Dict()
 
+    labels = Dict(
+        help="Labels to apply to instances of this container.  The "
+        "'%s' label is always set to the container's name." % NAME_LABEL,
+    )
+
+    def instance_labels(self, name=None):
+        labels = dict(self.labels)
+        labels[NAME_LABEL] = name or self.name
+        return labels
+
     network_mode = Unicode(
         default_value="bridge",
         help="network_mode for start",
@@ -202,7 +423,57 @@ class Container(HasTraits):
         help="Container IDs from which to mount volumes."
     )
 
-    def _make_host_config(self):
+    mem_limit = ByteSize(
+        allow_none=True,
+        help="Memory limit, in bytes or as a string such as '512m'.",
+    )
+
+    shm_size = ByteSize(
+        allow_none=True,
+        help="Size of /dev/shm, in bytes or as a string such as '64m'.",
+    )
+
+    cpu_shares = PositiveInteger(
+        default_value=None,
+        minimum=2,
+        help="Relative CPU weight (the default weight is 1024).",
+    )
+
+    nano_cpus = PositiveInteger(
+        default_value=None,
+        minimum=1,
+        help="CPU quota in billionths of a CPU; 1500000000 is 1.5 CPUs.",
+    )
+
+    cpuset_cpus = CPUSet(
+        help="CPUs the container may run on, such as '0-3,8'.  See "
+        "dockorm.allocate for spreading containers over a host.",
+    )
+
+    cpuset_mems = CPUSet(
+        help="NUMA nodes the container may allocate memory on, such as '0'.",
+    )
+
+    def resources(self):
+        """
+        The resource limits set on this container, as keyword arguments for
+        `create_host_config`.
+        """
+        out = {}
+        for name in ('mem_limit', 'shm_size', 'cpu_shares', 'nano_cpus',
+                     'cpuset_cpus', 'cpuset_mems'):
+            value = getattr(self, name)
+            if value is not None and value != '':
+                out[name] = value
+        return out
+
+    def _make_host_config(self, resources=None):
+        """
+        Build the host config for a new instance.  `resources` overrides
+        the container's resource traits, as from `resources()`.
+        """
+        limits = self.resources()
+        limits.update(resources or {})
         return self.client.create_host_config(
             binds=self.volume_binds,
             port_bindings=self.port_bindings,
@@ -226,6 +497,7 @@ class Container(HasTraits):
             security_opt=None,
             ulimits=None,
             log_config=None,
+            **limits
         )
 
     # This should really be something like:
@@ -237,52 +509,114 @@ class Container(HasTraits):
         help="If False, do not verify hostname of docker daemon",
     )
 
+    shared_client = Bool(
+        default_value=True, config=True,
+        help="If True, use the process-wide client for this docker "
+        "environment instead of creating a private one.",
+    )
+
+    max_pool_size = Integer(
+        default_value=None, allow_none=True, config=True,
+        help="Maximum number of connections kept open to the docker daemon.",
+    )
+
     _client = None
 
     @property
     def client(self):
         if self._client is None:
-            self._client = Client(
-                version='auto',
-                **kwargs_from_env(assert_hostname=self.tls_assert_hostname)
-            )
+            if self.shared_client:
+                self._client = get_client(
+                    assert_hostname=self.tls_assert_hostname,
+                    max_pool_size=self.max_pool_size,
+                )
+            else:
+                self._client = Client(version='auto', **client_kwargs(
+                    assert_hostname=self.tls_assert_hostname,
+                    max_pool_size=self.max_pool_size,
+                ))
         return self._client
 
     @client.setter
     def client(self, value):
         self._client = value
 
-    def build(self, tag=None, display=True, rm=True):
+    def build(self, tag=None, display=True, rm=True, stream=False,
+              callback=None, skip_unchanged=None):
         """
         Build the container.
 
-        If display is True, write build output to stdout.  Otherwise return it
-        as a generator.
+        If stream is True, return a generator of `dockorm.build.BuildEvent`s
+        parsed incrementally from the daemon's output.  If callback is given,
+        call it with each BuildEvent as it arrives and return whether the
+        build succeeded.  Otherwise, if display is True, write build output to
+        stdout and return whether the build succeeded, or if display is False
+        return the raw output as a list.
+
+        The context is packed by docker-py, unless gzip_context or
+        context_cache is set, in which case it is streamed from a file.
+
+        If skip_unchanged (default: the skip_unchanged_builds trait) is True,
+        the image is labelled with a digest of the build context, and if an
+        image with this tag and digest already exists, nothing is sent to the
+        daemon and the build reports a single 'status' event.  Otherwise the
+        context is not hashed at all.
         """
-        output = self.client.build(
-            self.build_path,
-            self.full_imagename(tag=tag),
-            # This is in line with the docker CLI, but different from
-            # docker-py's default.
-            rm=rm,
-        )
-        if display:
+        if skip_unchanged is None:
+            skip_unchanged = self.skip_unchanged_builds
+        labels = None
+        if skip_unchanged:
+            digest = context_digest(self.build_path)
+            labels = {CONTEXT_DIGEST_LABEL: digest}
+        if skip_unchanged and self.built_image(tag, digest) is not None:
+            message = "Build context unchanged, using existing {}".format(
+                self.full_imagename(tag=tag),
+            )
+            output = [json.dumps({'status': message}).encode('utf-8')]
+        elif self.context_cache is None and not self.gzip_context:
+            output = self.client.build(
+                self.build_path,
+                self.full_imagename(tag=tag),
+                # This is in line with the docker CLI, but different from
+                # docker-py's default.
+                rm=rm,
+                labels=labels,
+            )
+        else:
+            # The request body is fully sent before client.build returns.
+            with self._open_context() as context:
+                output = self.client.build(
+                    fileobj=context,
+                    custom_context=True,
+                    encoding='gzip' if self.gzip_context else None,
+                    tag=self.full_imagename(tag=tag),
+                    rm=rm,
+                    labels=labels,
+                )
+        if stream:
+            return iter_build_events(output)
+        elif callback is not None:
+            return consume_build_events(iter_build_events(output), callback)
+        elif display:
             return print_build_output(output)
         else:
             return list(output)
 
-    def run(self, command=None, tag=None, attach=False, rm=False):
+    def create(self, command=None, tag=None, attach=False, name=None,
+               labels=None, resources=None):
         """
-        Run this container.
-        """
-        if rm and not attach:
-            raise ValueError(
-                "Auto-remove is not supported with detached execution."
-            )
+        Create, but don't start, an instance of this container.
 
-        container = self.client.create_container(
+        `name` overrides the container's name, `labels` are added to
+        instance_labels(), and `resources` overrides resource limits (see
+        `resources()`).  Returns the daemon's response, whose 'Id' is the
+        new instance's ID.
+        """
+        instance_labels = self.instance_labels(name)
+        instance_labels.update(labels or {})
+        return self.client.create_container(
             self.full_imagename(tag),
-            name=self.name,
+            name=name or self.name,
             ports=self.open_container_ports,
             volumes=self.volume_mount_points,
             detach=not attach,
@@ -290,25 +624,161 @@ class Container(HasTraits):
             tty=attach,
             command=command or self.command,
             environment=self.environment,
-            host_config=self._make_host_config(),
+            labels=instance_labels,
+            host_config=self._make_host_config(resources),
+        )
+
+    def attach(self, instance=None, stdin=True, logs=False, tty=None):
+        """
+        Open a `dockorm.attach.Attachment` to an instance's stdio over the
+        daemon's attach socket.
+
+        `instance` defaults to the instance named after this container.  If
+        `logs` is True, output produced before attaching is replayed first.
+        """
+        if instance is None:
+            instance = self.name
+        return attach_instance(
+            self.client, instance, tty=tty, stdin=stdin, logs=logs,
         )
 
+    def run(self, command=None, tag=None, attach=False, rm=False,
+            stdin=None, stdout=None, stderr=None, block=True, replicas=None,
+            allocations=None, pull_if_missing=False):
+        """
+        Run this container.
+
+        If `pull_if_missing` is True, the image is first pulled if it is
+        missing or differs from the registry's; see `ensure_image`.
+
+        If `replicas` is given, start that many replicas concurrently instead
+        of a single instance, and return an OrderedDict mapping each replica
+        index to a Result holding its ID.  `allocations` may give each
+        replica its own CPUs.  See `scale`.
+
+        If `attach` is True, the instance gets a TTY and open stdin, which
+        are connected in-process to `stdin` and `stdout` (by default
+        sys.stdin and sys.stdout) until it exits.  With `block=False`, the
+        copying happens on a background thread and the Attachment is
+        returned immediately; `rm` then removes the instance from that
+        thread once it exits.
+        """
+        if rm and not attach:
+            raise ValueError(
+                "Auto-remove is not supported with detached execution."
+            )
+        if replicas is not None and attach:
+            raise ValueError("Replicas cannot be run attached.")
+        if pull_if_missing:
+            self.ensure_image(tag)
+        if replicas is not None:
+            return self._run_replicas(
+                range(replicas), command=command, tag=tag,
+                allocations=allocations,
+            )
+
+        container = self.create(command=command, tag=tag, attach=attach)
+
+        if not attach:
+            self.client.start(container)
+            self._refresh_cache(container)
+            return None
+
+        # Attach before starting so no output is missed.
+        attachment = self.attach(container['Id'], tty=True)
         self.client.start(container)
+        self._refresh_cache(container)
 
-        if attach:
-            call(['docker', 'attach', self.name])
+        def finish():
             if rm:
-                self.client.remove_container(self.name)
+                self.client.wait(container)
+                self.client.remove_container(container)
+                self._refresh_cache(container)
+
+        if stdin is None:
+            stdin = sys.stdin
+        if stdout is None:
+            stdout = sys.stdout
+        if not block:
+            return attachment.start(stdin, stdout, stderr, on_exit=finish)
+        attachment.pump(stdin, stdout, stderr)
+        finish()
+        return attachment
+
+    filter_on_daemon = Bool(
+        default_value=True, config=True,
+        help="If True, push name/status/label filters down to the docker "
+        "daemon when listing instances instead of listing every container "
+        "on the host.",
+    )
 
-    def _matches(self, container):
-        return '/' + self.name in container['Names']
+    state_cache = Instance(
+        StateCache,
+        allow_none=True,
+        help="If set, serve instances() and running() from this cache "
+        "instead of listing containers on the daemon.",
+    )
 
-    def instances(self, all=True):
+    def _refresh_cache(self, instance=None):
+        """
+        Re-read an instance (by default, the one named after this container)
+        into state_cache, if one is set.
+        """
+        if self.state_cache is None:
+            return
+        if instance is None:
+            self.state_cache.refresh_name(self.name)
+        elif isinstance(instance, dict):
+            self.state_cache.refresh(instance['Id'])
+        else:
+            self.state_cache.refresh(instance)
+
+    def _matches(self, container, status=None, label=None):
+        if '/' + self.name not in container['Names']:
+            return False
+        return _matches_state(container, status, label)
+
+    def _filters(self, status=None, label=None):
+        """
+        Build the `filters` argument for client.containers().
+
+        The daemon treats the name filter as an unanchored regex, so this only
+        narrows the listing; exact matching is still done by `_matches`.
+        """
+        filters = {'name': '^/?{}$'.format(re.escape(self.name))}
+        if status is not None:
+            filters['status'] = status
+        if label is not None:
+            filters['label'] = [
+                key if value is None else '{}={}'.format(key, value)
+                for key, value in sorted(iteritems(_label_dict(label)))
+            ]
+        return filters
+
+    def instances(self, all=True, status=None, label=None):
         """
         Return any instances of this container, running or not.
+
+        `status` restricts the result to containers in the given state (e.g.
+        'exited').  `label` is a label key, a list of keys, or a dict of
+        key -> value that instances must carry.
         """
+        if self.state_cache is not None:
+            candidates = self.state_cache.containers(
+                all=all,
+                name=self.name,
+                status=status,
+            )
+        elif self.filter_on_daemon:
+            candidates = self.client.containers(
+                all=all,
+                filters=self._filters(status=status, label=label),
+            )
+        else:
+            candidates = self.client.containers(all=all)
         return [
-            c for c in self.client.containers(all=all) if self._matches(c)
+            c for c in candidates
+            if self._matches(c, status=status, label=label)
         ]
 
     def running(self):
@@ -322,24 +792,209 @@ class Container(HasTraits):
         else:
             return None
 
+    def replica_name(self, index):
+        return '{}-{}'.format(self.name, index)
+
+    def replicas(self, all=True, status=None):
+        """
+        Return the replicas of this container started by `run(replicas=N)`
+        or `scale`, ordered by replica index.
+
+        Replicas are named `replica_name(index)` and are not returned by
+        `instances()`.
+        """
+        label = {NAME_LABEL: self.name, REPLICA_LABEL: None}
+        if self.state_cache is not None:
+            candidates = self.state_cache.containers(all=all, status=status)
+        elif self.filter_on_daemon:
+            filters = {'label': [
+                '{}={}'.format(NAME_LABEL, self.name), REPLICA_LABEL,
+            ]}
+            if status is not None:
+                filters['status'] = status
+            candidates = self.client.containers(all=all, filters=filters)
+        else:
+            candidates = self.client.containers(all=all)
+        return sorted(
+            (c for c in candidates
+             if _matches_state(c, status=status, label=label)),
+            key=replica_index,
+        )
+
+    def running_replicas(self):
+        """
+        Return the running replicas of this container.
+        """
+        return self.replicas(all=False)
+
+    def _run_replica(self, index, command=None, tag=None, allocations=None):
+        resources = None
+        if allocations and index < len(allocations):
+            resources = allocations[index].resources()
+        container = self.create(
+            command=command,
+            tag=tag,
+            name=self.replica_name(index),
+            labels={NAME_LABEL: self.name, REPLICA_LABEL: str(index)},
+            resources=resources,
+        )
+        self.client.start(container)
+        self._refresh_cache(container)
+        return container['Id']
+
+    def _run_replicas(self, indices, command=None, tag=None,
+                      allocations=None, max_workers=DEFAULT_MAX_WORKERS):
+        return map_concurrent(
+            lambda index: self._run_replica(
+                index, command=command, tag=tag, allocations=allocations,
+            ),
+            indices,
+            max_workers=max_workers,
+        )
+
+    def scale(self, count, command=None, tag=None, stop_timeout=None,
+              allocations=None, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Converge on `count` running replicas, indexed 0 to count - 1.
+
+        Running replicas in that range are left alone, stopped ones are
+        restarted, missing ones are created, and replicas outside the range
+        are stopped and removed, all concurrently.  `allocations` may give
+        each new replica its own CPUs; see `dockorm.allocate.spread_replicas`.
+        Returns an OrderedDict mapping each replica index touched to a Result
+        holding the action taken ('created', 'started' or 'removed').
+        """
+        existing = {}
+        for container in self.replicas(all=True):
+            existing.setdefault(replica_index(container), container)
+        actions = []
+        for index in range(count):
+            container = existing.get(index)
+            if container is None:
+                actions.append((index, 'created'))
+            elif container.get('State') not in ('running', 'paused'):
+                actions.append((index, 'started'))
+        actions.extend(
+            (index, 'removed') for index in sorted(existing) if index >= count
+        )
+
+        def apply(action):
+            index, kind = action
+            if kind == 'created':
+                self._run_replica(
+                    index, command=command, tag=tag, allocations=allocations,
+                )
+            elif kind == 'started':
+                self.client.start(existing[index])
+                self._refresh_cache(existing[index])
+            else:
+                self._purge_one(existing[index], stop_timeout=stop_timeout)
+            return kind
+
+        results = map_concurrent(apply, actions, max_workers=max_workers)
+        return OrderedDict(
+            (index, result) for (index, _), result in iteritems(results)
+        )
+
     def stop(self):
         self.client.stop(self.name)
+        self._refresh_cache()
+
+    def _halt(self, container, stop_first=True, stop_timeout=None):
+        if container['State'] != 'exited':
+            if not stop_first:
+                self.client.kill(container)
+            elif stop_timeout is None:
+                self.client.stop(container)
+            else:
+                self.client.stop(container, timeout=stop_timeout)
+            self._refresh_cache(container)
+
+    def _purge_one(self, container, stop_first=True, remove_volumes=False,
+                   stop_timeout=None):
+        self._halt(container, stop_first, stop_timeout)
+        self.client.remove_container(
+            container,
+            v=remove_volumes,
+        )
+        self._refresh_cache(container)
 
-    def purge(self, stop_first=True, remove_volumes=False):
+    def purge(self, stop_first=True, remove_volumes=False, stop_timeout=None,
+              max_workers=None, prune=False):
         """
-        Purge all containers of this type.
+        Purge all instances of this container (but not its replicas).
+
+        Returns an OrderedDict mapping each instance ID to a
+        `dockorm.parallel.Result`.  By default instances are purged one at a
+        time and the first error is raised.  If max_workers is given,
+        instances are stopped and removed concurrently on that many threads,
+        and errors are reported in the results instead of raised.
+
+        If prune is True (concurrent mode only), stopped instances are
+        removed with one call to the daemon's prune endpoint, filtered on
+        this container's name label.  Pruning cannot remove volumes, so it is
+        skipped when remove_volumes is True.
         """
-        for container in self.instances():
-            if container['State'] != 'exited':
-                if stop_first:
-                    self.client.stop(container)
-                else:
-                    self.client.kill(container)
-            self.client.remove_container(
-                container,
-                v=remove_volumes,
+        instances = self.instances()
+        ids = [c['Id'] for c in instances]
+        by_id = dict(zip(ids, instances))
+        if max_workers is None:
+            results = OrderedDict()
+            for i in ids:
+                self._purge_one(
+                    by_id[i],
+                    stop_first=stop_first,
+                    remove_volumes=remove_volumes,
+                    stop_timeout=stop_timeout,
+                )
+                results[i] = Result(None, None)
+            return results
+
+        if not (prune and not remove_volumes):
+            return map_concurrent(
+                lambda i: self._purge_one(
+                    by_id[i],
+                    stop_first=stop_first,
+                    remove_volumes=remove_volumes,
+                    stop_timeout=stop_timeout,
+                ),
+                ids,
+                max_workers=max_workers,
             )
 
+        results = map_concurrent(
+            lambda i: self._halt(by_id[i], stop_first, stop_timeout),
+            ids,
+            max_workers=max_workers,
+        )
+        halted = [i for i in ids if results[i].ok]
+        if not halted:
+            return results
+        try:
+            # Replicas carry the name label too, but are not instances.
+            pruned = self.client.prune_containers(filters={
+                'label': '{}={}'.format(NAME_LABEL, self.name),
+                'label!': REPLICA_LABEL,
+            })
+        except APIError as e:
+            for i in halted:
+                results[i] = Result(None, e)
+            return results
+        # Instances created without the label are removed one by one.
+        deleted = set(pruned.get('ContainersDeleted') or ())
+        leftover = [i for i in halted if i not in deleted]
+
+        def remove_one(i):
+            self.client.remove_container(by_id[i])
+            self._refresh_cache(i)
+
+        for i in deleted:
+            self._refresh_cache(i)
+        results.update(map_concurrent(
+            remove_one, leftover, max_workers=max_workers,
+        ))
+        return results
+
     def inspect(self, tag=None):
         """
         Inspect any running instance of this container.
@@ -365,6 +1020,62 @@ class Container(HasTraits):
         for image in self.images():
             self.client.remove_image(image)
 
+    def _transfer(self, events, transfer, tags, stream, callback,
+                  max_workers):
+        names = [self.full_imagename(tag) for tag in tags or [self.tag]]
+        if stream:
+            return merge_streams(events(self.client, name) for name in names)
+        results = map_concurrent(
+            lambda name: transfer(self.client, name, callback),
+            names,
+            max_workers=max_workers,
+        )
+        return OrderedDict(
+            (split_image_name(name)[1], result)
+            for name, result in iteritems(results)
+        )
+
+    def push(self, tags=None, stream=False, callback=None,
+             max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Push this container's image under each of `tags`, by default just
+        its `tag`, concurrently.
+
+        If stream is True, return a generator of
+        `dockorm.registry.ProgressEvent`s from every push, interleaved as
+        they arrive.  Otherwise return an OrderedDict mapping each tag to a
+        Result holding the digest pushed, or the TransferError raised.  If
+        given, `callback` is called with each ProgressEvent, possibly from
+        several threads at once.
+        """
+        return self._transfer(
+            push_events, push_image, tags, stream, callback, max_workers,
+        )
+
+    def pull(self, tags=None, stream=False, callback=None,
+             max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Pull this container's image under each of `tags` concurrently.  See
+        `push`.
+        """
+        return self._transfer(
+            pull_events, pull_image, tags, stream, callback, max_workers,
+        )
+
+    def ensure_image(self, tag=None, callback=None):
+        """
+        Pull this container's image unless the local copy matches the
+        registry.  Returns whether a pull was needed.
+
+        See `dockorm.registry.is_current` for when an image counts as
+        matching.
+        """
+        name = self.full_imagename(tag)
+        if is_current(self.client, name):
+            return False
+        pull_image(self.client, name, callback)
+        return True
+
     def logs(self, all=False):
         return [
             {
@@ -374,6 +1085,119 @@ class Container(HasTraits):
             for container in self.instances(all=all)
         ]
 
+    def iter_logs(self, all=False, follow=False, since=None, tail='all',
+                  timestamps=False, stdout=True, stderr=True):
+        """
+        Lazily yield `dockorm.logs.LogLine`s from instances of this container.
+
+        Output is read incrementally and split into lines per stream, so
+        memory use does not grow with the size of the logs.  With several
+        instances, lines are yielded in the order they arrive from each.  If
+        follow is True, keep waiting for new output until the instances stop.
+        """
+        return merge_streams(
+            stream_log_lines(
+                self.client,
+                container['Id'],
+                follow=follow,
+                since=since,
+                tail=tail,
+                timestamps=timestamps,
+                stdout=stdout,
+                stderr=stderr,
+            )
+            for container in self.instances(all=all)
+        )
+
+    def stats(self, stream=True, all=False):
+        """
+        Report resource usage of instances of this container as
+        `dockorm.stats.Sample`s, with CPU percentage, memory and I/O rates
+        computed from the daemon's raw counters.
+
+        If stream is True, lazily yield Samples from every instance as they
+        arrive, about once a second each, until the instances stop.
+        Otherwise return a list with one Sample per instance.  Closing the
+        stream closes the daemon connections behind it.  See
+        `dockorm.stats.StatsAggregator` for rolling windows over many
+        instances.
+        """
+        ids = [container['Id'] for container in self.instances(all=all)]
+        if not stream:
+            return [
+                next(iter_stats(self.client, container_id, stream=False))
+                for container_id in ids
+            ]
+        return merge_streams(
+            iter_stats(self.client, container_id) for container_id in ids
+        )
+
+    def exec_run(self, cmd, stream=True, demux=True, instance=None,
+                 **kwargs):
+        """
+        Run `cmd` in an instance of this container that is already running.
+
+        `instance` may be the ID or description of an instance; by default
+        the instance named after this container is used.  If `stream` is
+        True, return a `dockorm.execute.ExecStream` yielding output as it
+        arrives, whose `exit_code` is available once it is exhausted.
+        Otherwise wait for the command and return an ExecResult.  With
+        `demux`, output is split into (stdout, stderr) pairs.  Extra keyword
+        arguments (environment, workdir, user, ...) are passed to
+        `exec_create`.
+
+        This is named `exec_run` rather than `exec`, which is a reserved
+        word on Python 2.
+        """
+        if instance is None:
+            instance = self.name
+        elif isinstance(instance, dict):
+            instance = instance['Id']
+        output = exec_stream(
+            self.client, instance, cmd, demux=demux, **kwargs
+        )
+        if stream:
+            return output
+        return output.result()
+
+    def exec_many(self, commands, instances=None, demux=True, callback=None,
+                  max_workers=DEFAULT_MAX_WORKERS, **kwargs):
+        """
+        Run each of `commands` in a running instance of this container.
+
+        Commands are spread round-robin over `instances`, which defaults to
+        every running instance, and run concurrently up to `max_workers` at
+        a time.  If given, `callback` is called with (index, chunk) for each
+        chunk of output as it arrives, where `index` is the position of the
+        command in `commands`.  Returns a list of `dockorm.parallel.Result`s,
+        in the order of `commands`, holding an ExecResult or the exception
+        raised.
+        """
+        commands = list(commands)
+        if instances is None:
+            instances = self.instances(all=False)
+        instances = [
+            i['Id'] if isinstance(i, dict) else i for i in instances
+        ]
+        if commands and not instances:
+            raise ValueError("No running instances of %s." % self)
+
+        def run_one(index):
+            output = self.exec_run(
+                commands[index],
+                demux=demux,
+                instance=instances[index % len(instances)],
+                **kwargs
+            )
+            if callback is None:
+                return output.result()
+            return output.result(lambda chunk: callback(index, chunk))
+
+        results = map_concurrent(
+            run_one, range(len(commands)), max_workers=max_workers,
+        )
+        return list(results.values())
+
     def join(self):
         """
         Wait until there are no instances of this container running.
@@ -382,6 +1206,104 @@ class Container(HasTraits):
         if container:
             self.client.wait(container)
 
+    def wait(self, timeout=None, cancel=None, poll_interval=1.0,
+             instance=None):
+        """
+        Wait for the running instance of this container to exit, and return
+        its exit code.
+
+        If no instance is running, return the exit code of the most recent
+        instance, or None if there are no instances.  `instance` selects a
+        specific instance by ID or name instead.  Raises WaitTimeout if
+        `timeout` seconds pass first.  `cancel` may be a threading.Event;
+        the wait is abandoned with WaitCancelled within `poll_interval`
+        seconds of it being set.
+        """
+        if instance is not None:
+            container = {'Id': instance}
+        else:
+            container = self.running()
+        if container is None:
+            instances = self.instances()
+            if not instances:
+                return None
+            details = self.client.inspect_container(instances[0]['Id'])
+            return details['State']['ExitCode']
+
+        deadline = None if timeout is None else time() + timeout
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise WaitCancelled(str(self))
+            interval = poll_interval if cancel is not None else None
+            if deadline is not None:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    raise WaitTimeout(str(self))
+                if interval is None or remaining < interval:
+                    interval = remaining
+            try:
+                return _exit_code(
+                    self.client.wait(container['Id'], timeout=interval)
+                )
+            except (ConnectionError, ReadTimeout) as e:
+                if interval is None or not _is_read_timeout(e):
+                    raise
+
+    def wait_ready(self, timeout=None, check=None, instance=None,
+                   cancel=None, poll_interval=0.05, max_poll_interval=2.0):
+        """
+        Wait until the running instance of this container is ready, and
+        return its `inspect_container` output.
+
+        `check` is a `dockorm.ready.Check`, a list of them, or a dict such
+        as {'health': True, 'tcp': [8080], 'log': 'listening'}; by default
+        docker's HEALTHCHECK status is used.  `instance` selects a specific
+        instance, such as a replica.  The instance is re-inspected with
+        exponential backoff from `poll_interval` to `max_poll_interval`
+        seconds, or as soon as a check notices a change.  Raises NotReady if
+        the instance is not running or exits, WaitTimeout if `timeout`
+        seconds pass first, and WaitCancelled within `max_poll_interval`
+        seconds of the `cancel` event being set.
+        """
+        if instance is None:
+            instance = self.running()
+            if instance is None:
+                raise NotReady("%s is not running" % self)
+        instance_id = instance
+        if isinstance(instance, dict):
+            instance_id = instance['Id']
+        checks = as_checks(check)
+        wake = Event()
+        deadline = None if timeout is None else time() + timeout
+        interval = poll_interval
+        started = []
+        try:
+            for c in checks:
+                c.start(self, instance_id, wake)
+                started.append(c)
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise WaitCancelled(str(self))
+                details = self.client.inspect_container(instance_id)
+                if not details['State']['Running']:
+                    raise NotReady("%s exited with code %s" % (
+                        self, details['State']['ExitCode'],
+                    ))
+                if all(c(self, details) for c in checks):
+                    return details
+                wait = interval
+                if deadline is not None:
+                    remaining = deadline - time()
+                    if remaining <= 0:
+                        raise WaitTimeout(str(self))
+                    wait = min(wait, remaining)
+                wake.wait(wait)
+                wake.clear()
+                interval = min(interval * 2, max_poll_interval)
+        finally:
+            for c in started:
+                c.stop()
+
 
 class Link(HasTraits):
     """
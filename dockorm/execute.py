@@ -0,0 +1,91 @@
+# encoding: utf-8
+"""
+Running commands in existing containers with the exec API.
+"""
+from __future__ import unicode_literals
+from collections import namedtuple
+import time
+
+
+class ExecResult(namedtuple('ExecResult', ['exit_code', 'output'])):
+    """
+    The outcome of a finished exec.
+
+    `output` is a bytestring, or a (stdout, stderr) pair of bytestrings (or
+    None for a stream that produced nothing) if the exec was demultiplexed.
+    """
+    __slots__ = ()
+
+
+class ExecStream(object):
+    """
+    Incremental output of a running exec.
+
+    Iterating yields chunks of output as the daemon sends them: bytestrings,
+    or (stdout, stderr) pairs with one side None if demultiplexed.  The exit
+    code is available from `exit_code` once the output is exhausted.
+    """
+
+    def __init__(self, client, exec_id, chunks, demux, poll_interval=0.05):
+        self.client = client
+        self.id = exec_id
+        self.demux = demux
+        self.poll_interval = poll_interval
+        self._chunks = iter(chunks)
+        self._exit_code = None
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+    @property
+    def exit_code(self):
+        """
+        The exec's exit code, draining any unread output first.
+        """
+        if self._exit_code is None:
+            for _ in self._chunks:
+                pass
+            while True:
+                details = self.client.exec_inspect(self.id)
+                # The daemon may close the stream slightly before it records
+                # the exit code.
+                if not details['Running']:
+                    self._exit_code = details['ExitCode']
+                    break
+                time.sleep(self.poll_interval)
+        return self._exit_code
+
+    def result(self, callback=None):
+        """
+        Read the rest of the output and return an ExecResult.
+
+        If given, `callback` is called with each chunk as it arrives.
+        """
+        chunks = []
+        for chunk in self._chunks:
+            if callback is not None:
+                callback(chunk)
+            chunks.append(chunk)
+        if self.demux:
+            stdout = b''.join(c[0] for c in chunks if c[0] is not None)
+            stderr = b''.join(c[1] for c in chunks if c[1] is not None)
+            output = (stdout or None, stderr or None)
+        else:
+            output = b''.join(chunks)
+        return ExecResult(self.exit_code, output)
+
+
+def exec_stream(client, container, cmd, demux=False, **kwargs):
+    """
+    Start `cmd` in `container`, returning an ExecStream of its output.
+
+    Extra keyword arguments are passed to `client.exec_create`.
+    """
+    exec_id = client.exec_create(container, cmd, **kwargs)['Id']
+    start_kwargs = {'stream': True}
+    if demux:
+        # Only pass demux when asked, for docker-py releases without it.
+        start_kwargs['demux'] = True
+    chunks = client.exec_start(exec_id, **start_kwargs)
+    return ExecStream(client, exec_id, chunks, demux)
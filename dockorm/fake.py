@@ -0,0 +1,1629 @@
+# encoding: utf-8
+"""
+An in-process stand-in for docker.APIClient.
+
+FakeClient implements the subset of the docker API used by dockorm, with
+enough fidelity for the test suite and benchmarks to run without a docker
+daemon.  Containers "run" a tiny interpreter that understands the handful of
+busybox commands the tests use (echo, sleep, cat, env, true, false, exit and
+`sh -c` scripts); their output and exit status are produced on a real-time
+schedule, so waits and log follows behave as they would against a daemon.
+Pushes and pulls go to a FakeRegistry, which several clients may share.
+"""
+from __future__ import unicode_literals
+from collections import Counter, namedtuple
+from datetime import datetime
+import fnmatch
+import gzip as gzip_module
+from hashlib import sha256
+from io import BytesIO
+import itertools
+import json
+import os
+import re
+import shlex
+import socket
+import struct
+import tarfile
+from threading import (
+    Condition,
+    Event,
+    Lock,
+    RLock,
+    Thread,
+    Timer,
+)
+import time
+
+from docker.errors import (
+    APIError,
+    ImageNotFound,
+    InvalidArgument,
+    NotFound,
+)
+from docker.types import HostConfig
+from docker.utils import datetime_to_timestamp
+from requests.exceptions import ReadTimeout
+from six import (
+    iteritems,
+    itervalues,
+    string_types,
+)
+from six.moves.queue import (
+    Empty,
+    Queue,
+)
+
+from .build import normalize_image_name
+
+
+FOREVER = float('inf')
+
+_STREAM_IDS = {'stdout': 1, 'stderr': 2}
+
+_PATH = '/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin'
+
+# The simulated host reported in stats, and what a running container uses:
+# a quarter of a CPU, a fixed amount of memory and a steady trickle of I/O.
+_NCPU = 2
+_MEM_TOTAL = 2 * 1024 ** 3
+_CPU_SHARE = 0.25
+_MEM_USAGE = 8 * 1024 ** 2
+_MEM_CACHE = 2 * 1024 ** 2
+_NET_RATE = 1000
+_BLK_RATE = 4096
+
+
+class _Response(object):
+    """
+    Enough of requests.Response for docker.errors and streamed reads.
+    """
+
+    def __init__(self, status_code=200, url='', reason='', raw=None):
+        self.status_code = status_code
+        self.url = url
+        self.reason = reason
+        self.raw = raw
+
+    def close(self):
+        if self.raw is not None and hasattr(self.raw, 'close'):
+            self.raw.close()
+
+
+def _error(cls, status_code, message):
+    return cls(
+        message,
+        response=_Response(status_code, reason=message),
+        explanation=message,
+    )
+
+
+def _new_id():
+    return sha256(os.urandom(32)).hexdigest()
+
+
+def _rfc3339(timestamp):
+    if not timestamp:
+        return '0001-01-01T00:00:00Z'
+    # Format the fraction from the float itself: rounding to datetime's
+    # microseconds can give successive writes the same timestamp.
+    seconds = int(timestamp)
+    nanos = int(round((timestamp - seconds) * 1e9))
+    if nanos >= 10 ** 9:
+        seconds, nanos = seconds + 1, nanos - 10 ** 9
+    dt = datetime.utcfromtimestamp(seconds)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.') + '%09dZ' % nanos
+
+
+def _ago(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return '%d seconds' % seconds if seconds > 1 else 'Less than a second'
+    if seconds < 3600:
+        return '%d minutes' % (seconds // 60)
+    return '%d hours' % (seconds // 3600)
+
+
+# Output of a simulated process: an ordered list of (offset, stream, bytes),
+# the total run time, and the exit code.
+Program = namedtuple('Program', ['output', 'duration', 'exit_code'])
+
+
+class _Process(object):
+    """
+    A minimal busybox: interprets a command into a Program.
+    """
+
+    def __init__(self, container, environment=None):
+        self.container = container
+        self.environment = dict(environment or {})
+        self.output = []
+        self.clock = 0.0
+
+    def write(self, stream, data):
+        self.output.append((self.clock, stream, data))
+        # Like the daemon's, timestamps of successive writes differ.
+        self.clock += 1e-6
+
+    def run(self, argv):
+        try:
+            code = self.execute(argv)
+        except _Exit as e:
+            code = e.code
+        return Program(self.output, self.clock, code)
+
+    def execute(self, argv):
+        if not argv:
+            return 0
+        name, args = argv[0], list(argv[1:])
+        if name == 'sh':
+            if len(args) >= 2 and args[0] == '-c':
+                return self.script(args[1])
+            return 0
+        handler = getattr(self, 'cmd_' + name, None)
+        if handler is None:
+            self.write('stderr', ('sh: %s: not found\n' % name).encode())
+            return 127
+        return handler(args)
+
+    def script(self, text):
+        code = 0
+        for statement in re.split(r';|\n', text):
+            words = shlex.split(statement)
+            if not words:
+                continue
+            stream = None
+            for redirect in ('>&2', '1>&2'):
+                if redirect in words:
+                    words.remove(redirect)
+                    stream = 'stderr'
+            before = len(self.output)
+            code = self.execute(words)
+            if stream is not None:
+                self.output[before:] = [
+                    (offset, stream, data)
+                    for offset, _, data in self.output[before:]
+                ]
+        return code
+
+    def cmd_exit(self, args):
+        raise _Exit(int(args[0]) if args else 0)
+
+    def cmd_true(self, args):
+        return 0
+
+    def cmd_false(self, args):
+        return 1
+
+    def cmd_sleep(self, args):
+        seconds = float(args[0]) if args else 0
+        # Anything longer than a day is effectively forever.
+        self.clock += seconds if seconds < 86400 else FOREVER
+        return 0
+
+    def cmd_echo(self, args):
+        newline = True
+        if args and args[0] == '-n':
+            newline, args = False, args[1:]
+        text = ' '.join(args) + ('\n' if newline else '')
+        self.write('stdout', text.encode('utf-8'))
+        return 0
+
+    def cmd_env(self, args):
+        pairs = [
+            (key, value) for key, value in self.container.env_pairs()
+            if key not in self.environment
+        ]
+        pairs.extend(sorted(iteritems(self.environment)))
+        for key, value in pairs:
+            self.write('stdout', ('%s=%s\n' % (key, value)).encode('utf-8'))
+        return 0
+
+    def cmd_hostname(self, args):
+        self.write('stdout', (self.container.hostname + '\n').encode())
+        return 0
+
+    def cmd_cat(self, args):
+        if not args and self.container.stdin_open:
+            # Echo attached stdin until it closes; see FakeClient._echo.
+            self.clock = FOREVER
+            return 0
+        code = 0
+        for path in args:
+            data = self.container.read_file(path)
+            if data is None:
+                self.write('stderr', (
+                    "cat: can't open '%s': No such file or directory\n" % path
+                ).encode('utf-8'))
+                code = 1
+            elif data:
+                self.write('stdout', data)
+        return code
+
+
+class _Exit(Exception):
+    def __init__(self, code):
+        self.code = code
+
+
+class _Image(object):
+
+    def __init__(self, tags, labels=None, parent=''):
+        self.id = 'sha256:' + _new_id()
+        self.tags = list(tags)
+        self.labels = dict(labels or {})
+        self.parent = parent
+        self.repo_digests = []
+        self.created = int(time.time())
+
+    def to_dict(self):
+        return {
+            'Id': self.id,
+            'ParentId': self.parent,
+            'RepoTags': list(self.tags) or ['<none>:<none>'],
+            'RepoDigests': list(self.repo_digests),
+            'Created': self.created,
+            'Size': 0,
+            'VirtualSize': 0,
+            'SharedSize': -1,
+            'Labels': dict(self.labels) or None,
+            'Containers': -1,
+        }
+
+
+def _manifest_digest(image_id):
+    return 'sha256:' + sha256(image_id.encode('ascii')).hexdigest()
+
+
+def _layers(image_id):
+    """
+    Two made-up layer IDs for an image, as shown in push and pull progress.
+    """
+    digest = sha256(image_id.encode('ascii')).hexdigest()
+    return [digest[:12], digest[12:24]]
+
+
+def _encode_messages(messages, decode):
+    if decode:
+        return iter(messages)
+    return iter([
+        json.dumps(message).encode('utf-8') + b'\r\n'
+        for message in messages
+    ])
+
+
+class FakeRegistry(object):
+    """
+    Images pushed by FakeClients.
+
+    Clients created with the same registry see each other's pushes, like
+    daemons sharing a docker registry.
+    """
+
+    _LAYER_SIZE = 1024
+
+    def __init__(self):
+        self._lock = Lock()
+        self._manifests = {}
+
+    def put(self, name, image):
+        digest = _manifest_digest(image.id)
+        with self._lock:
+            self._manifests[name] = (image.id, dict(image.labels), digest)
+        return digest
+
+    def get(self, name):
+        with self._lock:
+            return self._manifests.get(name)
+
+
+class _Container(object):
+
+    def __init__(self, image, image_ref, name, command, environment, labels,
+                 host_config, tty, ports, stdin_open=False):
+        self.id = _new_id()
+        self.hostname = self.id[:12]
+        self.image = image
+        self.image_ref = image_ref
+        self.name = name
+        self.command = command
+        self.environment = environment
+        self.labels = labels
+        self.host_config = host_config
+        self.tty = tty
+        self.stdin_open = stdin_open
+        self.exposed_ports = ports
+        self.created = time.time()
+        self.state = 'created'
+        self.exit_code = 0
+        self.started_at = 0
+        self.finished_at = 0
+        self.program = None
+        self.host_ports = {}
+        self.timer = None
+
+    def env_pairs(self):
+        pairs = [('PATH', _PATH), ('HOSTNAME', self.hostname)]
+        pairs.extend(sorted(iteritems(self.environment)))
+        pairs.append(('HOME', '/root'))
+        return pairs
+
+    def binds(self):
+        out = {}
+        for bind in self.host_config.get('Binds') or ():
+            src, dst, mode = (bind.split(':') + ['rw'])[:3]
+            out[dst] = (src, mode)
+        return out
+
+    def read_file(self, path):
+        if not path.startswith('/'):
+            path = '/' + path
+        binds = self.binds()
+        if path in binds:
+            try:
+                with open(binds[path][0], 'rb') as f:
+                    return f.read()
+            except (IOError, OSError):
+                return None
+        if path == '/etc/hosts':
+            lines = [
+                '127.0.0.1\tlocalhost',
+                '::1\tlocalhost ip6-localhost ip6-loopback',
+            ]
+            for entry in self.host_config.get('ExtraHosts') or ():
+                host, ip = entry.split(':', 1)
+                lines.append('%s\t%s' % (ip, host))
+            lines.append('172.17.0.2\t%s' % self.hostname)
+            return ('\n'.join(lines) + '\n').encode('utf-8')
+        return None
+
+    def elapsed(self, now):
+        end = self.finished_at if self.state != 'running' else now
+        return max(end - self.started_at, 0)
+
+    def output(self, now):
+        """
+        Output produced so far, as (timestamp, stream, line) triples.
+        """
+        if self.program is None:
+            return []
+        elapsed = self.elapsed(now)
+        return [
+            (self.started_at + offset, stream, data)
+            for offset, stream, data in self.program.output
+            if offset <= elapsed
+        ]
+
+    def port_list(self):
+        if self.state != 'running':
+            return []
+        out = []
+        for key, bindings in iteritems(self.host_ports):
+            port, proto = key.split('/')
+            for binding in bindings:
+                out.append({
+                    'IP': binding['HostIp'],
+                    'PrivatePort': int(port),
+                    'PublicPort': int(binding['HostPort']),
+                    'Type': proto,
+                })
+        return out
+
+    def mounts(self):
+        return [
+            {
+                'Type': 'bind',
+                'Source': src,
+                'Destination': dst,
+                'Mode': mode,
+                'RW': mode != 'ro',
+                'Propagation': 'rprivate',
+            }
+            for dst, (src, mode) in sorted(iteritems(self.binds()))
+        ]
+
+    def status_text(self, now):
+        if self.state == 'running':
+            return 'Up ' + _ago(now - self.started_at)
+        if self.state == 'exited':
+            return 'Exited (%d) %s ago' % (
+                self.exit_code, _ago(now - self.finished_at),
+            )
+        return self.state.capitalize()
+
+    def summary(self, now):
+        return {
+            'Id': self.id,
+            'Names': ['/' + self.name],
+            'Image': self.image_ref,
+            'ImageID': self.image.id,
+            'Command': ' '.join(self.command),
+            'Created': int(self.created),
+            'Ports': self.port_list(),
+            'Labels': dict(self.labels),
+            'State': self.state,
+            'Status': self.status_text(now),
+            'HostConfig': {'NetworkMode': self.host_config.get(
+                'NetworkMode', 'default')},
+            'Mounts': self.mounts(),
+        }
+
+    def details(self, now):
+        return {
+            'Id': self.id,
+            'Created': _rfc3339(self.created),
+            'Path': self.command[0] if self.command else '',
+            'Args': self.command[1:],
+            'Name': '/' + self.name,
+            'Image': self.image.id,
+            'State': {
+                'Status': self.state,
+                'Running': self.state == 'running',
+                'Paused': False,
+                'Restarting': False,
+                'OOMKilled': False,
+                'Dead': False,
+                'Pid': 4242 if self.state == 'running' else 0,
+                'ExitCode': self.exit_code,
+                'Error': '',
+                'StartedAt': _rfc3339(self.started_at),
+                'FinishedAt': _rfc3339(self.finished_at),
+            },
+            'Config': {
+                'Hostname': self.hostname,
+                'Image': self.image_ref,
+                'Cmd': list(self.command),
+                'Env': ['%s=%s' % pair for pair in self.env_pairs()
+                        if pair[0] not in ('HOME', 'HOSTNAME')],
+                'Labels': dict(self.labels),
+                'Tty': self.tty,
+                'ExposedPorts': {
+                    key: {} for key in self.exposed_ports
+                },
+            },
+            'HostConfig': dict(self.host_config),
+            'NetworkSettings': {
+                'Ports': (
+                    dict(self.host_ports) if self.state == 'running' else {}
+                ),
+            },
+            'Mounts': self.mounts(),
+        }
+
+
+class _Exec(object):
+
+    def __init__(self, container, cmd, stdout, stderr, tty, environment):
+        self.id = _new_id()
+        self.container = container
+        self.cmd = cmd
+        self.environment = environment
+        self.streams = set()
+        if stdout:
+            self.streams.add('stdout')
+        if stderr:
+            self.streams.add('stderr')
+        self.tty = tty
+        self.running = False
+        self.exit_code = None
+
+
+class _EventStream(object):
+    """
+    An iterator over daemon events that can be closed from another thread.
+    """
+
+    def __init__(self, client, queue, decode, filters=None):
+        self._client = client
+        self._queue = queue
+        self._decode = decode
+        self._filters = filters or {}
+        self._closed = False
+
+    def _matches(self, event):
+        for key, value in iteritems(self._filters):
+            values = value if isinstance(value, list) else [value]
+            if key == 'container':
+                found = [
+                    event['id'], event['Actor']['Attributes'].get('name'),
+                ]
+            elif key == 'event':
+                found = [event['Action']]
+            elif key == 'type':
+                found = [event['Type']]
+            else:
+                continue
+            if not any(v in found for v in values):
+                return False
+        return True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._closed:
+            try:
+                event = self._queue.get(timeout=0.05)
+            except Empty:
+                continue
+            if event is None:
+                break
+            if not self._matches(event):
+                continue
+            return event if self._decode else json.dumps(event).encode()
+        raise StopIteration
+
+    next = __next__
+
+    def close(self):
+        self._closed = True
+        self._client._unsubscribe(self._queue)
+
+
+class _LogStream(object):
+    """
+    A log stream that, like docker-py's CancellableStream, can be closed
+    from another thread to end a follow.
+    """
+
+    def __init__(self, client, payloads):
+        self._client = client
+        self._closed = Event()
+        self._payloads = payloads(self._closed)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed.is_set():
+            raise StopIteration
+        return next(self._payloads)
+
+    next = __next__
+
+    def close(self):
+        self._closed.set()
+        with self._client._lock:
+            self._client._changed.notify_all()
+
+
+class FakeClient(object):
+    """
+    An in-process stand-in for docker.APIClient.
+
+    `latency` seconds are slept at the start of every API call, to simulate
+    a remote daemon.  `base_images` are available to FROM and
+    create_container without being built.  `calls` counts the API calls
+    made and `received` the approximate number of response bytes the
+    daemon would have sent, both by method name.
+    """
+
+    api_version = '1.35'
+
+    def __init__(self, latency=0.0, base_images=('busybox:latest',),
+                 stats_interval=0.1, registry=None):
+        self.latency = latency
+        self.stats_interval = stats_interval
+        self.registry = registry if registry is not None else FakeRegistry()
+        self.calls = Counter()
+        self.received = Counter()
+        self.base_url = 'fake://'
+        self._lock = RLock()
+        self._changed = Condition(self._lock)
+        self._containers = {}
+        self._images = {}
+        self._execs = {}
+        self._subscribers = []
+        self._next_port = itertools.count(32768)
+        for name in base_images:
+            self._add_image(_Image([normalize_image_name(name)]))
+
+    # Bookkeeping.
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _reply(self, name, value):
+        if isinstance(value, bytes):
+            self.received[name] += len(value)
+        else:
+            self.received[name] += len(json.dumps(value))
+        return value
+
+    def reset_calls(self):
+        self.calls.clear()
+        self.received.clear()
+
+    def populate(self, count, image='busybox:latest', running=False,
+                 prefix='filler'):
+        """
+        Add `count` containers that are not managed by dockorm, to simulate
+        a busy host.
+        """
+        found = self._find_image(image)
+        now = time.time()
+        with self._lock:
+            for i in range(count):
+                container = _Container(
+                    image=found,
+                    image_ref=image,
+                    name='%s-%d-%s' % (prefix, i, _new_id()[:6]),
+                    command=['sleep', '2147483647'] if running else ['true'],
+                    environment={},
+                    labels={},
+                    host_config={'NetworkMode': 'bridge'},
+                    tty=False,
+                    ports=[],
+                )
+                container.program = Program([], FOREVER, 0)
+                container.state = 'running' if running else 'exited'
+                container.started_at = now
+                container.finished_at = 0 if running else now
+                self._containers[container.id] = container
+
+    def close(self):
+        pass
+
+    def _emit(self, container, action):
+        now = time.time()
+        attributes = dict(container.labels)
+        attributes.update(name=container.name, image=container.image_ref)
+        event = {
+            'Type': 'container',
+            'Action': action,
+            'status': action,
+            'id': container.id,
+            'from': container.image_ref,
+            'Actor': {'ID': container.id, 'Attributes': attributes},
+            'time': int(now),
+            'timeNano': int(now * 1e9),
+        }
+        for queue in list(self._subscribers):
+            queue.put(event)
+
+    def _unsubscribe(self, queue):
+        with self._lock:
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
+        queue.put(None)
+
+    def _find_container(self, ref):
+        if isinstance(ref, dict):
+            ref = ref.get('Id') or ref.get('id')
+        with self._lock:
+            if ref in self._containers:
+                return self._containers[ref]
+            name = ref.lstrip('/')
+            for container in itervalues(self._containers):
+                if container.name == name:
+                    return container
+            matches = [
+                c for c in itervalues(self._containers) if c.id.startswith(ref)
+            ]
+            if len(matches) == 1:
+                return matches[0]
+        raise _error(NotFound, 404, 'No such container: %s' % ref)
+
+    def _add_image(self, image):
+        for tag in image.tags:
+            for other in list(itervalues(self._images)):
+                if other is not image and tag in other.tags:
+                    other.tags.remove(tag)
+                    if not other.tags:
+                        del self._images[other.id]
+        self._images[image.id] = image
+        return image
+
+    def _find_image(self, ref):
+        if isinstance(ref, dict):
+            ref = ref.get('Id')
+        with self._lock:
+            if ref in self._images:
+                return self._images[ref]
+            name = normalize_image_name(ref)
+            for image in itervalues(self._images):
+                if name in image.tags:
+                    return image
+                if image.id.startswith(ref) or \
+                        image.id.startswith('sha256:' + ref):
+                    return image
+        raise _error(ImageNotFound, 404, 'No such image: %s' % ref)
+
+    def _finish(self, container, exit_code, action='die'):
+        with self._lock:
+            if container.state != 'running':
+                return
+            if container.timer is not None:
+                container.timer.cancel()
+                container.timer = None
+            container.state = 'exited'
+            container.exit_code = exit_code
+            container.finished_at = time.time()
+            self._emit(container, action)
+            if action != 'die':
+                self._emit(container, 'die')
+            self._changed.notify_all()
+
+    # Containers.
+
+    def create_host_config(self, *args, **kwargs):
+        return HostConfig(self.api_version, *args, **kwargs)
+
+    def create_container(self, image, command=None, detach=False,
+                         stdin_open=False, tty=False, ports=None,
+                         environment=None, volumes=None, name=None,
+                         host_config=None, labels=None, **kwargs):
+        self._call('create_container')
+        found = self._find_image(image)
+        if isinstance(command, string_types):
+            command = shlex.split(command)
+        if isinstance(environment, (list, tuple)):
+            environment = dict(e.split('=', 1) for e in environment)
+        exposed = []
+        for port in ports or ():
+            if isinstance(port, tuple):
+                exposed.append('%s/%s' % port)
+            else:
+                exposed.append('%s/tcp' % port)
+        with self._lock:
+            if name is None:
+                name = 'fake_%s' % _new_id()[:8]
+            if any(c.name == name for c in itervalues(self._containers)):
+                raise _error(
+                    APIError, 409,
+                    'Conflict. The container name "/%s" is already in use.'
+                    % name,
+                )
+            container = _Container(
+                image=found,
+                image_ref=image,
+                name=name,
+                command=list(command or ['sh']),
+                environment=dict(environment or {}),
+                labels=dict(labels or {}),
+                host_config=dict(host_config or {}),
+                tty=tty,
+                ports=exposed,
+                stdin_open=stdin_open,
+            )
+            self._containers[container.id] = container
+            self._emit(container, 'create')
+        return self._reply(
+            'create_container', {'Id': container.id, 'Warnings': None},
+        )
+
+    def start(self, container, **kwargs):
+        self._call('start')
+        container = self._find_container(container)
+        with self._lock:
+            if container.state == 'running':
+                return
+            container.program = _Process(container).run(container.command)
+            container.state = 'running'
+            container.started_at = time.time()
+            container.finished_at = 0
+            container.host_ports = {}
+            for key, bindings in iteritems(
+                    container.host_config.get('PortBindings') or {}):
+                container.host_ports[key] = [
+                    {
+                        'HostIp': b.get('HostIp') or '0.0.0.0',
+                        'HostPort': b.get('HostPort') or str(
+                            next(self._next_port)),
+                    }
+                    for b in bindings
+                ]
+            self._emit(container, 'start')
+            self._changed.notify_all()
+            duration = container.program.duration
+            if duration == 0:
+                self._finish(container, container.program.exit_code)
+            elif duration != FOREVER:
+                container.timer = Timer(
+                    duration,
+                    self._finish,
+                    args=(container, container.program.exit_code),
+                )
+                container.timer.daemon = True
+                container.timer.start()
+
+    def stop(self, container, timeout=None):
+        self._call('stop')
+        self._finish(self._find_container(container), 143, 'stop')
+
+    def kill(self, container, signal=None):
+        self._call('kill')
+        self._finish(self._find_container(container), 137, 'kill')
+
+    def wait(self, container, timeout=None, condition=None):
+        self._call('wait')
+        container = self._find_container(container)
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while container.state == 'running':
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise ReadTimeout('Read timed out.')
+                self._changed.wait(remaining)
+            return self._reply(
+                'wait', {'StatusCode': container.exit_code, 'Error': None},
+            )
+
+    def remove_container(self, container, v=False, link=False, force=False):
+        self._call('remove_container')
+        container = self._find_container(container)
+        with self._lock:
+            if container.state == 'running':
+                if not force:
+                    raise _error(
+                        APIError, 409,
+                        'You cannot remove a running container %s.'
+                        % container.id,
+                    )
+                self._finish(container, 137, 'kill')
+            del self._containers[container.id]
+            self._emit(container, 'destroy')
+
+    def _matches_filters(self, container, filters):
+        for key, value in iteritems(filters or {}):
+            values = value if isinstance(value, list) else [value]
+            if key == 'name':
+                names = ['/' + container.name]
+                if not any(re.search(v, n) for v in values for n in names):
+                    return False
+            elif key == 'id':
+                if not any(container.id.startswith(v) for v in values):
+                    return False
+            elif key == 'status':
+                if container.state not in values:
+                    return False
+            elif key == 'label':
+                for label in values:
+                    k, sep, v = label.partition('=')
+                    if k not in container.labels:
+                        return False
+                    if sep and container.labels[k] != v:
+                        return False
+            elif key == 'label!':
+                for label in values:
+                    k, sep, v = label.partition('=')
+                    if k in container.labels and (
+                            not sep or container.labels[k] == v):
+                        return False
+            elif key == 'ancestor':
+                if not any(normalize_image_name(v) in container.image.tags
+                           for v in values):
+                    return False
+        return True
+
+    def containers(self, quiet=False, all=False, trunc=False, latest=False,
+                   since=None, before=None, limit=-1, size=False,
+                   filters=None):
+        self._call('containers')
+        now = time.time()
+        with self._lock:
+            found = [
+                c for c in itervalues(self._containers)
+                if (all or c.state == 'running') and
+                self._matches_filters(c, filters)
+            ]
+            found.sort(key=lambda c: c.created, reverse=True)
+            if quiet:
+                return self._reply('containers', [{'Id': c.id} for c in found])
+            return self._reply(
+                'containers', [c.summary(now) for c in found],
+            )
+
+    def inspect_container(self, container):
+        self._call('inspect_container')
+        container = self._find_container(container)
+        with self._lock:
+            return self._reply(
+                'inspect_container', container.details(time.time()),
+            )
+
+    def prune_containers(self, filters=None):
+        self._call('prune_containers')
+        deleted = []
+        with self._lock:
+            for container in list(itervalues(self._containers)):
+                if container.state == 'running':
+                    continue
+                if not self._matches_filters(container, filters):
+                    continue
+                del self._containers[container.id]
+                self._emit(container, 'destroy')
+                deleted.append(container.id)
+        return self._reply(
+            'prune_containers',
+            {'ContainersDeleted': deleted or None, 'SpaceReclaimed': 0},
+        )
+
+    def events(self, since=None, until=None, filters=None, decode=None):
+        self._call('events')
+        queue = Queue()
+        with self._lock:
+            self._subscribers.append(queue)
+        return _EventStream(self, queue, decode, filters)
+
+    # Attach.
+
+    def attach_socket(self, container, params=None, ws=False):
+        """
+        Return one end of a socket pair standing in for the daemon's hijacked
+        attach connection.
+        """
+        self._call('attach_socket')
+        container = self._find_container(container)
+        params = params or {}
+        client_end, server_end = socket.socketpair()
+        send_lock = Lock()
+        streams = set(s for s in ('stdout', 'stderr') if params.get(s))
+        if params.get('stdin') and container.command == ['cat']:
+            thread = Thread(
+                target=self._echo,
+                args=(container, server_end, send_lock, streams),
+            )
+            thread.daemon = True
+            thread.start()
+        thread = Thread(
+            target=self._attach_output,
+            args=(container, server_end, send_lock, streams),
+        )
+        thread.daemon = True
+        thread.start()
+        return client_end
+
+    def _send_frame(self, container, sock, send_lock, stream, data):
+        frame = self._frame(container, stream, data, None, False)
+        self._reply('attach_socket', frame)
+        with send_lock:
+            try:
+                sock.sendall(frame)
+            except socket.error:
+                # The instance stopped and the connection was closed.
+                pass
+
+    def _echo(self, container, sock, send_lock, streams):
+        """
+        Play `cat` with no arguments: copy attached stdin to stdout, and
+        exit once stdin closes.  Other programs ignore stdin.
+        """
+        with self._lock:
+            while container.state == 'created':
+                self._changed.wait()
+        while True:
+            try:
+                data = sock.recv(4096)
+            except socket.error:
+                data = b''
+            if not data:
+                break
+            with self._lock:
+                if container.state != 'running':
+                    break
+                container.program.output.append(
+                    (time.time() - container.started_at, 'stdout', data)
+                )
+            if 'stdout' in streams:
+                self._send_frame(container, sock, send_lock, 'stdout', data)
+        self._finish(container, 0)
+
+    def _attach_output(self, container, sock, send_lock, streams):
+        """
+        Send an instance's output as it is produced, closing the connection
+        when it stops.
+        """
+        with self._lock:
+            while container.state == 'created':
+                self._changed.wait()
+            program = container.program
+        for offset, stream, data in self._scheduled(container, program, 0):
+            if stream in streams:
+                self._send_frame(container, sock, send_lock, stream, data)
+        with self._lock:
+            while container.state == 'running':
+                self._changed.wait()
+        with send_lock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            sock.close()
+
+    # Exec.
+
+    def exec_create(self, container, cmd, stdout=True, stderr=True,
+                    stdin=False, tty=False, privileged=False, user='',
+                    environment=None, workdir=None, detach_keys=None):
+        self._call('exec_create')
+        container = self._find_container(container)
+        if container.state != 'running':
+            raise _error(
+                APIError, 409, 'Container %s is not running' % container.id,
+            )
+        if isinstance(cmd, string_types):
+            cmd = shlex.split(cmd)
+        if isinstance(environment, (list, tuple)):
+            environment = dict(e.split('=', 1) for e in environment)
+        with self._lock:
+            exec_ = _Exec(
+                container, list(cmd), stdout, stderr, tty, environment or {},
+            )
+            self._execs[exec_.id] = exec_
+        return self._reply('exec_create', {'Id': exec_.id})
+
+    def _find_exec(self, exec_id):
+        if isinstance(exec_id, dict):
+            exec_id = exec_id.get('Id')
+        try:
+            return self._execs[exec_id]
+        except KeyError:
+            raise _error(NotFound, 404, 'No such exec instance: %s' % exec_id)
+
+    def _wait_until(self, container, due):
+        """
+        Block until `due`, or until the container stops.  Returns False if
+        the container stopped first.
+        """
+        with self._lock:
+            while container.state == 'running':
+                remaining = due - time.time()
+                if remaining <= 0:
+                    return True
+                self._changed.wait(None if due == FOREVER else remaining)
+            return False
+
+    def _exec_output(self, exec_, demux):
+        program = _Process(
+            exec_.container, exec_.environment,
+        ).run(exec_.cmd)
+        started = time.time()
+        try:
+            for offset, stream, data in program.output:
+                if not self._wait_until(exec_.container, started + offset):
+                    return
+                if stream not in exec_.streams:
+                    continue
+                self._reply('exec_start', data)
+                if demux:
+                    yield (data, None) if stream == 'stdout' else (None, data)
+                else:
+                    yield data
+            if not self._wait_until(exec_.container,
+                                    started + program.duration):
+                return
+            exec_.exit_code = program.exit_code
+        finally:
+            if exec_.exit_code is None:
+                # Killed along with its container.
+                exec_.exit_code = 137
+            exec_.running = False
+
+    def exec_start(self, exec_id, detach=False, tty=False, stream=False,
+                   socket=False, demux=False):
+        self._call('exec_start')
+        exec_ = self._find_exec(exec_id)
+        exec_.running = True
+        output = self._exec_output(exec_, demux)
+        if detach:
+            thread = Timer(0, lambda: list(output))
+            thread.daemon = True
+            thread.start()
+            return b''
+        if stream:
+            return output
+        chunks = list(output)
+        if not demux:
+            return b''.join(chunks)
+        stdout = b''.join(c[0] for c in chunks if c[0] is not None)
+        stderr = b''.join(c[1] for c in chunks if c[1] is not None)
+        return (stdout or None, stderr or None)
+
+    def exec_inspect(self, exec_id):
+        self._call('exec_inspect')
+        exec_ = self._find_exec(exec_id)
+        return self._reply('exec_inspect', {
+            'ID': exec_.id,
+            'Running': exec_.running,
+            'ExitCode': exec_.exit_code,
+            'ContainerID': exec_.container.id,
+            'ProcessConfig': {
+                'entrypoint': exec_.cmd[0] if exec_.cmd else '',
+                'arguments': exec_.cmd[1:],
+                'tty': exec_.tty,
+            },
+        })
+
+    # Stats.
+
+    def _stats_document(self, container, now):
+        running = container.state == 'running'
+        elapsed = container.elapsed(now)
+        before = max(elapsed - self.stats_interval, 0)
+
+        def cpu(at, elapsed):
+            return {
+                'cpu_usage': {
+                    'total_usage': int(elapsed * _CPU_SHARE * 1e9),
+                    'percpu_usage': [int(elapsed * _CPU_SHARE * 1e9), 0],
+                },
+                'system_cpu_usage': int(at * _NCPU * 1e9),
+                'online_cpus': _NCPU,
+            }
+
+        if not running:
+            return {
+                'id': container.id,
+                'name': '/' + container.name,
+                'read': '0001-01-01T00:00:00Z',
+                'cpu_stats': {'cpu_usage': {'total_usage': 0}},
+                'precpu_stats': {'cpu_usage': {'total_usage': 0}},
+                'memory_stats': {},
+                'blkio_stats': {},
+                'pids_stats': {},
+            }
+        return {
+            'id': container.id,
+            'name': '/' + container.name,
+            'read': _rfc3339(now),
+            'preread': _rfc3339(now - (elapsed - before)),
+            'cpu_stats': cpu(now, elapsed),
+            'precpu_stats': cpu(now - (elapsed - before), before),
+            'memory_stats': {
+                'usage': _MEM_USAGE + _MEM_CACHE,
+                'limit': container.host_config.get('Memory') or _MEM_TOTAL,
+                'stats': {'cache': _MEM_CACHE, 'rss': _MEM_USAGE},
+            },
+            'networks': {
+                'eth0': {
+                    'rx_bytes': int(elapsed * _NET_RATE),
+                    'tx_bytes': int(elapsed * _NET_RATE // 2),
+                },
+            },
+            'blkio_stats': {
+                'io_service_bytes_recursive': [
+                    {'major': 8, 'minor': 0, 'op': 'Read',
+                     'value': int(elapsed * _BLK_RATE)},
+                    {'major': 8, 'minor': 0, 'op': 'Write', 'value': 0},
+                ],
+            },
+            'pids_stats': {'current': 1},
+        }
+
+    def _stats_stream(self, container, decode):
+        while True:
+            with self._lock:
+                document = self._stats_document(container, time.time())
+                running = container.state == 'running'
+            if decode:
+                yield self._reply('stats', document)
+            else:
+                yield self._reply(
+                    'stats', json.dumps(document).encode('utf-8'),
+                )
+            if not running:
+                return
+            due = time.time() + self.stats_interval
+            with self._lock:
+                while container.state == 'running':
+                    remaining = due - time.time()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+
+    def stats(self, container, decode=None, stream=True, one_shot=None):
+        """
+        Report synthetic usage every `stats_interval` seconds, ending after
+        the container stops.
+        """
+        if decode and not stream:
+            raise InvalidArgument(
+                'decode is only available in conjunction with stream=True'
+            )
+        self._call('stats')
+        container = self._find_container(container)
+        if stream:
+            return self._stats_stream(container, decode)
+        with self._lock:
+            return self._reply(
+                'stats', self._stats_document(container, time.time()),
+            )
+
+    # Logs.
+
+    def _log_lines(self, container, params, now):
+        streams = set()
+        if params.get('stdout', 1):
+            streams.add('stdout')
+        if params.get('stderr', 1):
+            streams.add('stderr')
+        since = float(params.get('since') or 0)
+        lines = []
+        for timestamp, stream, data in container.output(now):
+            if stream not in streams or timestamp < since:
+                continue
+            for line in data.splitlines(True):
+                lines.append((timestamp, stream, line))
+        tail = params.get('tail', 'all')
+        if tail != 'all' and tail is not None:
+            lines = lines[-int(tail):] if int(tail) else []
+        return lines
+
+    def _frame(self, container, stream, line, timestamp, timestamps):
+        if timestamps:
+            line = _rfc3339(timestamp).encode('ascii') + b' ' + line
+        if container.tty:
+            return line
+        return struct.pack('>BxxxL', _STREAM_IDS[stream], len(line)) + line
+
+    def logs(self, container, stdout=True, stderr=True, stream=False,
+             timestamps=False, tail='all', since=None, follow=None,
+             until=None):
+        """
+        Like docker-py, return the log output as bytes, or with `stream` a
+        closeable iterator of each frame's payload.
+        """
+        self._call('logs')
+        container = self._find_container(container)
+        if isinstance(since, datetime):
+            since = datetime_to_timestamp(since)
+        params = {
+            'stdout': stdout, 'stderr': stderr, 'tail': tail, 'since': since,
+            'timestamps': timestamps, 'follow': follow,
+        }
+        if stream:
+            return _LogStream(self, lambda closed: self._follow_payloads(
+                container, params, closed,
+            ))
+        with self._lock:
+            lines = self._log_lines(container, params, time.time())
+        output = b''.join(
+            (_rfc3339(ts).encode('ascii') + b' ' if timestamps else b'') +
+            line
+            for ts, _, line in lines
+        )
+        return self._reply('logs', output)
+
+    def _scheduled(self, container, program, start, closed=None):
+        """
+        Yield a program's output from index `start` as it falls due, ending
+        early if the container stops or `closed` is set first.
+        """
+        for offset, stream, data in program.output[start:]:
+            with self._lock:
+                while container.state == 'running':
+                    if closed is not None and closed.is_set():
+                        return
+                    remaining = container.started_at + offset - time.time()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+                if offset > container.elapsed(time.time()):
+                    # Stopped before this output was produced.
+                    return
+            yield offset, stream, data
+
+    def _follow_payloads(self, container, params, closed):
+        """
+        Generate log payloads, waiting for scheduled output while following,
+        until the container stops or `closed` is set.
+        """
+        def payload(stream, line, timestamp):
+            if params.get('timestamps'):
+                line = _rfc3339(timestamp).encode('ascii') + b' ' + line
+            return self._reply('logs', line)
+
+        with self._lock:
+            now = time.time()
+            lines = self._log_lines(container, params, now)
+            program = container.program
+            sent = len(container.output(now))
+        for timestamp, stream, line in lines:
+            yield payload(stream, line, timestamp)
+        if not params.get('follow') or program is None:
+            return
+        streams = set(s for s in ('stdout', 'stderr') if params.get(s, 1))
+        for offset, stream, data in self._scheduled(
+                container, program, sent, closed):
+            if stream in streams:
+                for line in data.splitlines(True):
+                    yield payload(
+                        stream, line, container.started_at + offset,
+                    )
+        # Like the daemon, a follow ends only when the container stops.
+        with self._lock:
+            while container.state == 'running' and not closed.is_set():
+                self._changed.wait()
+
+    # Images.
+
+    def _read_dockerfile(self, path, fileobj, custom_context, encoding):
+        if path is not None and not custom_context:
+            with open(os.path.join(path, 'Dockerfile'), 'rb') as f:
+                return f.read().decode('utf-8')
+        data = fileobj.read()
+        if encoding == 'gzip':
+            data = gzip_module.GzipFile(fileobj=BytesIO(data)).read()
+        with tarfile.open(fileobj=BytesIO(data)) as tar:
+            return tar.extractfile('Dockerfile').read().decode('utf-8')
+
+    def build(self, path=None, tag=None, quiet=False, fileobj=None,
+              nocache=False, rm=False, timeout=None, custom_context=False,
+              encoding=None, pull=False, forcerm=False, dockerfile=None,
+              container_limits=None, decode=False, buildargs=None,
+              gzip=False, shmsize=None, labels=None, **kwargs):
+        self._call('build')
+        dockerfile_text = self._read_dockerfile(
+            path, fileobj, custom_context, encoding,
+        )
+        instructions = [
+            line.strip() for line in dockerfile_text.splitlines()
+            if line.strip() and not line.strip().startswith('#')
+        ]
+        messages = []
+
+        def stream(text):
+            messages.append({'stream': text})
+
+        short = lambda i: i.replace('sha256:', '')[:12]  # noqa
+        parent = None
+        for i, instruction in enumerate(instructions, 1):
+            stream('Step %d/%d : %s\n' % (i, len(instructions), instruction))
+            keyword, _, rest = instruction.partition(' ')
+            if keyword.upper() == 'FROM':
+                ref = rest.split()[0]
+                try:
+                    parent = self._find_image(ref)
+                except NotFound:
+                    repo = ref.rsplit(':', 1)[0]
+                    message = (
+                        "pull access denied for %s, repository does not "
+                        "exist or may require 'docker login'" % repo
+                    )
+                    messages.append({
+                        'errorDetail': {'message': message},
+                        'error': message,
+                    })
+                    break
+                stream(' ---> %s\n' % short(parent.id))
+                continue
+            intermediate = _new_id()[:12]
+            stream(' ---> Running in %s\n' % intermediate)
+            if keyword.upper() == 'RUN':
+                words = shlex.split(rest)
+                if words[:1] == ['echo']:
+                    stream(' '.join(words[1:]) + '\n')
+            if rm:
+                stream('Removing intermediate container %s\n' % intermediate)
+            with self._lock:
+                parent = _Image([], parent=parent.id if parent else '')
+            stream(' ---> %s\n' % short(parent.id))
+        else:
+            with self._lock:
+                image = _Image(
+                    [normalize_image_name(tag)] if tag else [],
+                    labels=labels,
+                    parent=parent.id if parent else '',
+                )
+                self._add_image(image)
+            messages.append({'aux': {'ID': image.id}})
+            stream('Successfully built %s\n' % short(image.id))
+            if tag:
+                stream('Successfully tagged %s\n' % normalize_image_name(tag))
+
+        return _encode_messages(messages, decode)
+
+    def _transfer_messages(self, image_id, verbs):
+        """
+        Progress messages for moving each layer of an image through the
+        phases in `verbs`: (status, active status, done status).
+        """
+        messages = []
+        size = FakeRegistry._LAYER_SIZE
+        for layer in _layers(image_id):
+            start, active, done = verbs
+            messages.append({
+                'status': start, 'progressDetail': {}, 'id': layer,
+            })
+            for current in (size // 2, size):
+                messages.append({
+                    'status': active,
+                    'progressDetail': {'current': current, 'total': size},
+                    'progress': '[%s>%s] %d B/%d B' % (
+                        '=' * (current * 10 // size),
+                        ' ' * (10 - current * 10 // size),
+                        current, size,
+                    ),
+                    'id': layer,
+                })
+            messages.append({
+                'status': done, 'progressDetail': {}, 'id': layer,
+            })
+        return messages
+
+    def push(self, repository, tag=None, stream=False, auth_config=None,
+             decode=False):
+        self._call('push')
+        name = normalize_image_name(
+            repository + (':' + tag if tag else '')
+        )
+        try:
+            image = self._find_image(name)
+        except NotFound:
+            message = 'An image does not exist locally with the tag: %s' % (
+                repository,
+            )
+            messages = [{'errorDetail': {'message': message},
+                         'error': message}]
+        else:
+            messages = [{
+                'status': 'The push refers to repository [%s]' % repository,
+            }]
+            messages.extend(self._transfer_messages(
+                image.id, ('Preparing', 'Pushing', 'Pushed'),
+            ))
+            digest = self.registry.put(name, image)
+            with self._lock:
+                reference = '%s@%s' % (repository, digest)
+                if reference not in image.repo_digests:
+                    image.repo_digests.append(reference)
+            tag = name.rpartition(':')[2]
+            messages.append({
+                'status': '%s: digest: %s size: 527' % (tag, digest),
+            })
+            messages.append({
+                'progressDetail': {},
+                'aux': {'Tag': tag, 'Digest': digest, 'Size': 527},
+            })
+        if not stream:
+            return b''.join(_encode_messages(messages, False))
+        return _encode_messages(messages, decode)
+
+    def pull(self, repository, tag=None, stream=False, auth_config=None,
+             decode=False, platform=None, all_tags=False):
+        self._call('pull')
+        name = normalize_image_name(
+            repository + (':' + tag if tag else '')
+        )
+        manifest = self.registry.get(name)
+        if manifest is None:
+            raise _error(
+                NotFound, 404,
+                'manifest for %s not found: manifest unknown' % name,
+            )
+        image_id, labels, digest = manifest
+        messages = [{
+            'status': 'Pulling from %s' % repository,
+            'id': name.rpartition(':')[2],
+        }]
+        with self._lock:
+            current = self._images.get(image_id)
+            up_to_date = current is not None and name in current.tags
+        if up_to_date:
+            messages.append({'status': 'Digest: %s' % digest})
+            messages.append({
+                'status': 'Status: Image is up to date for %s' % name,
+            })
+        else:
+            messages.extend(self._transfer_messages(
+                image_id,
+                ('Pulling fs layer', 'Downloading', 'Pull complete'),
+            ))
+            with self._lock:
+                image = self._images.get(image_id)
+                if image is None:
+                    image = _Image([], labels=labels)
+                    image.id = image_id
+                if name not in image.tags:
+                    image.tags.append(name)
+                self._add_image(image)
+                reference = '%s@%s' % (repository, digest)
+                if reference not in image.repo_digests:
+                    image.repo_digests.append(reference)
+            messages.append({'status': 'Digest: %s' % digest})
+            messages.append({
+                'status': 'Status: Downloaded newer image for %s' % name,
+            })
+        if not stream:
+            return b''.join(_encode_messages(messages, False))
+        return _encode_messages(messages, decode)
+
+    def inspect_distribution(self, image, auth_config=None):
+        self._call('inspect_distribution')
+        manifest = self.registry.get(normalize_image_name(image))
+        if manifest is None:
+            raise _error(
+                NotFound, 404, 'manifest for %s not found' % image,
+            )
+        return self._reply('inspect_distribution', {
+            'Descriptor': {
+                'mediaType':
+                    'application/vnd.docker.distribution.manifest.v2+json',
+                'digest': manifest[2],
+                'size': 527,
+            },
+            'Platforms': [{'architecture': 'amd64', 'os': 'linux'}],
+        })
+
+    def images(self, name=None, quiet=False, all=False, filters=None):
+        self._call('images')
+        with self._lock:
+            found = []
+            for image in itervalues(self._images):
+                if name is not None and not self._image_matches(image, name):
+                    continue
+                if not self._image_matches_filters(image, filters):
+                    continue
+                found.append(image)
+            found.sort(key=lambda i: i.created, reverse=True)
+            if quiet:
+                return self._reply('images', [image.id for image in found])
+            return self._reply(
+                'images', [image.to_dict() for image in found],
+            )
+
+    @staticmethod
+    def _image_matches(image, name):
+        for tag in image.tags:
+            repo = tag.rsplit(':', 1)[0]
+            if any(c in name for c in '*?['):
+                if fnmatch.fnmatch(repo, name) or fnmatch.fnmatch(tag, name):
+                    return True
+            elif ':' in name.rsplit('/', 1)[-1]:
+                if tag == name:
+                    return True
+            elif repo == name:
+                return True
+        return False
+
+    @staticmethod
+    def _image_matches_filters(image, filters):
+        for key, value in iteritems(filters or {}):
+            values = value if isinstance(value, list) else [value]
+            if key == 'label':
+                for label in values:
+                    k, sep, v = label.partition('=')
+                    if k not in image.labels:
+                        return False
+                    if sep and image.labels[k] != v:
+                        return False
+            elif key == 'dangling':
+                if bool(image.tags) == (str(value).lower() == 'true'):
+                    return False
+        return True
+
+    def inspect_image(self, image):
+        self._call('inspect_image')
+        found = self._find_image(image)
+        details = found.to_dict()
+        details['Config'] = {
+            'Cmd': ['sh'],
+            'Env': ['PATH=' + _PATH],
+            'ExposedPorts': None,
+            'Labels': dict(found.labels),
+        }
+        return details
+
+    def remove_image(self, image, force=False, noprune=False):
+        self._call('remove_image')
+        found = self._find_image(image)
+        with self._lock:
+            in_use = [
+                c for c in itervalues(self._containers) if c.image is found
+            ]
+            if in_use and not force:
+                raise _error(
+                    APIError, 409,
+                    'conflict: unable to remove repository reference (must '
+                    'force) - container %s is using its referenced image %s'
+                    % (in_use[0].id[:12], found.id[7:19]),
+                )
+            del self._images[found.id]
+        return [{'Untagged': tag} for tag in found.tags] + [
+            {'Deleted': found.id},
+        ]
@@ -0,0 +1,285 @@
+# encoding: utf-8
+"""
+Running Container specs on several docker daemons.
+
+    fleet = Fleet.from_urls({
+        'web1': 'tcp://web1:2376',
+        'web2': 'tcp://web2:2376',
+    }, tls_verify=True)
+    fleet.run(spec)                    # on every host
+    fleet.deploy(specs)                # each spec on the least loaded host
+    fleet.instances(spec)              # merged, each with a 'Host' key
+
+Operations on different hosts run concurrently, over one shared client per
+daemon, and failures on one host do not stop the others.
+"""
+from __future__ import unicode_literals
+from collections import namedtuple, OrderedDict
+from copy import copy
+
+from six import iteritems
+from traitlets import (
+    HasTraits,
+    Instance,
+    Integer,
+    List,
+)
+
+from .clients import get_client
+from .parallel import (
+    DEFAULT_MAX_WORKERS,
+    map_concurrent,
+)
+
+
+# Key added to instance and image descriptions from a Fleet, naming the host
+# they came from.
+HOST_KEY = 'Host'
+
+
+class FleetError(Exception):
+    """
+    Raised when listing fails on some hosts.
+
+    `errors` maps host names to the exceptions raised, and `partial` holds
+    what was listed on the other hosts.
+    """
+
+    def __init__(self, errors, partial):
+        super(FleetError, self).__init__(
+            "Failed on %s" % ', '.join(
+                '{} ({})'.format(name, error)
+                for name, error in iteritems(errors)
+            )
+        )
+        self.errors = errors
+        self.partial = partial
+
+
+class Host(namedtuple('Host', ['name', 'client'])):
+    """
+    A named docker daemon.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_url(cls, name, url, cert_path=None, tls_verify=False,
+                 assert_hostname=None, max_pool_size=None):
+        """
+        A Host using the shared client for the daemon at `url`, configured
+        as kwargs_from_env would be by the equivalent DOCKER_* variables.
+        """
+        environment = {'DOCKER_HOST': url}
+        if cert_path is not None:
+            environment['DOCKER_CERT_PATH'] = cert_path
+        if tls_verify:
+            environment['DOCKER_TLS_VERIFY'] = '1'
+        return cls(name, get_client(
+            assert_hostname=assert_hostname,
+            max_pool_size=max_pool_size,
+            environment=environment,
+        ))
+
+
+def spread_by_load(containers, loads):
+    """
+    Placement policy: put each Container on the host with the fewest running
+    containers, counting those already placed.
+    """
+    loads = OrderedDict(loads)
+    out = []
+    for _ in containers:
+        host = min(loads, key=lambda h: loads[h])
+        loads[host] += 1
+        out.append(host)
+    return out
+
+
+def round_robin(containers, loads):
+    """
+    Placement policy: deal Containers out to hosts in turn, ignoring load.
+    """
+    hosts = list(loads)
+    return [hosts[i % len(hosts)] for i in range(len(containers))]
+
+
+class Fleet(HasTraits):
+    """
+    A set of Hosts on which Container specs are run.
+
+    Specs are not modified: each operation uses a copy bound to the host's
+    client.  Per-host operations return an OrderedDict mapping host names to
+    `dockorm.parallel.Result`s.
+    """
+
+    hosts = List(Instance(Host))
+
+    max_workers = Integer(
+        default_value=DEFAULT_MAX_WORKERS,
+        help="Maximum number of hosts to operate on at once.",
+    )
+
+    @classmethod
+    def from_urls(cls, urls, **kwargs):
+        """
+        Build a Fleet from a mapping of host names to daemon URLs.  Keyword
+        arguments are passed to `Host.from_url`.
+        """
+        return cls(hosts=[
+            Host.from_url(name, url, **kwargs)
+            for name, url in iteritems(OrderedDict(urls))
+        ])
+
+    def host(self, name):
+        for host in self.hosts:
+            if host.name == name:
+                return host
+        raise KeyError(name)
+
+    def _hosts(self, hosts=None):
+        if hosts is None:
+            return list(self.hosts)
+        return [
+            self.host(h) if not isinstance(h, Host) else h for h in hosts
+        ]
+
+    def bind(self, container, host):
+        """
+        Return a copy of `container` that talks to `host`.
+        """
+        if not isinstance(host, Host):
+            host = self.host(host)
+        bound = copy(container)
+        bound.client = host.client
+        # A cache follows the daemon it was created for.
+        bound.state_cache = None
+        return bound
+
+    def each(self, func, hosts=None):
+        """
+        Call `func(host)` for each host concurrently, returning an
+        OrderedDict mapping host names to Results.
+        """
+        results = map_concurrent(
+            func, self._hosts(hosts), max_workers=self.max_workers,
+        )
+        return OrderedDict(
+            (host.name, result) for host, result in iteritems(results)
+        )
+
+    def _merged(self, func, hosts=None):
+        out = []
+        errors = OrderedDict()
+        for name, result in iteritems(self.each(func, hosts)):
+            if not result.ok:
+                errors[name] = result.error
+                continue
+            for item in result.value:
+                item = dict(item)
+                item[HOST_KEY] = name
+                out.append(item)
+        if errors:
+            raise FleetError(errors, out)
+        return out
+
+    def run(self, container, hosts=None, **kwargs):
+        """
+        Run `container` on each of `hosts`, by default all of them.  Keyword
+        arguments are passed to `Container.run`.
+        """
+        return self.each(
+            lambda host: self.bind(container, host).run(**kwargs), hosts,
+        )
+
+    def stop(self, container, hosts=None):
+        return self.each(
+            lambda host: self.bind(container, host).stop(), hosts,
+        )
+
+    def purge(self, container, hosts=None, **kwargs):
+        """
+        Purge `container` from each of `hosts`.  Keyword arguments are passed
+        to `Container.purge`.
+        """
+        return self.each(
+            lambda host: self.bind(container, host).purge(**kwargs), hosts,
+        )
+
+    def instances(self, container, hosts=None, **kwargs):
+        """
+        List instances of `container` on each of `hosts`, merged into one
+        list with each description's HOST_KEY naming its host.  Raises
+        FleetError if any host fails.
+        """
+        return self._merged(
+            lambda host: self.bind(container, host).instances(**kwargs),
+            hosts,
+        )
+
+    def images(self, container, hosts=None):
+        """
+        List images of `container` on each of `hosts`, merged like
+        `instances`.
+        """
+        return self._merged(
+            lambda host: self.bind(container, host).images(), hosts,
+        )
+
+    def loads(self, hosts=None):
+        """
+        Return an OrderedDict mapping host names to the number of containers
+        running on them.  Hosts that cannot be reached are left out.
+        """
+        return OrderedDict(
+            (name, len(result.value))
+            for name, result in iteritems(
+                self.each(lambda host: host.client.containers(), hosts)
+            )
+            if result.ok
+        )
+
+    def place(self, containers, policy=spread_by_load, hosts=None):
+        """
+        Choose a host for each of `containers`.
+
+        `policy` is called with the containers and the current `loads`, and
+        returns a host name for each container; see `spread_by_load` and
+        `round_robin`.  Returns a list of (Container, Host) pairs in the
+        order of `containers`, so the same spec may be placed more than
+        once.
+        """
+        containers = list(containers)
+        loads = self.loads(hosts)
+        if containers and not loads:
+            raise ValueError("No reachable hosts to place containers on.")
+        names = policy(containers, loads)
+        return [
+            (container, self.host(name))
+            for container, name in zip(containers, names)
+        ]
+
+    def deploy(self, containers, policy=spread_by_load, hosts=None,
+               **kwargs):
+        """
+        Place each of `containers` on one host with `policy` and run it
+        there, concurrently.  Keyword arguments are passed to
+        `Container.run`.
+
+        Returns a list of (Container, Result) pairs in the order of
+        `containers`, each Result holding the name of the host the
+        container was started on, or the exception raised.
+        """
+        placement = self.place(containers, policy=policy, hosts=hosts)
+
+        def run_one(index):
+            container, host = placement[index]
+            self.bind(container, host).run(**kwargs)
+            return host.name
+
+        results = map_concurrent(
+            run_one, range(len(placement)), max_workers=self.max_workers,
+        )
+        return [
+            (container, results[index])
+            for index, (container, _) in enumerate(placement)
+        ]
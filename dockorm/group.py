@@ -0,0 +1,434 @@
+# encoding: utf-8
+"""
+ContainerGroup class.
+"""
+from __future__ import print_function, unicode_literals
+from collections import OrderedDict
+from copy import copy
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+from threading import (
+    Event,
+    Lock,
+)
+from time import time
+
+from traitlets import (
+    HasTraits,
+    Instance,
+    Integer,
+    List,
+)
+
+from .build import (
+    BuildError,
+    dockerfile_parents,
+)
+from .container import (
+    Container,
+    WaitCancelled,
+    WaitTimeout,
+)
+from .parallel import (
+    _call,
+    DEFAULT_MAX_WORKERS,
+    map_concurrent,
+    map_dag,
+    toposort,
+)
+from .ready import as_checks
+from .registry import (
+    pull_image,
+    push_image,
+)
+from . import reconcile
+
+
+_print_lock = Lock()
+
+
+def print_labelled_build_event(container, event):
+    """
+    Write a BuildEvent to stdout, prefixing each line with the image name.
+
+    Lines from concurrent builds are never interleaved mid-line.
+    """
+    if event.kind == 'aux':
+        return
+    if event.kind == 'unknown':
+        text = "Unknown message during build: %s" % event.message
+    else:
+        text = event.message
+    prefix = '[{}] '.format(container.full_imagename())
+    with _print_lock:
+        for line in text.splitlines():
+            print(prefix + line)
+
+
+def wait_all(containers, timeout=None, cancel=None,
+             max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Wait for every container to exit.
+
+    Up to `max_workers` waits run concurrently, each holding a connection
+    to the daemon.  `timeout` is a deadline shared by all of them, however
+    late a wait starts.  Returns an OrderedDict mapping each Container to a
+    Result holding its exit code, or the WaitTimeout/WaitCancelled/APIError
+    raised while waiting for it.
+    """
+    deadline = None if timeout is None else time() + timeout
+
+    def wait_one(container):
+        remaining = None
+        if deadline is not None:
+            remaining = max(deadline - time(), 0)
+        return container.wait(timeout=remaining, cancel=cancel)
+
+    return map_concurrent(wait_one, list(containers), max_workers=max_workers)
+
+
+def wait_any(containers, timeout=None, cancel=None):
+    """
+    Wait for the first of `containers` to exit.
+
+    Returns a (Container, Result) pair for the first wait to finish; waits on
+    the remaining containers are cancelled.  Raises WaitTimeout if nothing
+    exits within `timeout` seconds, or WaitCancelled if `cancel` is set
+    first.
+
+    Unlike `wait_all`, this needs a thread and a daemon connection per
+    container: the daemon's wait call blocks until its own container exits,
+    and any of them may exit first.
+    """
+    containers = list(containers)
+    if not containers:
+        raise ValueError("wait_any() requires at least one container.")
+    stop = Event()
+
+    def wait_one(container):
+        return container.wait(timeout=timeout, cancel=stop)
+
+    pool = ThreadPoolExecutor(max_workers=len(containers))
+    try:
+        futures = {
+            pool.submit(_call, wait_one, c): c for c in containers
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=None if cancel is None else 0.1,
+                return_when=FIRST_COMPLETED,
+            )
+            if done:
+                future = next(iter(done))
+                result = future.result()
+                if isinstance(result.error, WaitTimeout):
+                    raise WaitTimeout(
+                        "No container exited: %s" % ', '.join(
+                            str(c) for c in containers
+                        )
+                    )
+                return futures[future], result
+            if cancel is not None and cancel.is_set():
+                raise WaitCancelled()
+    finally:
+        stop.set()
+        pool.shutdown(wait=False)
+
+
+def wait_ready_all(containers, timeout=None, check=None, cancel=None,
+                   max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Wait for every container to become ready.  See `Container.wait_ready`.
+
+    Each container gets its own copy of the checks, and up to `max_workers`
+    waits run concurrently.  Returns an OrderedDict mapping each Container to
+    a Result holding its `inspect_container` output, or the NotReady/
+    WaitTimeout/WaitCancelled raised while waiting for it.
+    """
+    containers = list(containers)
+    checks = as_checks(check)
+    return map_concurrent(
+        lambda c: c.wait_ready(
+            timeout=timeout,
+            check=[copy(each) for each in checks],
+            cancel=cancel,
+        ),
+        containers,
+        max_workers=max_workers,
+    )
+
+
+class ContainerGroup(HasTraits):
+    """
+    A collection of Container specifications managed together.
+
+    Operations are fanned out over a bounded thread pool.  Each method
+    returns an OrderedDict mapping each Container to a
+    `dockorm.parallel.Result` rather than raising on the first failure.
+    """
+
+    def __str__(self):
+        return "ContainerGroup({})".format(
+            ', '.join(str(c) for c in self.containers)
+        )
+
+    containers = List(Instance(Container))
+
+    max_workers = Integer(
+        default_value=DEFAULT_MAX_WORKERS,
+        config=True,
+        help="Maximum number of concurrent docker calls.",
+    )
+
+    def dependencies(self):
+        """
+        Map each container to the containers in this group it links to.
+
+        Links to containers outside the group are assumed to be satisfied.
+        """
+        members = set(self.containers)
+        return OrderedDict(
+            (c, [link.container for link in c.links
+                 if link.container in members])
+            for c in self.containers
+        )
+
+    def build_dependencies(self, tag=None):
+        """
+        Map each container with a build_path to the containers in this group
+        whose images its Dockerfile builds FROM.
+        """
+        by_image = OrderedDict(
+            (c.full_imagename(tag), c) for c in self.containers
+        )
+        return OrderedDict(
+            (c, [by_image[parent]
+                 for parent in dockerfile_parents(c.build_path)
+                 if parent in by_image and by_image[parent] is not c])
+            for c in self.containers if c.build_path
+        )
+
+    def build(self, tag=None, rm=True, callback=print_labelled_build_event,
+              skip_unchanged=None):
+        """
+        Build every container's image, building parents before children.
+
+        Independent images build concurrently, up to max_workers at a time.
+        `callback` is called with (container, event) for each BuildEvent as
+        it arrives; by default output is printed with the image name as a
+        prefix.  Builds that report an error yield a BuildError, and images
+        built FROM them are skipped.
+        """
+        def build_one(container):
+            def on_event(event):
+                if callback is not None:
+                    callback(container, event)
+            if not container.build(tag=tag, rm=rm, callback=on_event,
+                                   skip_unchanged=skip_unchanged):
+                raise BuildError(
+                    "Failed to build %s" % container.full_imagename(tag)
+                )
+
+        return map_dag(
+            build_one,
+            self.build_dependencies(tag=tag),
+            max_workers=self.max_workers,
+        )
+
+    def _transfer(self, transfer, tags, callback):
+        images = OrderedDict()
+        for container in self.containers:
+            for tag in tags or [container.tag]:
+                images.setdefault(container.full_imagename(tag), container)
+
+        def transfer_one(name):
+            container = images[name]
+
+            def on_event(event):
+                if callback is not None:
+                    callback(container, event)
+            return transfer(container.client, name, on_event)
+
+        return map_concurrent(
+            transfer_one, list(images), max_workers=self.max_workers,
+        )
+
+    def push(self, tags=None, callback=None):
+        """
+        Push every container's image under each of `tags`, by default each
+        container's own tag.
+
+        All pushes run concurrently, up to max_workers at a time, and images
+        shared by several containers are pushed once.  `callback` is called
+        with (container, event) for each `dockorm.registry.ProgressEvent`.
+        Returns an OrderedDict mapping each image name to a Result holding
+        the digest pushed, or the TransferError raised.
+        """
+        return self._transfer(push_image, tags, callback)
+
+    def pull(self, tags=None, callback=None):
+        """
+        Pull every container's image under each of `tags`.  See `push`.
+        """
+        return self._transfer(pull_image, tags, callback)
+
+    def run(self, tag=None):
+        """
+        Run every container, starting each one only after the containers it
+        links to have started.
+
+        Containers with no outstanding links start concurrently.  Containers
+        whose links failed to start are skipped and reported with a
+        DependencyError.
+        """
+        return map_dag(
+            lambda c: c.run(tag=tag),
+            self.dependencies(),
+            max_workers=self.max_workers,
+        )
+
+    def plan(self, tag=None, prune=False):
+        """
+        Compute the steps needed to bring the daemon in line with this
+        group.  See `dockorm.reconcile.plan`.
+
+        Containers linking to a container that will be created or recreated
+        are recreated too, so their links point at the new instance.
+        """
+        planned = reconcile.plan(
+            self.containers,
+            tag=tag,
+            prune=prune,
+            max_workers=self.max_workers,
+        )
+        steps = OrderedDict(
+            (step.container, step) for step in planned
+            if step.container is not None
+        )
+        replaced = (reconcile.CREATE, reconcile.RECREATE)
+        dependencies = self.dependencies()
+        for container in toposort(dependencies):
+            step = steps[container]
+            if step.action in replaced or step.instance is None:
+                continue
+            if any(steps[dep].action in replaced
+                   for dep in dependencies[container]):
+                steps[container] = step._replace(
+                    action=reconcile.RECREATE,
+                    changes=step.changes + ('links',),
+                )
+        return list(steps.values()) + [
+            step for step in planned if step.container is None
+        ]
+
+    def reconcile(self, tag=None, prune=False, steps=None, stop_timeout=None):
+        """
+        Bring the daemon in line with this group, touching only containers
+        that differ from their spec.
+
+        `steps` defaults to `plan(tag, prune)`.  Containers are recreated or
+        started after the containers they link to, and independent steps
+        run concurrently.  Returns an OrderedDict mapping each Container (or
+        the ID of each removed unmanaged instance) to a Result holding the
+        action taken.
+        """
+        if steps is None:
+            steps = self.plan(tag=tag, prune=prune)
+        by_container = OrderedDict(
+            (step.container, step) for step in steps
+            if step.container is not None
+        )
+        members = set(by_container)
+        results = map_dag(
+            lambda c: reconcile.apply_step(
+                by_container[c], c.client, tag=tag, stop_timeout=stop_timeout,
+            ),
+            OrderedDict(
+                (c, [link.container for link in c.links
+                     if link.container in members])
+                for c in by_container
+            ),
+            max_workers=self.max_workers,
+        )
+        removals = OrderedDict(
+            (step.instance['Id'], step) for step in steps
+            if step.container is None
+        )
+        if removals:
+            client = self.containers[0].client
+            results.update(map_concurrent(
+                lambda id: reconcile.apply_step(
+                    removals[id], client, stop_timeout=stop_timeout,
+                ),
+                removals,
+                max_workers=self.max_workers,
+            ))
+        return results
+
+    def stop(self):
+        """
+        Stop every container concurrently.
+        """
+        return map_concurrent(
+            lambda c: c.stop(),
+            self.containers,
+            max_workers=self.max_workers,
+        )
+
+    def purge(self, stop_first=True, remove_volumes=False, stop_timeout=None):
+        """
+        Purge every container concurrently.
+        """
+        return map_concurrent(
+            lambda c: c.purge(
+                stop_first=stop_first,
+                remove_volumes=remove_volumes,
+                stop_timeout=stop_timeout,
+            ),
+            self.containers,
+            max_workers=self.max_workers,
+        )
+
+    def wait_all(self, timeout=None, cancel=None):
+        """
+        Wait for every container to exit.  See `dockorm.group.wait_all`.
+        """
+        return wait_all(
+            self.containers,
+            timeout=timeout,
+            cancel=cancel,
+            max_workers=self.max_workers,
+        )
+
+    def wait_any(self, timeout=None, cancel=None):
+        """
+        Wait for the first container to exit.  See `dockorm.group.wait_any`.
+        """
+        return wait_any(self.containers, timeout=timeout, cancel=cancel)
+
+    def wait_ready(self, timeout=None, check=None, cancel=None):
+        """
+        Wait for every container to become ready.  See `wait_ready_all`.
+        """
+        return wait_ready_all(
+            self.containers,
+            timeout=timeout,
+            check=check,
+            cancel=cancel,
+            max_workers=self.max_workers,
+        )
+
+    def running(self):
+        """
+        Return the running instance of each container, or None.
+        """
+        return map_concurrent(
+            lambda c: c.running(),
+            self.containers,
+            max_workers=self.max_workers,
+        )
@@ -0,0 +1,356 @@
+# encoding: utf-8
+"""
+Instrumentation for docker API calls.
+
+Wrap a client in an InstrumentedClient to report every call to the daemon
+to one or more sinks:
+
+    registry = MetricsRegistry()
+    container.client = InstrumentedClient(container.client, [registry])
+    ...
+    print(registry.render())
+"""
+from __future__ import unicode_literals
+from bisect import bisect_left
+from collections import namedtuple
+import json
+import logging
+from threading import Lock
+import time
+
+from six import (
+    binary_type,
+    iteritems,
+    string_types,
+)
+
+
+log = logging.getLogger(__name__)
+
+
+class CallRecord(namedtuple('CallRecord', ['method', 'container', 'duration',
+                                           'size', 'error'])):
+    """
+    A completed docker API call.
+
+    `container` is the name or ID of the container the call targeted, if
+    any.  `size` is the approximate size in bytes of the response, or None
+    for streamed or unmeasured responses.  `error` is the exception raised,
+    or None.
+    """
+    __slots__ = ()
+
+    @property
+    def outcome(self):
+        if self.error is None:
+            return 'ok'
+        return type(self.error).__name__
+
+
+class Sink(object):
+    """
+    Base class for instrumentation sinks.
+
+    `start` is called before each call and may return a token, which is
+    passed back to `finish` along with the CallRecord.  Plain callables may
+    also be used as sinks; they receive only the CallRecord.
+    """
+
+    def start(self, method, container):
+        return None
+
+    def finish(self, record, token):
+        pass
+
+
+class _CallableSink(Sink):
+
+    def __init__(self, func):
+        self.func = func
+
+    def finish(self, record, token):
+        self.func(record)
+
+
+# Client methods whose first argument is a container.
+_CONTAINER_METHODS = frozenset([
+    'attach', 'diff', 'exec_create', 'export', 'inspect_container', 'kill',
+    'logs', 'pause', 'port', 'remove_container', 'rename', 'restart',
+    'start', 'stats', 'stop', 'top', 'unpause', 'update_container', 'wait',
+])
+
+
+def _target(method, args, kwargs):
+    """
+    Find the container targeted by an API call from its arguments.
+    """
+    if method == 'create_container':
+        return kwargs.get('name')
+    if method not in _CONTAINER_METHODS:
+        return None
+    ref = kwargs.get('container', args[0] if args else None)
+    if isinstance(ref, dict):
+        names = ref.get('Names')
+        if names:
+            return names[0].lstrip('/')
+        return ref.get('Id')
+    if isinstance(ref, string_types):
+        return ref
+    return None
+
+
+# Client methods that are computed locally, without calling the daemon.
+_LOCAL_METHODS = frozenset([
+    'close', 'create_container_config', 'create_endpoint_config',
+    'create_host_config', 'create_networking_config', 'create_swarm_spec',
+    'get_adapter', 'get_redirect_target', 'merge_environment_settings',
+    'mount', 'prepare_request', 'rebuild_auth', 'rebuild_method',
+    'rebuild_proxies', 'reload_config', 'resolve_redirects',
+    'should_strip_auth',
+])
+
+# Private client methods that make requests to the daemon.
+_REQUEST_METHODS = frozenset([
+    '_delete', '_get', '_post', '_post_json', '_put',
+])
+
+
+def _instrumented(name):
+    if name.startswith('_'):
+        return name in _REQUEST_METHODS
+    return name not in _LOCAL_METHODS
+
+
+def _size(result, measure):
+    if isinstance(result, binary_type):
+        return len(result)
+    if measure and isinstance(result, (dict, list)):
+        try:
+            return len(json.dumps(result))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+class InstrumentedClient(object):
+    """
+    A proxy for a docker client that reports each call to the daemon to a
+    list of sinks.
+
+    Methods computed locally (such as `create_host_config`), non-callable
+    attributes, and private attributes other than the raw request methods
+    are passed through untouched.  Response sizes are reported for bytes
+    responses; decoded JSON responses are only serialized to measure them
+    if `measure_sizes` is True.  Errors raised by sinks are logged rather
+    than propagated.
+    """
+
+    def __init__(self, client, sinks=(), measure_sizes=False):
+        self._wrapped = client
+        self._sinks = [
+            s if isinstance(s, Sink) else _CallableSink(s) for s in sinks
+        ]
+        self._measure_sizes = measure_sizes
+
+    def add_sink(self, sink):
+        if not isinstance(sink, Sink):
+            sink = _CallableSink(sink)
+        self._sinks.append(sink)
+
+    def __getattr__(self, name):
+        attr = getattr(self._wrapped, name)
+        if not (callable(attr) and _instrumented(name)):
+            return attr
+
+        def instrumented(*args, **kwargs):
+            container = _target(name, args, kwargs)
+            sinks = list(self._sinks)
+            tokens = [_start(s, name, container) for s in sinks]
+            start = time.time()
+            error = None
+            result = None
+            try:
+                result = attr(*args, **kwargs)
+                return result
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                record = CallRecord(
+                    name,
+                    container,
+                    time.time() - start,
+                    _size(result, self._measure_sizes),
+                    error,
+                )
+                for sink, token in zip(sinks, tokens):
+                    _finish(sink, record, token)
+
+        instrumented.__name__ = str(name)
+        return instrumented
+
+
+def _start(sink, method, container):
+    try:
+        return sink.start(method, container)
+    except Exception:
+        log.exception("Instrumentation sink %r failed.", sink)
+        return None
+
+
+def _finish(sink, record, token):
+    try:
+        sink.finish(record, token)
+    except Exception:
+        log.exception("Instrumentation sink %r failed.", sink)
+
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class MetricsRegistry(Sink):
+    """
+    Prometheus-style counters and histograms of docker API calls.
+
+    Tracks calls by method and outcome, response bytes by method, and a
+    latency histogram by method.  `render` produces the Prometheus text
+    exposition format.
+    """
+
+    def __init__(self, prefix='dockorm_docker', buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(sorted(buckets))
+        self._lock = Lock()
+        self.calls = {}
+        self.bytes = {}
+        self._histograms = {}
+
+    def finish(self, record, token):
+        with self._lock:
+            key = (record.method, record.outcome)
+            self.calls[key] = self.calls.get(key, 0) + 1
+            if record.size is not None:
+                size = self.bytes.get(record.method, 0) + record.size
+                self.bytes[record.method] = size
+            counts, total = self._histograms.get(
+                record.method, ([0] * (len(self.buckets) + 1), 0.0),
+            )
+            counts[bisect_left(self.buckets, record.duration)] += 1
+            self._histograms[record.method] = (
+                counts, total + record.duration,
+            )
+
+    def histogram(self, method):
+        """
+        Return (cumulative bucket counts, total count, sum) for a method.
+
+        The bucket counts are a list of (upper bound, count) pairs, ending
+        with ('+Inf', total count).
+        """
+        with self._lock:
+            counts, total = self._histograms.get(
+                method, ([0] * (len(self.buckets) + 1), 0.0),
+            )
+            counts = list(counts)
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            running += count
+            cumulative.append((bound, running))
+        return cumulative, running, total
+
+    def render(self):
+        lines = [
+            '# TYPE %s_calls_total counter' % self.prefix,
+        ]
+        with self._lock:
+            calls = sorted(iteritems(self.calls))
+            sizes = sorted(iteritems(self.bytes))
+            methods = sorted(self._histograms)
+        for (method, outcome), count in calls:
+            lines.append('%s_calls_total{method="%s",outcome="%s"} %d' % (
+                self.prefix, method, outcome, count,
+            ))
+        lines.append('# TYPE %s_response_bytes_total counter' % self.prefix)
+        for method, size in sizes:
+            lines.append('%s_response_bytes_total{method="%s"} %d' % (
+                self.prefix, method, size,
+            ))
+        lines.append('# TYPE %s_call_seconds histogram' % self.prefix)
+        for method in methods:
+            cumulative, count, total = self.histogram(method)
+            for bound, running in cumulative:
+                lines.append(
+                    '%s_call_seconds_bucket{method="%s",le="%s"} %d' % (
+                        self.prefix, method, bound, running,
+                    )
+                )
+            lines.append('%s_call_seconds_sum{method="%s"} %f' % (
+                self.prefix, method, total,
+            ))
+            lines.append('%s_call_seconds_count{method="%s"} %d' % (
+                self.prefix, method, count,
+            ))
+        return '\n'.join(lines) + '\n'
+
+
+class LoggingSink(Sink):
+    """
+    Log each call, with its fields attached to the LogRecord as `docker_*`
+    attributes for structured log handlers.
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG,
+                 error_level=logging.WARNING):
+        self.logger = logger or logging.getLogger('dockorm.docker')
+        self.level = level
+        self.error_level = error_level
+
+    def finish(self, record, token):
+        level = self.level if record.error is None else self.error_level
+        if not self.logger.isEnabledFor(level):
+            return
+        self.logger.log(
+            level,
+            "docker %s %s: %s in %.3fs",
+            record.method,
+            record.container or '-',
+            record.outcome,
+            record.duration,
+            extra={
+                'docker_method': record.method,
+                'docker_container': record.container,
+                'docker_duration': record.duration,
+                'docker_size': record.size,
+                'docker_outcome': record.outcome,
+            },
+        )
+
+
+class TracingSink(Sink):
+    """
+    Open a span around each call using an OpenTracing-style tracer.
+
+    `tracer.start_span(operation_name, tags=...)` must return a span with
+    `set_tag(key, value)` and `finish()` methods.
+    """
+
+    def __init__(self, tracer, prefix='docker.'):
+        self.tracer = tracer
+        self.prefix = prefix
+
+    def start(self, method, container):
+        tags = {'component': 'dockorm'}
+        if container is not None:
+            tags['docker.container'] = container
+        return self.tracer.start_span(self.prefix + method, tags=tags)
+
+    def finish(self, record, token):
+        if record.size is not None:
+            token.set_tag('docker.response_bytes', record.size)
+        if record.error is not None:
+            token.set_tag('error', True)
+            token.set_tag('error.kind', record.outcome)
+        token.finish()
@@ -0,0 +1,344 @@
+# encoding: utf-8
+"""
+Streaming access to container logs.
+"""
+from __future__ import unicode_literals
+from calendar import timegm
+from collections import (
+    deque,
+    namedtuple,
+)
+from itertools import chain
+import struct
+from threading import (
+    Event,
+    Thread,
+)
+import time
+
+from six.moves.queue import (
+    Empty,
+    Full,
+    Queue,
+)
+
+
+STDIN = 'stdin'
+STDOUT = 'stdout'
+STDERR = 'stderr'
+
+_STREAMS = {0: STDIN, 1: STDOUT, 2: STDERR}
+_HEADER = struct.Struct('>BxxxL')
+_CHUNK_SIZE = 4096
+
+
+class LogLine(namedtuple('LogLine', ['container', 'stream', 'line',
+                                     'timestamp'])):
+    """
+    A single line of output from a container.
+
+    `container` is the ID of the instance that produced the line, `stream` is
+    STDOUT or STDERR, `line` is the raw bytes without the trailing newline,
+    and `timestamp` is the daemon's RFC 3339 timestamp (as text) if
+    timestamps were requested, or None.
+    """
+    __slots__ = ()
+
+
+def _read_exactly(fp, n):
+    data = b''
+    while len(data) < n:
+        chunk = fp.read(n - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def iter_frames(fp, tty=False):
+    """
+    Demultiplex a docker attach/logs stream into (stream, bytes) pairs.
+
+    Containers without a TTY prefix each frame with an 8-byte header naming
+    the stream it came from.  TTY containers send raw bytes, all of which are
+    attributed to STDOUT.
+    """
+    if tty:
+        while True:
+            data = fp.read(_CHUNK_SIZE)
+            if not data:
+                return
+            yield STDOUT, data
+
+    while True:
+        header = _read_exactly(fp, _HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        stream_id, size = _HEADER.unpack(header)
+        data = _read_exactly(fp, size)
+        if data:
+            yield _STREAMS.get(stream_id, STDOUT), data
+
+
+def iter_lines(frames, container=None, timestamps=False):
+    """
+    Reassemble (stream, bytes) frames into LogLines.
+
+    Partial lines are buffered separately for each stream, so only the
+    longest single line is ever held in memory.
+    """
+    buffers = {}
+    for stream, data in frames:
+        pieces = (buffers.pop(stream, b'') + data).split(b'\n')
+        tail = pieces.pop()
+        if tail:
+            buffers[stream] = tail
+        for piece in pieces:
+            yield _make_line(container, stream, piece, timestamps)
+    for stream, piece in sorted(buffers.items()):
+        yield _make_line(container, stream, piece, timestamps)
+
+
+def _make_line(container, stream, line, timestamps):
+    timestamp = None
+    if timestamps:
+        stamp, _, line = line.partition(b' ')
+        timestamp = stamp.decode('ascii')
+    return LogLine(container, stream, line, timestamp)
+
+
+class ClosingIterator(object):
+    """
+    An iterator over output read from daemon streams, with a `close` that
+    may be called from any thread.
+
+    Closing the underlying streams unblocks a reader waiting on them, so a
+    consumer that stops early does not leave connections open.
+    """
+
+    def __init__(self, iterator, sources=()):
+        self._iterator = iter(iterator)
+        self._sources = list(sources)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+    next = __next__
+
+    def close(self):
+        for source in self._sources:
+            close_stream(source)
+
+
+def close_stream(stream):
+    """
+    Close a stream, ignoring errors from one that is already closed or, for
+    generators, still running on another thread.
+    """
+    close = getattr(stream, 'close', None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception:
+        pass
+
+
+def _timestamp_key(line):
+    # The daemon trims trailing zeros from the fraction, so pad it out.
+    stamp = line.timestamp or ''
+    seconds, _, fraction = stamp.rstrip('Z').partition('.')
+    return seconds, fraction.ljust(9, '0')
+
+
+def _merge_by_timestamp(first, second):
+    """
+    Merge two time-ordered sequences of timestamped LogLines.
+    """
+    first, second = iter(first), iter(second)
+    a, b = next(first, None), next(second, None)
+    while a is not None and b is not None:
+        if _timestamp_key(b) < _timestamp_key(a):
+            yield b
+            b = next(second, None)
+        else:
+            yield a
+            a = next(first, None)
+    rest, remaining = (a, first) if a is not None else (b, second)
+    if rest is not None:
+        yield rest
+        for line in remaining:
+            yield line
+
+
+def _tagged(stream, chunks):
+    for chunk in chunks:
+        yield stream, chunk
+
+
+def _without_timestamps(lines):
+    for line in lines:
+        yield line._replace(timestamp=None)
+
+
+def _open_streams(client, container_id, streams, follow, since, tail,
+                  timestamps):
+    """
+    Open a logs connection for each (stream, stdout, stderr), returning the
+    connections and an iterator of LogLines from each.
+    """
+    sources = [
+        client.logs(
+            container_id,
+            stdout=out,
+            stderr=err,
+            stream=True,
+            follow=follow,
+            since=since,
+            tail=tail,
+            timestamps=timestamps,
+        )
+        for _, out, err in streams
+    ]
+    lines = [
+        iter_lines(_tagged(stream, source), container_id, timestamps)
+        for (stream, _, _), source in zip(streams, sources)
+    ]
+    return sources, lines
+
+
+def _epoch_seconds(line):
+    seconds = line.timestamp.rstrip('Z').partition('.')[0]
+    return timegm(time.strptime(seconds, '%Y-%m-%dT%H:%M:%S'))
+
+
+def stream_log_lines(client, container_id, tty=None, stdout=True,
+                     stderr=True, follow=False, since=None, tail='all',
+                     timestamps=False):
+    """
+    Return a ClosingIterator of LogLines for a single container, read as
+    the daemon sends them.
+
+    If `tty` is None, the container is inspected to find out whether its
+    output is multiplexed.  The logs endpoint strips the stream of each
+    frame, so stdout and stderr are read over separate connections: merged
+    in timestamp order, or in order of arrival when following.  `tail`
+    applies to the merged lines, not to each stream.
+    """
+    if tty is None:
+        tty = client.inspect_container(container_id)['Config']['Tty']
+    if tail is None:
+        tail = 'all'
+    if tty or not (stdout and stderr):
+        streams = [(STDOUT if tty or stdout else STDERR, stdout, stderr)]
+        sources, (lines,) = _open_streams(
+            client, container_id, streams, follow, since, tail, timestamps,
+        )
+        return ClosingIterator(lines, sources)
+
+    streams = [(STDOUT, True, False), (STDERR, False, True)]
+    if follow and tail == 'all':
+        sources, lines = _open_streams(
+            client, container_id, streams, True, since, tail, timestamps,
+        )
+        return ClosingIterator(merge_streams(lines), sources)
+
+    # Timestamps are needed to merge, and are stripped again afterwards.
+    sources, lines = _open_streams(
+        client, container_id, streams, False, since, tail, True,
+    )
+    merged = _merge_by_timestamp(*lines)
+    if tail != 'all':
+        # Only the last `tail` lines of each stream are sent, so the last
+        # `tail` of the merge are among them.
+        merged = deque(merged, maxlen=int(tail))
+    if follow:
+        # Read the history, then follow from its last line.
+        history = list(merged)
+        for source in sources:
+            close_stream(source)
+        after = None
+        if history:
+            after = _timestamp_key(history[-1])
+            since = _epoch_seconds(history[-1])
+        sources, lines = _open_streams(
+            client, container_id, streams, True, since, 'all', True,
+        )
+        merged = merge_streams(lines)
+        if after is not None:
+            merged = (line for line in merged if _timestamp_key(line) > after)
+        merged = chain(history, merged)
+    if not timestamps:
+        merged = _without_timestamps(merged)
+    return ClosingIterator(merged, sources)
+
+
+def merge_streams(iterables, maxsize=1024):
+    """
+    Interleave items from several blocking iterables as they arrive.
+
+    Each iterable is drained on its own thread into a bounded queue, so a
+    slow consumer applies backpressure instead of accumulating output.
+    Exceptions raised by any iterable are re-raised in the consumer.  When
+    the consumer stops early, iterables with a `close` method are closed.
+    """
+    iterables = list(iterables)
+    if len(iterables) == 1:
+        try:
+            for item in iterables[0]:
+                yield item
+        finally:
+            close_stream(iterables[0])
+        return
+
+    queue = Queue(maxsize=maxsize)
+    done = object()
+    stopped = Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def drain(iterable):
+        try:
+            for item in iterable:
+                if not put((None, item)):
+                    return
+        except Exception as e:
+            if not stopped.is_set():
+                put((e, None))
+        finally:
+            close_stream(iterable)
+            put((done, None))
+
+    threads = [Thread(target=drain, args=(i,)) for i in iterables]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    remaining = len(threads)
+    try:
+        while remaining:
+            try:
+                error, item = queue.get(timeout=0.1)
+            except Empty:
+                continue
+            if error is done:
+                remaining -= 1
+            elif error is not None:
+                raise error
+            else:
+                yield item
+    finally:
+        stopped.set()
+        # Unblock drain threads waiting on their sources.
+        for iterable in iterables:
+            close_stream(iterable)
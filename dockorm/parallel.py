@@ -0,0 +1,144 @@
+# encoding: utf-8
+"""
+Helpers for fanning blocking docker calls out over a thread pool.
+"""
+from __future__ import unicode_literals
+from collections import namedtuple, OrderedDict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from six import iteritems, itervalues
+
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class Result(namedtuple('Result', ['value', 'error'])):
+    """
+    The outcome of an operation on a single item.
+
+    Exactly one of `value` and `error` is meaningful: `error` is the exception
+    raised by the operation, or None if it succeeded.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class DependencyError(Exception):
+    """
+    Raised in place of an operation that was skipped because an item it
+    depends on failed.
+    """
+
+
+def _call(func, item):
+    try:
+        return Result(func(item), None)
+    except Exception as e:
+        return Result(None, e)
+
+
+def map_concurrent(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Call `func` on each of `items` on a bounded thread pool.
+
+    Returns an OrderedDict mapping each item to a Result, in input order.
+    Exceptions raised by `func` are captured rather than propagated.
+    """
+    items = list(items)
+    out = OrderedDict()
+    if not items:
+        return out
+    if max_workers <= 1 or len(items) == 1:
+        for item in items:
+            out[item] = _call(func, item)
+        return out
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        futures = [(item, pool.submit(_call, func, item)) for item in items]
+        for item, future in futures:
+            out[item] = future.result()
+    return out
+
+
+def toposort(dependencies):
+    """
+    Order the keys of `dependencies` so that every item comes after the items
+    it depends on.
+
+    `dependencies` maps each item to an iterable of the items it depends on.
+    Dependencies that are not themselves keys are ignored.
+    """
+    remaining = OrderedDict(
+        (item, set(deps) & set(dependencies))
+        for item, deps in iteritems(dependencies)
+    )
+    out = []
+    while remaining:
+        ready = [item for item, deps in iteritems(remaining) if not deps]
+        if not ready:
+            raise ValueError(
+                "Dependency cycle between: %s" % ', '.join(
+                    str(item) for item in remaining
+                )
+            )
+        for item in ready:
+            del remaining[item]
+            out.append(item)
+        for deps in itervalues(remaining):
+            deps.difference_update(ready)
+    return out
+
+
+def map_dag(func, dependencies, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Call `func` on each key of `dependencies` once everything it depends on
+    has completed successfully.
+
+    Independent items run concurrently on a bounded thread pool, so total
+    wall time is bounded by the longest dependency chain rather than the sum
+    of all calls.  Items whose dependencies failed are not called; their
+    Result carries a DependencyError.
+
+    Returns an OrderedDict mapping each item to a Result, in topological
+    order.
+    """
+    order = toposort(dependencies)
+    pending = OrderedDict(
+        (item, set(dependencies[item]) & set(dependencies))
+        for item in order
+    )
+    results = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        while pending or running:
+            for item in list(pending):
+                deps = pending[item]
+                failed = [dep for dep in deps if dep in results and
+                          not results[dep].ok]
+                if failed:
+                    del pending[item]
+                    results[item] = Result(None, DependencyError(
+                        "%s depends on failed %s" % (
+                            item, ', '.join(str(dep) for dep in failed),
+                        )
+                    ))
+                elif all(dep in results for dep in deps):
+                    del pending[item]
+                    running[pool.submit(_call, func, item)] = item
+            if not running:
+                # Everything left was skipped in the loop above; go around
+                # again to propagate the failures.
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return OrderedDict((item, results[item]) for item in order)
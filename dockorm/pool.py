@@ -0,0 +1,350 @@
+# encoding: utf-8
+"""
+ContainerPool class.
+"""
+from __future__ import unicode_literals
+from collections import deque
+from threading import Condition
+import time
+from uuid import uuid4
+
+from traitlets import (
+    Any,
+    Enum,
+    Float,
+    HasTraits,
+    Instance,
+    Integer,
+)
+
+from .container import Container
+from .logs import stream_log_lines
+from .parallel import map_concurrent
+
+
+# Label applied to pool members, naming the Container spec they came from.
+POOL_LABEL = 'dockorm.pool'
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no pool member becomes available in time.
+    """
+
+
+class Lease(object):
+    """
+    A pool member handed out by `ContainerPool.acquire`.
+
+    Use as a context manager to release the member when done.  In 'created'
+    mode the member runs the spec's command as its job, and leaving the
+    block normally first waits for that job to exit.
+    """
+
+    def __init__(self, pool, member):
+        self.pool = pool
+        self.id = member.id
+        self.name = member.name
+        self._member = member
+
+    def __repr__(self):
+        return 'Lease(name={!r})'.format(self.name)
+
+    def exec_run(self, cmd, stream=False, demux=False, **kwargs):
+        """
+        Run `cmd` in this member.  See `Container.exec_run`.
+
+        Only available for pools in 'running' mode.
+        """
+        return self.pool.spec.exec_run(
+            cmd, stream=stream, demux=demux, instance=self.id, **kwargs
+        )
+
+    def wait(self, timeout=None):
+        """
+        Wait for this member to exit, and return its exit code.  See
+        `Container.wait`.
+
+        In 'created' mode, this waits for the job started by `acquire`.
+        """
+        return self.pool.spec.wait(timeout=timeout, instance=self.id)
+
+    def iter_logs(self, follow=False, since=None, tail='all',
+                  timestamps=False, stdout=True, stderr=True):
+        """
+        Lazily yield `dockorm.logs.LogLine`s from this member.  See
+        `Container.iter_logs`.
+        """
+        return stream_log_lines(
+            self.pool.client,
+            self.id,
+            follow=follow,
+            since=since,
+            tail=tail,
+            timestamps=timestamps,
+            stdout=stdout,
+            stderr=stderr,
+        )
+
+    def release(self, recycle=False):
+        """
+        Return this member to the pool.  See `ContainerPool.release`.
+
+        Members are removed forcibly, so in 'created' mode a job that is
+        still running is killed; call `wait` first to let it finish.
+        """
+        self.pool.release(self, recycle=recycle)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None and self.pool.mode == 'created':
+            self.wait()
+        # A member that failed mid-job may be in an unknown state.
+        self.release(recycle=exc_type is not None)
+
+
+class _Member(object):
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+        self.uses = 0
+        self.idle_since = time.time()
+
+
+class ContainerPool(HasTraits):
+    """
+    A pool of pre-created or pre-started instances of a Container spec.
+
+    In 'running' mode, members are started with `idle_command` and jobs run
+    in them via exec, so acquiring a member makes no daemon calls.  In
+    'created' mode, members are created ahead of time with the spec's
+    command, and acquiring one starts it; each member is used once.
+
+    Members get unique generated names, so specs with fixed host port
+    bindings can only be pooled one at a time.
+    """
+
+    def __str__(self):
+        return "ContainerPool(spec={}, size={})".format(self.spec, self.size)
+
+    spec = Instance(Container)
+
+    mode = Enum(
+        ['running', 'created'],
+        default_value='running',
+        help="Whether members are kept running (jobs use exec) or created "
+        "and started on acquire.",
+    )
+
+    size = Integer(
+        default_value=4,
+        help="Number of idle members to keep ready.",
+    )
+
+    max_size = Integer(
+        default_value=16,
+        help="Maximum number of members, leased or idle.",
+    )
+
+    idle_timeout = Float(
+        default_value=300.0,
+        help="Seconds after which idle members beyond `size` are removed.",
+    )
+
+    max_uses = Integer(
+        default_value=0,
+        help="Replace running-mode members after this many leases.  0 means "
+        "no limit.",
+    )
+
+    idle_command = Any(
+        default_value=['sleep', '2147483647'],
+        help="Command keeping running-mode members alive.",
+    )
+
+    max_workers = Integer(
+        default_value=8,
+        help="Maximum number of members created or removed concurrently.",
+    )
+
+    def __init__(self, **kwargs):
+        super(ContainerPool, self).__init__(**kwargs)
+        self._cond = Condition()
+        self._idle = deque()
+        self._leased = {}
+        self._pending = 0
+        self._closed = False
+
+    @property
+    def client(self):
+        return self.spec.client
+
+    def _new_name(self):
+        return '{}-pool-{}'.format(self.spec.name, uuid4().hex[:12])
+
+    def _create_member(self):
+        name = self._new_name()
+        command = self.idle_command if self.mode == 'running' else None
+        container = self.spec.create(
+            command=command,
+            name=name,
+            labels={POOL_LABEL: self.spec.name},
+        )
+        if self.mode == 'running':
+            self.client.start(container)
+        return _Member(container['Id'], name)
+
+    def _remove_member(self, member):
+        self.client.remove_container(member.id, force=True)
+
+    def _grow(self, count):
+        """
+        Create up to `count` new members concurrently, adding them to the
+        idle set.  Returns the errors from any failed creations.
+        """
+        with self._cond:
+            count = min(count, self.max_size - self._total())
+            if count <= 0:
+                return []
+            self._pending += count
+        results = map_concurrent(
+            lambda _: self._create_member(),
+            range(count),
+            max_workers=self.max_workers,
+        )
+        with self._cond:
+            self._pending -= count
+            for result in results.values():
+                if result.ok:
+                    self._idle.append(result.value)
+            self._cond.notify_all()
+        return [r.error for r in results.values() if not r.ok]
+
+    def _total(self):
+        return len(self._idle) + len(self._leased) + self._pending
+
+    def fill(self):
+        """
+        Create members until `size` are idle.  Raises the first creation
+        error, if any.
+        """
+        with self._cond:
+            missing = self.size - len(self._idle) - self._pending
+        errors = self._grow(missing)
+        if errors:
+            raise errors[0]
+
+    def acquire(self, timeout=None):
+        """
+        Lease a member, creating one if none are idle and the pool is below
+        `max_size`.  Raises PoolTimeout if none is available within
+        `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Pool is closed.")
+                if self._idle:
+                    member = self._idle.popleft()
+                    self._leased[member.id] = member
+                    break
+                can_grow = self._total() < self.max_size
+                if not can_grow:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            raise PoolTimeout(str(self))
+                    self._cond.wait(remaining)
+                    continue
+            errors = self._grow(1)
+            if errors:
+                raise errors[0]
+
+        member.uses += 1
+        if self.mode == 'created':
+            try:
+                self.client.start(member.id)
+            except Exception:
+                self.release(Lease(self, member), recycle=True)
+                raise
+        self.evict_idle()
+        return Lease(self, member)
+
+    def release(self, lease, recycle=False):
+        """
+        Return a leased member to the pool.
+
+        Members are removed instead of reused if `recycle` is True, the pool
+        is in 'created' mode, or the member has reached `max_uses`.  Removal
+        kills a member that is still running.
+        Replacements are created to keep `size` members idle.
+        """
+        with self._cond:
+            member = self._leased.pop(lease.id, None)
+            if member is None:
+                return
+            retire = (
+                recycle or self._closed or self.mode == 'created' or
+                (self.max_uses and member.uses >= self.max_uses)
+            )
+            if not retire:
+                member.idle_since = time.time()
+                self._idle.append(member)
+            self._cond.notify_all()
+        if retire:
+            try:
+                self._remove_member(member)
+            finally:
+                if not self._closed:
+                    self._grow(self.size - len(self._idle) - self._pending)
+
+    def evict_idle(self):
+        """
+        Remove members beyond `size` that have been idle for longer than
+        `idle_timeout`.
+        """
+        cutoff = time.time() - self.idle_timeout
+        evicted = []
+        with self._cond:
+            while len(self._idle) > self.size:
+                oldest = min(self._idle, key=lambda m: m.idle_since)
+                if oldest.idle_since > cutoff:
+                    break
+                self._idle.remove(oldest)
+                evicted.append(oldest)
+        map_concurrent(
+            self._remove_member, evicted, max_workers=self.max_workers,
+        )
+        return len(evicted)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'idle': len(self._idle),
+                'leased': len(self._leased),
+                'pending': self._pending,
+            }
+
+    def close(self):
+        """
+        Remove every idle member; leased members are removed on release.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        return map_concurrent(
+            self._remove_member, idle, max_workers=self.max_workers,
+        )
+
+    def __enter__(self):
+        self.fill()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
@@ -0,0 +1,243 @@
+# encoding: utf-8
+"""
+Readiness checks for `Container.wait_ready`.
+
+A check is called with the Container and the instance's current
+`inspect_container` output, and returns True once the instance is ready.
+Checks may also watch the instance between polls (see `Check.start`) and
+set the `wake` event to have the instance re-inspected immediately.
+"""
+from __future__ import unicode_literals
+from abc import (
+    ABCMeta,
+    abstractmethod,
+)
+import re
+import socket
+from threading import Thread
+
+from six import (
+    add_metaclass,
+    iteritems,
+    string_types,
+)
+from six.moves.urllib.parse import urlparse
+
+from .logs import stream_log_lines
+
+
+class NotReady(Exception):
+    """
+    Raised when an instance can never become ready, because it exited or
+    reported itself unhealthy.
+    """
+
+
+def _daemon_thread(target, *args):
+    thread = Thread(target=target, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+@add_metaclass(ABCMeta)
+class Check(object):
+    """
+    Base class for readiness checks.
+
+    Subclasses implement `__call__`, and may override `start` and `stop` to
+    watch the instance between polls.
+    """
+
+    def start(self, container, instance_id, wake):
+        """
+        Called once before polling begins.
+        """
+
+    def stop(self):
+        """
+        Called once polling ends, whatever the outcome.
+        """
+
+    @abstractmethod
+    def __call__(self, container, details):
+        """
+        Return True if the instance described by `details` is ready.  May
+        raise NotReady if it never will be.
+        """
+
+
+class HealthCheck(Check):
+    """
+    Ready when docker reports the instance healthy.
+
+    Instances without a HEALTHCHECK are ready as soon as they are running.
+    Health status changes are followed on the daemon's event stream, so the
+    instance is re-inspected as soon as its status changes.
+    """
+
+    def __init__(self, events=True):
+        self.events = events
+        self._stream = None
+
+    def start(self, container, instance_id, wake):
+        if not self.events:
+            return
+        self._stream = container.client.events(
+            decode=True,
+            filters={'container': instance_id, 'event': 'health_status'},
+        )
+        _daemon_thread(self._follow, self._stream, wake)
+
+    @staticmethod
+    def _follow(stream, wake):
+        try:
+            for _ in stream:
+                wake.set()
+        except Exception:
+            # Closed from stop(), or the daemon went away; polling continues.
+            pass
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def __call__(self, container, details):
+        health = details['State'].get('Health')
+        if not health:
+            return True
+        if health.get('Status') == 'unhealthy':
+            raise NotReady("%s is unhealthy" % container)
+        return health.get('Status') == 'healthy'
+
+
+def _docker_host(client):
+    """
+    The host name at which ports published by `client`'s daemon can be
+    reached.
+    """
+    url = urlparse(getattr(client, 'base_url', '') or '')
+    if url.scheme in ('http', 'https', 'tcp') and url.hostname:
+        return url.hostname
+    return '127.0.0.1'
+
+
+class TCPCheck(Check):
+    """
+    Ready when every port accepts TCP connections.
+
+    `ports` are container ports (e.g. 80 or '80/tcp') and default to the
+    container's `ports`.  Published ports are probed on the docker host;
+    unpublished ports on the instance's own address.
+    """
+
+    def __init__(self, ports=None, host=None, connect_timeout=0.5):
+        self.ports = ports
+        self.host = host
+        self.connect_timeout = connect_timeout
+
+    def addresses(self, container, details):
+        ports = self.ports
+        if ports is None:
+            ports = list(container.port_bindings)
+        published = details['NetworkSettings'].get('Ports') or {}
+        host = self.host or _docker_host(container.client)
+        out = []
+        for port in ports:
+            key = str(port)
+            if '/' not in key:
+                key += '/tcp'
+            bindings = published.get(key)
+            if bindings:
+                binding = bindings[0]
+                ip = binding.get('HostIp')
+                if not ip or ip == '0.0.0.0':
+                    ip = host
+                out.append((ip, int(binding['HostPort'])))
+            else:
+                ip = details['NetworkSettings'].get('IPAddress') or host
+                out.append((ip, int(key.split('/')[0])))
+        return out
+
+    def __call__(self, container, details):
+        for address in self.addresses(container, details):
+            try:
+                conn = socket.create_connection(
+                    address, timeout=self.connect_timeout,
+                )
+            except (socket.error, socket.timeout):
+                return False
+            conn.close()
+        return True
+
+
+class LogCheck(Check):
+    """
+    Ready once a line of output matches `pattern`, a regex (as text or
+    bytes) searched for in each line.
+
+    Output is followed on a background thread from the start of the
+    instance's logs, so matches are noticed as soon as they are written.
+    """
+
+    def __init__(self, pattern, stream=None):
+        if isinstance(pattern, string_types):
+            pattern = pattern.encode('utf-8')
+        self.pattern = re.compile(pattern)
+        self.stream = stream
+        self._matched = False
+        self._lines = None
+
+    def start(self, container, instance_id, wake):
+        self._matched = False
+        self._lines = stream_log_lines(
+            container.client, instance_id, follow=True,
+        )
+        _daemon_thread(self._follow, self._lines, wake)
+
+    def stop(self):
+        if self._lines is not None:
+            self._lines.close()
+            self._lines = None
+
+    def _follow(self, lines, wake):
+        try:
+            for line in lines:
+                if self.stream is not None and line.stream != self.stream:
+                    continue
+                if self.pattern.search(line.line):
+                    self._matched = True
+                    wake.set()
+                    return
+        except Exception:
+            pass
+
+    def __call__(self, container, details):
+        return self._matched
+
+
+def as_checks(check):
+    """
+    Normalize the `check` argument of `wait_ready` into a list of Checks.
+
+    Accepts a Check, a list of Checks, or a dict of the keyword form
+    {'health': True, 'tcp': [ports] or True, 'log': pattern}.
+    """
+    if check is None:
+        return [HealthCheck()]
+    if isinstance(check, Check):
+        return [check]
+    if isinstance(check, dict):
+        out = []
+        for kind, value in sorted(iteritems(check)):
+            if kind == 'health' and value:
+                out.append(HealthCheck())
+            elif kind == 'tcp' and value:
+                out.append(TCPCheck(None if value is True else value))
+            elif kind == 'log':
+                out.append(LogCheck(value))
+            elif value:
+                raise ValueError("Unknown readiness check %r" % kind)
+        return out
+    return list(check)
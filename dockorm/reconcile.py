@@ -0,0 +1,228 @@
+# encoding: utf-8
+"""
+Comparing Container specs with the instances on a daemon.
+
+`plan` inspects the instance of each spec and decides the least disruptive
+action that brings it in line; `ContainerGroup.reconcile` applies a plan.
+"""
+from __future__ import unicode_literals
+from collections import namedtuple
+
+from docker.errors import (
+    ImageNotFound,
+    NotFound,
+)
+from docker.utils import split_command
+from six import (
+    iteritems,
+    string_types,
+)
+
+from .container import (
+    NAME_LABEL,
+    REPLICA_LABEL,
+)
+from .parallel import (
+    DEFAULT_MAX_WORKERS,
+    map_concurrent,
+)
+from .pool import POOL_LABEL
+
+
+KEEP = 'keep'
+CREATE = 'create'
+RESTART = 'restart'
+RECREATE = 'recreate'
+REMOVE = 'remove'
+
+# HostConfig keys managed by Container._make_host_config.
+_HOST_CONFIG_KEYS = (
+    'Binds', 'ExtraHosts', 'NetworkMode', 'PortBindings', 'VolumesFrom',
+    'Memory', 'ShmSize', 'CpuShares', 'NanoCpus', 'CpusetCpus', 'CpusetMems',
+)
+
+# Values the daemon reports for resource limits that were never set.
+_HOST_CONFIG_DEFAULTS = {
+    'ShmSize': 64 * 1024 * 1024,
+}
+
+_LIVE_STATES = ('running', 'paused')
+
+
+class Step(namedtuple('Step', ['container', 'action', 'instance',
+                               'changes'])):
+    """
+    One entry in a reconciliation plan.
+
+    `container` is the Container spec, or None for an unmanaged instance
+    being removed.  `instance` is the existing instance's description from
+    `client.containers()`, or None.  `changes` is a tuple of the fields that
+    differ from the spec.
+    """
+    __slots__ = ()
+
+
+def _env_dict(env):
+    return dict(item.split('=', 1) for item in env or ())
+
+
+def _port_key(port):
+    if isinstance(port, tuple):
+        return '/'.join(str(p) for p in port)
+    return '{}/tcp'.format(port)
+
+
+def _command(command):
+    if isinstance(command, string_types):
+        return split_command(command)
+    return list(command or ())
+
+
+def _normalize(value, key=None):
+    if isinstance(value, list):
+        return sorted(value)
+    if key in _HOST_CONFIG_DEFAULTS and value == _HOST_CONFIG_DEFAULTS[key]:
+        return None
+    return value or None
+
+
+def diff(container, details, image=None):
+    """
+    Return the names of the fields in which an inspected instance differs
+    from its Container spec.
+
+    `details` is the instance's `inspect_container` output, and `image` the
+    `inspect_image` output for the spec's image, or None if the image is not
+    available locally.  Values the image supplies (default command,
+    environment and exposed ports) are taken into account.
+    """
+    config = details.get('Config') or {}
+    image_config = (image or {}).get('Config') or {}
+    changes = []
+
+    if image is not None and details.get('Image') != image['Id']:
+        changes.append('image')
+
+    command = _command(container.command)
+    if command and command != list(config.get('Cmd') or ()):
+        changes.append('command')
+
+    actual_env = _env_dict(config.get('Env'))
+    if image is None:
+        # Without the image's defaults, only check what the spec sets.
+        actual_env = dict(
+            (key, actual_env.get(key)) for key in container.environment
+        )
+    expected_env = _env_dict(image_config.get('Env'))
+    expected_env.update(container.environment)
+    if actual_env != expected_env:
+        changes.append('environment')
+
+    expected_ports = set(_port_key(p) for p in container.open_container_ports)
+    actual_ports = set(config.get('ExposedPorts') or ())
+    if expected_ports - actual_ports or (
+            actual_ports - expected_ports -
+            set(image_config.get('ExposedPorts') or ())):
+        changes.append('ports')
+
+    expected_host = container._make_host_config()
+    actual_host = details.get('HostConfig') or {}
+    for key in _HOST_CONFIG_KEYS:
+        expected = _normalize(expected_host.get(key), key)
+        if expected != _normalize(actual_host.get(key), key):
+            changes.append(key)
+
+    labels = config.get('Labels') or {}
+    for key, value in iteritems(container.instance_labels()):
+        if labels.get(key) != value:
+            changes.append('labels')
+            break
+    return changes
+
+
+def _plan_one(container, tag=None):
+    instances = container.instances()
+    if not instances:
+        return Step(container, CREATE, None, ())
+    instance = instances[0]
+    client = container.client
+    try:
+        details = client.inspect_container(instance['Id'])
+    except NotFound:
+        # Removed while we were looking.
+        return Step(container, CREATE, None, ())
+    try:
+        image = client.inspect_image(container.full_imagename(tag))
+    except ImageNotFound:
+        image = None
+    changes = diff(container, details, image)
+    if changes:
+        return Step(container, RECREATE, instance, tuple(changes))
+    if instance.get('State') not in _LIVE_STATES:
+        return Step(container, RESTART, instance, ())
+    return Step(container, KEEP, instance, ())
+
+
+def _unmanaged(client, names):
+    """
+    Find instances created by dockorm for Containers not in `names`.
+
+    Replicas and pool members are left to their own managers.
+    """
+    return [
+        c for c in client.containers(all=True, filters={'label': NAME_LABEL})
+        if (c.get('Labels') or {}).get(NAME_LABEL) not in names and
+        REPLICA_LABEL not in (c.get('Labels') or {}) and
+        POOL_LABEL not in (c.get('Labels') or {})
+    ]
+
+
+def plan(containers, tag=None, prune=False,
+         max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Compute the steps needed to make the daemon match `containers`.
+
+    Each spec gets one Step: KEEP if its instance is running and matches,
+    RESTART if it matches but has stopped, RECREATE if it differs, or
+    CREATE if there is none.  With `prune`, instances created by dockorm
+    for Containers not in `containers` get a REMOVE step.  Inspection runs
+    concurrently; errors are raised.
+    """
+    containers = list(containers)
+    results = map_concurrent(
+        lambda c: _plan_one(c, tag=tag), containers, max_workers=max_workers,
+    )
+    steps = []
+    for result in results.values():
+        if not result.ok:
+            raise result.error
+        steps.append(result.value)
+    if prune and containers:
+        names = set(c.name for c in containers)
+        steps.extend(
+            Step(None, REMOVE, instance, ())
+            for instance in _unmanaged(containers[0].client, names)
+        )
+    return steps
+
+
+def apply_step(step, client, tag=None, stop_timeout=None):
+    """
+    Carry out a single Step, returning its action.
+    """
+    container = step.container
+    if step.action in (RECREATE, REMOVE):
+        if step.instance.get('State') in _LIVE_STATES:
+            if stop_timeout is None:
+                client.stop(step.instance)
+            else:
+                client.stop(step.instance, timeout=stop_timeout)
+        client.remove_container(step.instance)
+        if container is not None:
+            container._refresh_cache(step.instance)
+    if step.action in (CREATE, RECREATE):
+        container.run(tag=tag)
+    elif step.action == RESTART:
+        client.start(step.instance)
+        container._refresh_cache(step.instance)
+    return step.action
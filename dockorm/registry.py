@@ -0,0 +1,234 @@
+# encoding: utf-8
+"""
+Pushing and pulling images, with parsed progress.
+"""
+from __future__ import division, unicode_literals
+from collections import namedtuple, OrderedDict
+import re
+
+from docker.errors import (
+    APIError,
+    ImageNotFound,
+)
+
+from .build import (
+    BuildOutputParser,
+    normalize_image_name,
+)
+
+
+class TransferError(Exception):
+    """
+    Raised when the daemon reports an error while pushing or pulling.
+    """
+
+
+class ProgressEvent(namedtuple('ProgressEvent', [
+        'image', 'kind', 'status', 'layer', 'current', 'total', 'raw'])):
+    """
+    A single message from a push or pull of `image`.
+
+    `kind` is one of 'status', 'progress', 'error', 'aux' or 'unknown'.
+    `layer` is the short ID of the layer a message is about, or None.
+    `current` and `total` are byte counts for 'progress' events, or None.
+    `raw` is the decoded JSON message.
+    """
+    __slots__ = ()
+
+    @property
+    def failed(self):
+        return self.kind in ('error', 'unknown')
+
+    @property
+    def digest(self):
+        """
+        The manifest digest reported by this event, or None.
+        """
+        if self.kind == 'aux':
+            return (self.raw.get('aux') or {}).get('Digest')
+        if self.kind == 'status':
+            match = _DIGEST.search(self.status)
+            if match is not None:
+                return match.group(1)
+        return None
+
+
+# 'Digest: sha256:...' after a pull, 'latest: digest: sha256:... size: 527'
+# after a push.
+_DIGEST = re.compile(r'(?:^|\s)[Dd]igest: (sha256:[0-9a-f]{64})')
+
+
+def _progress_event(image, event):
+    raw = event.raw
+    if event.kind == 'unknown' or not isinstance(raw, dict):
+        return ProgressEvent(image, 'unknown', raw, None, None, None, raw)
+    detail = raw.get('progressDetail') or {}
+    return ProgressEvent(
+        image=image,
+        kind='aux' if 'aux' in raw else event.kind,
+        status=raw.get('status') or raw.get('error') or '',
+        layer=raw.get('id'),
+        current=detail.get('current'),
+        total=detail.get('total'),
+        raw=raw,
+    )
+
+
+def iter_progress(image, output):
+    """
+    Lazily convert the raw output of a push or pull into ProgressEvents.
+    """
+    parser = BuildOutputParser()
+    for chunk in output:
+        for event in parser.feed(chunk):
+            yield _progress_event(image, event)
+    for event in parser.close():
+        yield _progress_event(image, event)
+
+
+class TransferProgress(object):
+    """
+    Running totals for a push or pull, fed with ProgressEvents.
+
+    `layers` maps each layer ID to its latest (status, current, total).
+    """
+
+    def __init__(self):
+        self.layers = OrderedDict()
+        self.digest = None
+
+    def update(self, event):
+        if event.digest is not None:
+            self.digest = event.digest
+        if event.layer is None or event.kind not in ('status', 'progress'):
+            return
+        _, current, total = self.layers.get(event.layer, (None, 0, 0))
+        if event.kind == 'progress':
+            current = event.current or 0
+            total = event.total or total
+        elif total:
+            # Layer finished a phase; count it as fully transferred.
+            current = total
+        self.layers[event.layer] = (event.status, current, total)
+
+    @property
+    def current(self):
+        return sum(current for _, current, _ in self.layers.values())
+
+    @property
+    def total(self):
+        return sum(total for _, _, total in self.layers.values())
+
+    def fraction(self):
+        """
+        The fraction of known bytes transferred, or None before any sizes
+        are known.
+        """
+        total = self.total
+        if not total:
+            return None
+        return min(self.current / total, 1.0)
+
+
+def consume_progress(events, callback=None):
+    """
+    Pass each event to `callback` and return the manifest digest reported.
+
+    Raises TransferError if the daemon reports an error.
+    """
+    progress = TransferProgress()
+    error = None
+    for event in events:
+        if event.failed and error is None:
+            error = event
+        progress.update(event)
+        if callback is not None:
+            callback(event)
+    if error is not None:
+        raise TransferError("%s: %s" % (error.image, error.status))
+    return progress.digest
+
+
+def split_image_name(name):
+    """
+    Split an image reference into (repository, tag).
+
+    For a reference by digest, such as 'repo@sha256:...', the "tag" is the
+    digest, which the daemon accepts in its place.  A tag given alongside a
+    digest is ignored, as it is by docker.
+    """
+    repository, at, digest = name.partition('@')
+    if at:
+        head, _, last = repository.rpartition('/')
+        last = last.partition(':')[0]
+        return (head + '/' + last if head else last), digest
+    repository, _, tag = normalize_image_name(name).rpartition(':')
+    return repository, tag
+
+
+def push_events(client, name):
+    """
+    Start pushing image `name` and return a generator of ProgressEvents.
+    """
+    name = normalize_image_name(name)
+    repository, tag = split_image_name(name)
+    return iter_progress(
+        name, client.push(repository, tag=tag, stream=True, decode=True),
+    )
+
+
+def pull_events(client, name):
+    """
+    Start pulling image `name` and return a generator of ProgressEvents.
+    """
+    name = normalize_image_name(name)
+    repository, tag = split_image_name(name)
+    return iter_progress(
+        name, client.pull(repository, tag=tag, stream=True, decode=True),
+    )
+
+
+def push_image(client, name, callback=None):
+    """
+    Push image `name`, returning the digest reported by the registry.
+    """
+    return consume_progress(push_events(client, name), callback)
+
+
+def pull_image(client, name, callback=None):
+    """
+    Pull image `name`, returning the digest reported by the registry.
+    """
+    return consume_progress(pull_events(client, name), callback)
+
+
+def registry_digest(client, name):
+    """
+    Return the digest of image `name` in its registry, as seen by the
+    daemon.
+    """
+    details = client.inspect_distribution(normalize_image_name(name))
+    return details['Descriptor']['digest']
+
+
+def is_current(client, name):
+    """
+    Return whether the local image `name` matches the registry.
+
+    A missing image is not current.  Images built locally, which have no
+    registry digest, are never replaced, and an image is assumed current if
+    the registry cannot be reached.
+    """
+    try:
+        image = client.inspect_image(normalize_image_name(name))
+    except ImageNotFound:
+        return False
+    local = set(
+        digest.rpartition('@')[2] for digest in image.get('RepoDigests') or ()
+    )
+    if not local:
+        return True
+    try:
+        return registry_digest(client, name) in local
+    except APIError:
+        return True
@@ -0,0 +1,350 @@
+# encoding: utf-8
+"""
+Parsing and aggregating container resource statistics.
+"""
+from __future__ import division, unicode_literals
+from array import array
+from calendar import timegm
+from collections import namedtuple
+import re
+from threading import (
+    Event,
+    Lock,
+    Thread,
+)
+import time
+
+from six import iteritems
+
+from .logs import ClosingIterator
+
+
+class Sample(namedtuple('Sample', [
+        'container', 'timestamp', 'cpu_percent', 'memory_usage',
+        'memory_rss', 'memory_limit', 'memory_percent', 'net_rx_bytes',
+        'net_tx_bytes', 'blk_read_bytes', 'blk_write_bytes', 'net_rx_rate',
+        'net_tx_rate', 'blk_read_rate', 'blk_write_rate', 'pids'])):
+    """
+    One reading of an instance's resource usage.
+
+    `cpu_percent` is relative to one CPU, as in `docker stats`, so a
+    container busy on two CPUs reports 200.  Memory figures are in bytes,
+    with page cache excluded from `memory_usage`.  Byte counters are
+    totals since the instance started; rates are bytes per second since the
+    previous sample, or None for the first.
+    """
+    __slots__ = ()
+
+
+# Fields kept by StatsAggregator.
+WINDOW_FIELDS = (
+    'cpu_percent', 'memory_usage', 'memory_percent', 'net_rx_rate',
+    'net_tx_rate', 'blk_read_rate', 'blk_write_rate',
+)
+
+_TIMESTAMP = re.compile(
+    r'^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$'
+)
+
+
+def parse_timestamp(text):
+    """
+    Parse the daemon's RFC 3339 timestamps, which carry nanoseconds, into
+    seconds since the epoch, or None if there is no time.
+    """
+    match = _TIMESTAMP.match(text or '')
+    if match is None or match.group(1).startswith('0001'):
+        # Stopped instances report the zero time.
+        return None
+    seconds = timegm(time.strptime(match.group(1), '%Y-%m-%dT%H:%M:%S'))
+    fraction = match.group(2)
+    if fraction:
+        seconds += int(fraction) / 10 ** len(fraction)
+    zone = match.group(3)
+    if zone != 'Z':
+        sign = 1 if zone[0] == '+' else -1
+        seconds -= sign * (int(zone[1:3]) * 3600 + int(zone[4:6]) * 60)
+    return seconds
+
+
+def _cpu_percent(raw):
+    cpu = raw.get('cpu_stats') or {}
+    precpu = raw.get('precpu_stats') or {}
+    usage = cpu.get('cpu_usage') or {}
+    pre_usage = precpu.get('cpu_usage') or {}
+    cpu_delta = usage.get('total_usage', 0) - pre_usage.get('total_usage', 0)
+    system_delta = (
+        cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+    )
+    online = cpu.get('online_cpus') or len(usage.get('percpu_usage') or ())
+    if cpu_delta <= 0 or system_delta <= 0:
+        return 0.0
+    return cpu_delta / system_delta * (online or 1) * 100.0
+
+
+def _memory(raw):
+    memory = raw.get('memory_stats') or {}
+    stats = memory.get('stats') or {}
+    usage = memory.get('usage', 0)
+    # cgroup v1 reports page cache as 'cache', v2 as 'inactive_file'.
+    cache = stats.get('total_inactive_file', stats.get(
+        'inactive_file', stats.get('cache', 0),
+    ))
+    rss = stats.get('rss', stats.get('anon', 0))
+    limit = memory.get('limit', 0)
+    return max(usage - cache, 0), rss, limit
+
+
+def _network(raw):
+    rx = tx = 0
+    for interface in (raw.get('networks') or {}).values():
+        rx += interface.get('rx_bytes', 0)
+        tx += interface.get('tx_bytes', 0)
+    return rx, tx
+
+
+def _blkio(raw):
+    read = write = 0
+    entries = (raw.get('blkio_stats') or {}).get(
+        'io_service_bytes_recursive'
+    ) or ()
+    for entry in entries:
+        op = entry.get('op', '').lower()
+        if op == 'read':
+            read += entry.get('value', 0)
+        elif op == 'write':
+            write += entry.get('value', 0)
+    return read, write
+
+
+def _rate(current, previous, field, elapsed):
+    if previous is None or not elapsed or elapsed <= 0:
+        return None
+    return max(current - getattr(previous, field), 0) / elapsed
+
+
+def parse_stats(raw, container=None, previous=None):
+    """
+    Turn one decoded document from the daemon's stats endpoint into a
+    Sample.  `previous` is the preceding Sample for the same instance, used
+    to compute rates.
+    """
+    timestamp = parse_timestamp(raw.get('read'))
+    if timestamp is None:
+        timestamp = time.time()
+    usage, rss, limit = _memory(raw)
+    rx, tx = _network(raw)
+    read, write = _blkio(raw)
+    elapsed = None
+    if previous is not None:
+        elapsed = timestamp - previous.timestamp
+    return Sample(
+        container=container or raw.get('id'),
+        timestamp=timestamp,
+        cpu_percent=_cpu_percent(raw),
+        memory_usage=usage,
+        memory_rss=rss,
+        memory_limit=limit,
+        memory_percent=usage / limit * 100.0 if limit else 0.0,
+        net_rx_bytes=rx,
+        net_tx_bytes=tx,
+        blk_read_bytes=read,
+        blk_write_bytes=write,
+        net_rx_rate=_rate(rx, previous, 'net_rx_bytes', elapsed),
+        net_tx_rate=_rate(tx, previous, 'net_tx_bytes', elapsed),
+        blk_read_rate=_rate(read, previous, 'blk_read_bytes', elapsed),
+        blk_write_rate=_rate(write, previous, 'blk_write_bytes', elapsed),
+        pids=(raw.get('pids_stats') or {}).get('current'),
+    )
+
+
+def _samples(container_id, raw_stats):
+    previous = None
+    for raw in raw_stats:
+        previous = parse_stats(raw, container_id, previous)
+        yield previous
+
+
+def iter_stats(client, container_id, stream=True):
+    """
+    Return a `dockorm.logs.ClosingIterator` of Samples for an instance, as
+    the daemon reports them about once a second, until it stops.  With
+    stream=False, it yields a single Sample.
+
+    docker-py's stats stream cannot be interrupted mid-read, so after
+    `close` the stream ends when the next sample arrives.
+    """
+    if stream:
+        raw_stats = client.stats(container_id, decode=True, stream=True)
+    else:
+        # docker-py rejects decode without stream; the reply is decoded.
+        raw_stats = [client.stats(container_id, stream=False)]
+    return ClosingIterator(_samples(container_id, raw_stats), [raw_stats])
+
+
+class RingBuffer(object):
+    """
+    A fixed-size window of floats, backed by an array.
+
+    Missing values are stored as NaN and skipped by the summaries.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._data = array('d', [float('nan')] * size)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        self._data[self._next] = float('nan') if value is None else value
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def values(self):
+        """
+        The window's values, oldest first, without missing values.
+        """
+        start = (self._next - self._count) % self.size
+        out = []
+        for i in range(self._count):
+            value = self._data[(start + i) % self.size]
+            if value == value:
+                out.append(value)
+        return out
+
+    def summary(self):
+        values = self.values()
+        if not values:
+            return None
+        return {
+            'last': values[-1],
+            'mean': sum(values) / len(values),
+            'max': max(values),
+            'min': min(values),
+        }
+
+
+class StatsAggregator(object):
+    """
+    Rolling windows of resource usage for many instances.
+
+    Each instance gets one RingBuffer of `window` samples per field in
+    WINDOW_FIELDS, so memory use is fixed per instance however long
+    monitoring runs.  Samples can be added directly, or streams followed
+    concurrently with `watch`.
+    """
+
+    def __init__(self, window=60, fields=WINDOW_FIELDS):
+        self.window = window
+        self.fields = tuple(fields)
+        self._lock = Lock()
+        self._series = {}
+        self._latest = {}
+        self._watching = {}
+
+    def add(self, sample):
+        with self._lock:
+            series = self._series.get(sample.container)
+            if series is None:
+                series = self._series[sample.container] = dict(
+                    (field, RingBuffer(self.window)) for field in self.fields
+                )
+            for field, buf in iteritems(series):
+                buf.append(getattr(sample, field))
+            self._latest[sample.container] = sample
+
+    def _follow(self, client, container_id, stop):
+        samples = None
+        try:
+            samples = iter_stats(client, container_id)
+            for sample in samples:
+                if stop.is_set():
+                    break
+                self.add(sample)
+        except Exception:
+            # The instance went away; keep what was collected.
+            pass
+        finally:
+            if samples is not None:
+                samples.close()
+            with self._lock:
+                if self._watching.get(container_id) is stop:
+                    del self._watching[container_id]
+
+    def watch(self, client, container_ids):
+        """
+        Follow the stats stream of each instance on its own daemon thread.
+
+        Instances already being watched are skipped.  Streams end when their
+        instance stops, or soon after `unwatch`.
+        """
+        for container_id in container_ids:
+            with self._lock:
+                if container_id in self._watching:
+                    continue
+                stop = self._watching[container_id] = Event()
+            thread = Thread(
+                target=self._follow, args=(client, container_id, stop),
+            )
+            thread.daemon = True
+            thread.start()
+
+    def unwatch(self, container_ids=None):
+        with self._lock:
+            if container_ids is None:
+                container_ids = list(self._watching)
+            for container_id in container_ids:
+                stop = self._watching.pop(container_id, None)
+                if stop is not None:
+                    stop.set()
+
+    def watching(self):
+        with self._lock:
+            return sorted(self._watching)
+
+    def forget(self, container_id):
+        """
+        Drop the windows kept for an instance.
+        """
+        with self._lock:
+            self._series.pop(container_id, None)
+            self._latest.pop(container_id, None)
+
+    def containers(self):
+        with self._lock:
+            return sorted(self._series)
+
+    def latest(self, container_id):
+        with self._lock:
+            return self._latest.get(container_id)
+
+    def series(self, container_id, field):
+        with self._lock:
+            return self._series[container_id][field].values()
+
+    def summary(self, container_id):
+        """
+        Return {field: {'last', 'mean', 'max', 'min'}} over the window for
+        one instance.  Fields with no data map to None.
+        """
+        with self._lock:
+            return dict(
+                (field, buf.summary())
+                for field, buf in iteritems(self._series[container_id])
+            )
+
+    def totals(self):
+        """
+        Return the sum over all instances of the latest CPU percentage,
+        memory usage and I/O rates.
+        """
+        with self._lock:
+            latest = list(self._latest.values())
+        out = {}
+        for field in ('cpu_percent', 'memory_usage', 'net_rx_rate',
+                      'net_tx_rate', 'blk_read_rate', 'blk_write_rate'):
+            out[field] = sum(getattr(s, field) or 0 for s in latest)
+        return out
@@ -1,15 +1,18 @@
 # encoding: utf-8
 from __future__ import unicode_literals
+import sys
 
-from docker import APIClient as Client
-from docker.utils import kwargs_from_env
 from pytest import fixture
 
 from .utils import (
     TEST_ORG,
     make_container,
+    test_client,
 )
 
+# dockorm.aio requires Python 3.7.
+collect_ignore = [] if sys.version_info >= (3, 7) else ['test_aio.py']
+
 
 @fixture(scope='session', autouse=True)
 def clean_test_images(request):
@@ -17,7 +20,7 @@ def clean_test_images(request):
     Automatically clear all test images after each test run.
     """
     def cleanup():
-        client = Client(version='auto', **kwargs_from_env())
+        client = test_client()
         test_images = client.images(TEST_ORG + "/*")
         for image in test_images:
             client.remove_image(image)
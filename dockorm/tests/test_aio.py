@@ -0,0 +1,92 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+import asyncio
+from io import BytesIO
+
+from pytest import (
+    fixture,
+    raises,
+)
+
+from ..aio import AsyncContainer
+from ..container import Container
+from .utils import make_container
+
+
+def run_sync(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@fixture
+def async_busybox(request, busybox):
+    container = AsyncContainer(busybox)
+
+    def clean():
+        busybox.purge(stop_first=False, remove_volumes=True)
+
+    request.addfinalizer(clean)
+    return container
+
+
+def test_async_wraps_container(async_busybox, busybox):
+    assert async_busybox.container is busybox
+    assert not isinstance(async_busybox, Container)
+
+    async def scenario():
+        await async_busybox.run(['sleep', '2147483647'])
+        # The wrapped Container's own methods are still synchronous.
+        return busybox.running()
+
+    assert run_sync(scenario())['Id'] == busybox.running()['Id']
+
+
+def test_async_run_join_logs_purge(async_busybox):
+    async def scenario():
+        await async_busybox.run(['sh', '-c', 'sleep 1; echo foo'])
+        assert await async_busybox.running() is not None
+        with raises(asyncio.TimeoutError):
+            await async_busybox.join(timeout=0.1)
+        await async_busybox.join(timeout=30)
+        assert await async_busybox.running() is None
+        logs = await async_busybox.logs(all=True)
+        assert logs[0]['Logs'] == b'foo\n'
+        await async_busybox.purge()
+        return await async_busybox.instances()
+
+    assert run_sync(scenario()) == []
+
+
+def test_async_many_containers(busybox, request):
+    containers = [
+        AsyncContainer(make_container('busybox', name='dockorm-async-%d' % i))
+        for i in range(5)
+    ]
+
+    def clean():
+        for c in containers:
+            c.container.purge(stop_first=False, remove_volumes=True)
+
+    request.addfinalizer(clean)
+
+    async def scenario():
+        await asyncio.gather(*(c.run(['sleep', '1']) for c in containers))
+        await asyncio.gather(*(c.join(timeout=30) for c in containers))
+        return await asyncio.gather(*(c.running() for c in containers))
+
+    assert run_sync(scenario()) == [None] * 5
+
+
+def test_async_run_attached(async_busybox):
+    stdout = BytesIO()
+
+    async def scenario():
+        await async_busybox.run(['cat'], attach=True, rm=True,
+                                stdin=b'hello\n', stdout=stdout)
+        return await async_busybox.instances()
+
+    assert run_sync(scenario()) == []
+    assert b'hello' in stdout.getvalue()
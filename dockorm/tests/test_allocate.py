@@ -0,0 +1,73 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+from pytest import raises
+
+from ..allocate import (
+    CPUAllocator,
+    format_cpuset,
+    parse_cpuset,
+    spread,
+    spread_replicas,
+    Topology,
+)
+from ..container import Container
+
+
+def two_nodes():
+    return Topology({0: range(0, 8), 1: range(8, 16)})
+
+
+def test_cpuset_round_trip():
+    assert parse_cpuset('0-3,8, 10-11\n') == [0, 1, 2, 3, 8, 10, 11]
+    assert format_cpuset([11, 0, 1, 2, 3, 8, 10]) == '0-3,8,10-11'
+    assert format_cpuset([]) == ''
+
+
+def test_topology_local(tmpdir):
+    for node, cpus in (('node0', '0-3\n'), ('node1', '4-7\n')):
+        tmpdir.mkdir(node).join('cpulist').write(cpus)
+    topology = Topology.local(str(tmpdir))
+    assert list(topology.nodes.items()) == [
+        (0, [0, 1, 2, 3]), (1, [4, 5, 6, 7]),
+    ]
+    # No NUMA information.
+    assert len(Topology.local(str(tmpdir.join('missing'))).nodes) == 1
+
+
+def test_allocator_spreads_across_nodes():
+    allocator = CPUAllocator(two_nodes())
+    first = allocator.allocate(4)
+    second = allocator.allocate(4)
+    assert first.nodes == (0,) and second.nodes == (1,)
+    assert first.cpuset_cpus == '0-3' and second.cpuset_cpus == '8-11'
+
+    # Too big for any one node: spans the fewest nodes.
+    allocator.release(first)
+    big = allocator.allocate(10)
+    assert big.nodes == (0, 1) and len(big.cpus) == 10
+    assert not set(big.cpus) & set(second.cpus)
+    with raises(ValueError):
+        allocator.allocate(3)
+
+
+def test_spread_containers():
+    containers = [
+        Container(image='busybox', name='a'),
+        Container(image='busybox', name='b', nano_cpus=6000000000),
+        Container(image='busybox', name='c'),
+    ]
+    allocations = spread(containers, two_nodes(), apply=True)
+    cpus = [set(a.cpus) for a in allocations.values()]
+    assert [len(c) for c in cpus] == [5, 6, 5]
+    assert not (cpus[0] & cpus[1] or cpus[0] & cpus[2] or cpus[1] & cpus[2])
+    assert containers[1].cpuset_cpus == allocations[containers[1]].cpuset_cpus
+    assert containers[1].cpuset_mems in ('0', '1')
+    with raises(ValueError):
+        spread(containers, two_nodes(), cpus=6)
+
+
+def test_spread_replicas():
+    allocations = spread_replicas(4, 2, two_nodes())
+    assert [a.nodes for a in allocations] == [(0,), (1,), (0,), (1,)]
+    assert len(set(c for a in allocations for c in a.cpus)) == 8
@@ -0,0 +1,67 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+from io import BytesIO
+import socket
+import struct
+
+from ..attach import (
+    Attachment,
+    FrameReader,
+)
+from ..logs import (
+    STDERR,
+    STDOUT,
+)
+
+
+def frame(stream_id, data):
+    return struct.pack('>BxxxL', stream_id, len(data)) + data
+
+
+def read_all(reader, data, chunk_size):
+    out = []
+    while data:
+        target = reader.target()
+        n = min(len(target), chunk_size, len(data))
+        target[:n] = data[:n]
+        data = data[n:]
+        found = reader.filled(n)
+        if found is not None:
+            out.append((found[0], found[1].tobytes()))
+    return out
+
+
+def test_frame_reader_multiplexed():
+    raw = frame(1, b'out') + frame(2, b'') + frame(2, b'err\n')
+    assert read_all(FrameReader(bufsize=16), raw, 100) == [
+        (STDOUT, b'out'),
+        (STDERR, b'err\n'),
+    ]
+    # Headers split across reads and frames larger than the buffer.
+    pieces = read_all(FrameReader(bufsize=2), raw, 3)
+    assert [s for s, _ in pieces] == [STDOUT, STDOUT, STDERR, STDERR]
+    assert b''.join(d for s, d in pieces if s == STDERR) == b'err\n'
+
+
+def test_frame_reader_tty():
+    assert read_all(FrameReader(tty=True), b'raw bytes', 4) == [
+        (STDOUT, b'raw '),
+        (STDOUT, b'byte'),
+        (STDOUT, b's'),
+    ]
+
+
+def test_attachment_pump():
+    ours, theirs = socket.socketpair()
+    attachment = Attachment(ours)
+    theirs.sendall(frame(1, b'out\n') + frame(2, b'err\n'))
+
+    stdout, stderr = BytesIO(), BytesIO()
+    attachment.start(BytesIO(b'input'), stdout, stderr)
+    assert theirs.recv(100) == b'input'
+    # End of stdin is passed on.
+    assert theirs.recv(100) == b''
+    theirs.close()
+    assert attachment.join(5)
+    assert stdout.getvalue() == b'out\n'
+    assert stderr.getvalue() == b'err\n'
@@ -0,0 +1,125 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+import os
+import tarfile
+
+from ..build import (
+    BuildOutputParser,
+    consume_build_events,
+    ContextCache,
+    context_digest,
+    context_paths,
+    dockerfile_parents,
+    iter_build_events,
+    packed_context,
+)
+
+
+def test_parser_split_messages():
+    chunks = [
+        b'{"stream": "Step 1/2 : FROM busybox\\n"}\r\n{"str',
+        b'eam": "caf\xc3',
+        b'\xa9\\n"}\r\n',
+        b'{"status": "Pulling"}{"aux": {"ID": "sha256:abc"}}\n',
+        b'{"status": "Downloading", "progressDetail": {"current": 1}}\n',
+    ]
+    events = list(iter_build_events(chunks))
+    assert [e.kind for e in events] == [
+        'stream', 'stream', 'status', 'aux', 'progress',
+    ]
+    assert events[1].message == 'caf\xe9\n'
+    assert events[3].message == {'ID': 'sha256:abc'}
+    assert consume_build_events(events, callback=None)
+
+
+def test_parser_errors():
+    parser = BuildOutputParser()
+    events = parser.feed(b'{"error": "boom"}\n{"unexpected": 1}\n{"strea')
+    assert [e.kind for e in events] == ['error', 'unknown']
+    assert all(e.failed for e in events)
+    trailing = parser.close()
+    assert [e.kind for e in trailing] == ['error']
+    assert not consume_build_events(events, callback=None)
+
+
+def test_parser_decoded_dicts():
+    events = list(iter_build_events([{'stream': 'foo'}]))
+    assert [(e.kind, e.message) for e in events] == [('stream', 'foo')]
+
+
+def test_context_digest(tmpdir):
+    tmpdir.join('Dockerfile').write('FROM busybox\n')
+    tmpdir.join('data.txt').write('data')
+    tmpdir.mkdir('ignored').join('big.bin').write('x' * 1000)
+    tmpdir.join('.dockerignore').write('# comment\nignored\n')
+
+    path = str(tmpdir)
+    assert context_paths(path) == ['.dockerignore', 'Dockerfile', 'data.txt']
+
+    digest = context_digest(path)
+    tmpdir.join('ignored', 'big.bin').write('y' * 1000)
+    assert context_digest(path) == digest
+
+    tmpdir.join('data.txt').write('changed')
+    assert context_digest(path) != digest
+
+
+def test_dockerfile_parents(tmpdir):
+    tmpdir.join('Dockerfile').write(
+        '# FROM commented/out\n'
+        'ARG VERSION=1\n'
+        'FROM --platform=linux/amd64 org/base AS builder\n'
+        'RUN make \\\n'
+        '    all\n'
+        'from org/other:2.0 as runtime\n'
+        'COPY --from=builder /out /out\n'
+        'FROM builder\n'
+        'FROM registry:5000/org/base\n'
+    )
+    assert dockerfile_parents(str(tmpdir)) == [
+        'org/base:latest',
+        'org/other:2.0',
+        'registry:5000/org/base:latest',
+    ]
+
+
+def make_context(tmpdir):
+    tmpdir.join('Dockerfile').write('FROM busybox\n')
+    tmpdir.join('data.txt').write('data')
+    tmpdir.mkdir('ignored').join('big.bin').write('x' * 1000)
+    tmpdir.join('.dockerignore').write('ignored\n')
+    return str(tmpdir)
+
+
+def test_write_context(tmpdir):
+    path = make_context(tmpdir.mkdir('context'))
+    for gzip, mode in ((False, 'r:'), (True, 'r:gz')):
+        with packed_context(path, gzip=gzip) as f:
+            with tarfile.open(fileobj=f, mode=mode) as tar:
+                assert sorted(tar.getnames()) == [
+                    '.dockerignore', 'Dockerfile', 'data.txt',
+                ]
+                assert tar.extractfile('data.txt').read() == b'data'
+
+
+def test_context_cache(tmpdir):
+    path = make_context(tmpdir.mkdir('context'))
+    cache = ContextCache(str(tmpdir.join('cache')), max_entries=2)
+
+    with cache.open(path) as f:
+        first = f.name
+    with cache.open(path) as f:
+        assert f.name == first
+
+    data = tmpdir.join('context', 'data.txt')
+    data.write('changed')
+    data.setmtime(data.mtime() + 10)
+    with cache.open(path) as f:
+        second = f.name
+        assert second != first
+    with cache.open(path, gzip=True) as f:
+        third = f.name
+
+    assert sorted(os.listdir(cache.directory)) == sorted(
+        os.path.basename(name) for name in (second, third)
+    )
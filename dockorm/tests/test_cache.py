@@ -0,0 +1,81 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+import time
+
+from pytest import fixture
+
+from ..cache import StateCache
+from .utils import make_container
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "Timed out waiting for condition."
+        time.sleep(0.05)
+
+
+@fixture
+def cached_busybox(request, busybox):
+    cache = StateCache(busybox.client)
+    cache.start(timeout=30)
+    busybox.state_cache = cache
+    request.addfinalizer(cache.stop)
+    return busybox
+
+
+def test_cache_serves_instances(cached_busybox):
+    cache = cached_busybox.state_cache
+    assert cached_busybox.instances() == []
+    decoy = make_container('busybox_decoy')
+    assert cache.containers(name=decoy.name, all=False)
+
+    cached_busybox.run(['sleep', '2147483647'])
+    wait_for(lambda: cached_busybox.running() is not None)
+    instance = cached_busybox.running()
+    assert instance['Names'] == ['/busybox-running']
+    assert cache.containers(image=instance['Image'], all=False) == [instance]
+
+    cached_busybox.stop()
+    wait_for(lambda: cached_busybox.running() is None)
+    assert cached_busybox.instances(status='exited')[0]['Id'] == instance['Id']
+
+    cached_busybox.purge()
+    wait_for(lambda: cached_busybox.instances() == [])
+
+
+def test_cache_resync_and_destroy(busybox):
+    cache = StateCache(busybox.client)
+    busybox.run(['true'])
+    cache.resync()
+    instance, = cache.containers(name=busybox.name)
+
+    cache.handle_event({'Type': 'container', 'Action': 'destroy',
+                        'Actor': {'ID': instance['Id']}})
+    assert cache.containers(name=busybox.name) == []
+
+    cache.handle_event({'Type': 'container', 'Action': 'die',
+                        'Actor': {'ID': instance['Id']}})
+    refreshed, = cache.containers(name=busybox.name)
+    assert refreshed['Id'] == instance['Id']
+
+
+def test_cache_refreshed_by_container(busybox):
+    # Not following events, so only the Container keeps it current.
+    cache = StateCache(busybox.client)
+    cache.resync()
+    busybox.state_cache = cache
+
+    busybox.run(['sleep', '2147483647'])
+    instance = busybox.running()
+    assert instance is not None
+    # A status filter implies all, as it does on the daemon.
+    assert cache.containers(name=busybox.name, status='running', all=False)
+
+    busybox.stop()
+    assert busybox.running() is None
+    exited, = cache.containers(name=busybox.name, status='exited', all=False)
+    assert exited['Id'] == instance['Id']
+
+    busybox.purge()
+    assert busybox.instances() == []
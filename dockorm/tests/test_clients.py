@@ -0,0 +1,106 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+from pytest import (
+    fixture,
+    skip,
+)
+
+from ..clients import (
+    clear_clients,
+    get_client,
+)
+from ..container import Container
+from .utils import using_fake
+
+
+class StubClient(object):
+    """
+    Records how it was created, and negotiates a version without a daemon.
+    """
+    created = []
+
+    def __init__(self, version=None, **kwargs):
+        self.version = version
+        self.kwargs = kwargs
+        self.api_version = '1.41' if version == 'auto' else version
+        self.closed = False
+        self.created.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+def stub_kwargs_from_env(environment=None, **kwargs):
+    kwargs['base_url'] = environment['DOCKER_HOST']
+    return kwargs
+
+
+@fixture
+def stub_clients(request, monkeypatch):
+    clear_clients()
+    monkeypatch.setattr('dockorm.clients.Client', StubClient)
+    # assert_hostname is not accepted by every docker-py version.
+    monkeypatch.setattr(
+        'dockorm.clients.kwargs_from_env', stub_kwargs_from_env,
+    )
+    del StubClient.created[:]
+    request.addfinalizer(clear_clients)
+    return StubClient.created
+
+
+def env(host):
+    return {'DOCKER_HOST': host}
+
+
+def test_get_client_keys(stub_clients):
+    first = get_client(environment=env('tcp://a:2375'))
+    assert get_client(environment=env('tcp://a:2375')) is first
+    assert first.kwargs == {'base_url': 'tcp://a:2375'}
+
+    others = [
+        get_client(environment=env('tcp://b:2375')),
+        get_client(assert_hostname=False, environment=env('tcp://a:2375')),
+        get_client(max_pool_size=2, environment=env('tcp://a:2375')),
+    ]
+    assert len(set(map(id, [first] + others))) == 4
+    assert others[1].kwargs['assert_hostname'] is False
+    assert others[2].kwargs['max_pool_size'] == 2
+    assert get_client(
+        max_pool_size=2, environment=env('tcp://a:2375'),
+    ) is others[2]
+    assert len(stub_clients) == 4
+
+
+def test_get_client_caches_versions(stub_clients):
+    first = get_client(environment=env('tcp://a:2375'))
+    pooled = get_client(max_pool_size=2, environment=env('tcp://a:2375'))
+    other = get_client(environment=env('tcp://b:2375'))
+    # Only the first client for each daemon negotiates.
+    assert [c.version for c in (first, pooled, other)] == [
+        'auto', '1.41', 'auto',
+    ]
+
+    clear_clients()
+    assert all(c.closed for c in stub_clients)
+    again = get_client(environment=env('tcp://a:2375'))
+    assert again is not first
+    assert again.version == 'auto'
+
+
+def test_shared_client():
+    if using_fake():
+        skip("Requires a docker daemon.")
+    clear_clients()
+    first = Container(image='busybox')
+    second = Container(image='busybox_decoy')
+    assert first.client is second.client
+    assert first.client is get_client()
+
+    pooled = Container(image='busybox', max_pool_size=2)
+    assert pooled.client is not first.client
+    assert pooled.client.api_version == first.client.api_version
+
+    private = Container(image='busybox', shared_client=False)
+    assert private.client is not first.client
+    clear_clients()
@@ -1,12 +1,21 @@
 # encoding: utf-8
 from __future__ import unicode_literals
+from io import BytesIO
 
 from docker.errors import APIError
 from pytest import raises
+from traitlets import TraitError
 
+from ..allocate import (
+    spread_replicas,
+    Topology,
+)
+from ..build import ContextCache
 from ..container import (
+    Container,
     scalar,
 )
+from ..fake import FakeClient
 from .utils import (
     assert_in_logs,
     TEST_ORG,
@@ -24,7 +33,8 @@ def checked_join(container):
 
 
 def checked_purge(container):
-    container.purge()
+    results = container.purge()
+    assert all(result.ok for result in results.values())
     assert container.running() is None
     assert container.instances() == []
 
@@ -287,3 +297,276 @@ def test_build_failed_pull(capsys):
     assert (
         "pull access denied for dockorm_fake_org/dockorm_fake_image" in stdout[1]
     )
+
+
+def test_container_instances_filters(busybox):
+    busybox.run(['true'])
+    checked_join(busybox)
+
+    instance = scalar(busybox.instances())
+    assert busybox.instances(status='exited') == [instance]
+    assert busybox.instances(status='running') == []
+    assert busybox.instances(label='dockorm.nonexistent') == []
+
+    busybox.filter_on_daemon = False
+    assert busybox.instances() == [instance]
+    assert busybox.instances(status='exited') == [instance]
+    assert busybox.instances(status='running') == []
+
+
+def test_container_build_stream(busybox):
+    events = list(busybox.build(stream=True))
+    assert events
+    assert not any(event.failed for event in events)
+    assert any(
+        event.kind == 'stream' and event.message.startswith('Successfully')
+        for event in events
+    )
+
+    seen = []
+    assert busybox.build(callback=seen.append)
+    assert seen and not any(event.failed for event in seen)
+
+
+def test_container_iter_logs(busybox):
+    busybox.run(['sh', '-c', 'echo out; echo err >&2; echo done'])
+    checked_join(busybox)
+
+    lines = list(busybox.iter_logs(all=True))
+    assert [line.line for line in lines if line.stream == 'stdout'] == [
+        b'out',
+        b'done',
+    ]
+    assert [line.line for line in lines if line.stream == 'stderr'] == [
+        b'err',
+    ]
+
+    tail = list(busybox.iter_logs(all=True, tail=1, stderr=False,
+                                  timestamps=True))
+    assert [line.line for line in tail] == [b'done']
+    assert tail[0].timestamp
+
+    # The tail applies to both streams together.
+    tail = list(busybox.iter_logs(all=True, tail=1))
+    assert [(line.stream, line.line) for line in tail] == [
+        ('stdout', b'done'),
+    ]
+    tail = list(busybox.iter_logs(all=True, tail=2))
+    assert [(line.stream, line.line) for line in tail] == [
+        ('stderr', b'err'), ('stdout', b'done'),
+    ]
+
+
+def test_container_labels(busybox):
+    busybox.labels = {'team': 'research'}
+    busybox.run(['true'])
+    instance = scalar(busybox.instances(label={'team': 'research'}))
+    assert instance['Labels'] == {
+        'team': 'research',
+        'dockorm.name': 'busybox-running',
+    }
+
+
+def test_container_purge_concurrent(busybox):
+    busybox.run(['sleep', '2147483647'])
+    instance = scalar(busybox.instances())
+
+    results = busybox.purge(max_workers=4, stop_timeout=0)
+    assert list(results) == [instance['Id']]
+    assert all(result.ok for result in results.values())
+    assert busybox.instances() == []
+
+
+def test_container_purge_prune(busybox):
+    busybox.command = ['sleep', '2147483647']
+    busybox.run()
+    instance = scalar(busybox.instances())
+    busybox.run(replicas=1)
+    replica, = busybox.replicas()
+    busybox.client.kill(replica)
+
+    results = busybox.purge(max_workers=4, stop_first=False, prune=True)
+    assert list(results) == [instance['Id']]
+    assert results[instance['Id']].ok
+    assert busybox.instances() == []
+    # A stopped replica is left alone, as it is by a plain purge.
+    assert [r['Id'] for r in busybox.replicas()] == [replica['Id']]
+    busybox.scale(0)
+
+
+def test_container_purge_prune_error():
+    client = FakeClient()
+    container = Container(image='busybox', command=['sleep', '2147483647'])
+    container.client = client
+    container.run()
+    instance = container.running()
+
+    def broken(**kwargs):
+        raise APIError('prune already running')
+
+    client.prune_containers = broken
+    results = container.purge(max_workers=4, stop_first=False, prune=True)
+    assert isinstance(results[instance['Id']].error, APIError)
+
+
+def test_container_build_skip_unchanged(busybox, monkeypatch):
+    def unexpected(path):
+        raise AssertionError("context hashed without skip_unchanged")
+
+    with monkeypatch.context() as m:
+        m.setattr('dockorm.container.context_digest', unexpected)
+        assert busybox.build(display=False)
+    assert busybox.built_image() is None
+
+    busybox.remove_images()
+    assert busybox.build(display=False, skip_unchanged=True)
+    assert busybox.built_image() is not None
+
+    events = list(busybox.build(stream=True, skip_unchanged=True))
+    assert [event.kind for event in events] == ['status']
+    assert 'unchanged' in events[0].message
+
+
+def test_container_build_packed_context(busybox, tmpdir):
+    busybox.remove_images()
+    busybox.gzip_context = True
+    busybox.context_cache = ContextCache(str(tmpdir))
+    assert busybox.build(callback=None)
+    assert len(tmpdir.listdir()) == 1
+    assert busybox.images()
+
+
+def test_container_exec_run(busybox):
+    busybox.run(['sleep', '2147483647'])
+
+    output = busybox.exec_run(['sh', '-c', 'echo out; echo err >&2; exit 3'])
+    chunks = list(output)
+    assert (b'out\n', None) in chunks and (None, b'err\n') in chunks
+    assert output.exit_code == 3
+
+    result = busybox.exec_run(['sh', '-c', 'echo out; echo err >&2'],
+                              stream=False, demux=False)
+    assert result.exit_code == 0
+    assert sorted(result.output.splitlines()) == [b'err', b'out']
+
+    result = busybox.exec_run('env', stream=False, environment=['FOO=bar'])
+    assert b'FOO=bar' in result.output[0]
+    checked_purge(busybox)
+
+
+def test_container_exec_many(busybox):
+    busybox.run(['sleep', '2147483647'])
+    other = busybox.create(command=['sleep', '2147483647'],
+                           name='busybox-running-other')
+    busybox.client.start(other)
+    instances = [busybox.running()['Id'], other['Id']]
+
+    seen = []
+    results = busybox.exec_many(
+        [['hostname'], ['hostname'], ['sh', '-c', 'exit 1']],
+        instances=instances,
+        callback=lambda index, chunk: seen.append(index),
+    )
+    assert all(result.ok for result in results)
+    assert [r.value.exit_code for r in results] == [0, 0, 1]
+    hostnames = [r.value.output[0] for r in results[:2]]
+    assert hostnames[0] != hostnames[1]
+    assert sorted(seen) == [0, 1]
+
+    busybox.client.remove_container(other, force=True)
+    checked_purge(busybox)
+
+
+def test_container_run_attached(busybox):
+    stdout = BytesIO()
+    busybox.run(['cat'], attach=True, stdin=BytesIO(b'hello\n'),
+                stdout=stdout)
+    assert b'hello' in stdout.getvalue()
+    assert busybox.wait(timeout=5) == 0
+    checked_purge(busybox)
+
+    stdout = BytesIO()
+    busybox.run(['sh', '-c', 'echo out; echo err >&2'], attach=True,
+                rm=True, stdin=BytesIO(), stdout=stdout)
+    assert sorted(stdout.getvalue().split()) == [b'err', b'out']
+    assert busybox.instances() == []
+
+
+def test_container_run_attached_nonblocking(busybox):
+    stdout = BytesIO()
+    attachment = busybox.run(['sh', '-c', 'sleep 0.2; echo done'],
+                             attach=True, rm=True, stdin=BytesIO(),
+                             stdout=stdout, block=False)
+    assert attachment.join(5)
+    assert stdout.getvalue().strip() == b'done'
+    assert busybox.instances() == []
+
+
+def test_container_replicas(busybox):
+    busybox.command = ['sleep', '2147483647']
+    results = busybox.run(replicas=3)
+    assert list(results) == [0, 1, 2]
+    assert all(result.ok for result in results.values())
+
+    replicas = busybox.running_replicas()
+    assert [r['Names'] for r in replicas] == [
+        ['/busybox-running-0'], ['/busybox-running-1'], ['/busybox-running-2'],
+    ]
+    assert [r['Labels']['dockorm.replica'] for r in replicas] == [
+        '0', '1', '2',
+    ]
+    # Replicas are separate from the spec's own instance.
+    assert busybox.instances() == []
+    assert busybox.running() is None
+
+    busybox.client.stop(replicas[1])
+    results = busybox.scale(5)
+    assert dict((i, r.value) for i, r in results.items()) == {
+        1: 'started', 3: 'created', 4: 'created',
+    }
+    assert len(busybox.running_replicas()) == 5
+    # Already converged.
+    assert busybox.scale(5) == {}
+
+    results = busybox.scale(2, stop_timeout=0)
+    assert list(results) == [2, 3, 4]
+    assert [r['Id'] for r in busybox.replicas()] == [
+        r['Id'] for r in replicas[:2]
+    ]
+    busybox.scale(0, stop_timeout=0)
+    assert busybox.replicas() == []
+
+
+def test_container_resources(busybox):
+    busybox.mem_limit = '64m'
+    busybox.cpu_shares = 512
+    busybox.nano_cpus = 500000000
+    busybox.cpuset_cpus = [0, 1, 3]
+    busybox.cpuset_mems = '0'
+    assert busybox.cpuset_cpus == '0-1,3'
+    for trait, value in (('mem_limit', 'lots'), ('mem_limit', -1),
+                         ('cpu_shares', 1), ('cpuset_cpus', '0-')):
+        with raises(TraitError):
+            setattr(busybox, trait, value)
+
+    busybox.run(['sleep', '2147483647'])
+    host_config = busybox.inspect()['HostConfig']
+    validate_dict(host_config, {
+        'Memory': 64 * 1024 * 1024,
+        'CpuShares': 512,
+        'NanoCpus': 500000000,
+        'CpusetCpus': '0-1,3',
+        'CpusetMems': '0',
+    })
+    checked_purge(busybox)
+
+
+def test_container_replica_allocations(busybox):
+    allocations = spread_replicas(2, 1, Topology({0: [0, 1]}))
+    busybox.run(['sleep', '2147483647'], replicas=2, allocations=allocations)
+    cpusets = [
+        busybox.client.inspect_container(r['Id'])['HostConfig']['CpusetCpus']
+        for r in busybox.replicas()
+    ]
+    assert cpusets == ['0', '1']
+    busybox.scale(0, stop_timeout=0)
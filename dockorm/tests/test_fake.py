@@ -0,0 +1,54 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+import time
+
+from docker.errors import (
+    APIError,
+    NotFound,
+)
+from pytest import raises
+
+from ..container import Container
+from ..fake import FakeClient
+
+
+def make_fake_container(client, **kwargs):
+    container = Container(image='busybox', tag='latest', **kwargs)
+    container.client = client
+    return container
+
+
+def test_fake_lifecycle_and_call_counts():
+    client = FakeClient()
+    container = make_fake_container(client)
+    container.run(['sh', '-c', 'echo hi; exit 2'])
+
+    assert container.wait() == 2
+    assert container.logs(all=True)[0]['Logs'] == b'hi\n'
+    assert client.calls['create_container'] == 1
+    assert client.calls['start'] == 1
+
+    with raises(APIError) as e:
+        container.run(['true'])
+    assert e.value.response.status_code == 409
+
+    container.purge()
+    with raises(NotFound):
+        container.inspect()
+
+
+def test_fake_latency():
+    client = FakeClient(latency=0.05)
+    container = make_fake_container(client)
+    start = time.time()
+    container.instances()
+    assert time.time() - start >= 0.05
+
+
+def test_fake_follow_logs():
+    client = FakeClient()
+    container = make_fake_container(client)
+    container.run(['sh', '-c', 'echo one; sleep 0.2; echo two'])
+    lines = list(container.iter_logs(follow=True))
+    assert [line.line for line in lines] == [b'one', b'two']
+    assert container.running() is None
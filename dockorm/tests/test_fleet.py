@@ -0,0 +1,105 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+from collections import OrderedDict
+
+from docker.errors import APIError
+from pytest import raises
+
+from ..container import Container
+from ..fake import FakeClient
+from ..fleet import (
+    Fleet,
+    FleetError,
+    Host,
+    HOST_KEY,
+    round_robin,
+    spread_by_load,
+)
+
+
+def make_fleet(count=3):
+    return Fleet(hosts=[
+        Host('host%d' % i, FakeClient()) for i in range(count)
+    ])
+
+
+def sleeper(name='fleet-test'):
+    return Container(image='busybox', name=name, command='sleep 1000')
+
+
+def test_run_everywhere():
+    fleet = make_fleet()
+    spec = sleeper()
+    results = fleet.run(spec)
+    assert list(results) == ['host0', 'host1', 'host2']
+    assert all(r.ok for r in results.values())
+
+    instances = fleet.instances(spec, all=False)
+    assert sorted(i[HOST_KEY] for i in instances) == list(results)
+    assert [i[HOST_KEY] for i in fleet.images(spec)] == list(results)
+
+    # The spec itself is not bound to any of the hosts.
+    assert spec._client is None
+
+    fleet.stop(spec, hosts=['host1'])
+    assert sorted(
+        i[HOST_KEY] for i in fleet.instances(spec, all=False)
+    ) == ['host0', 'host2']
+    assert all(r.ok for r in fleet.purge(spec).values())
+    assert fleet.instances(spec) == []
+
+
+def test_partial_failure():
+    fleet = make_fleet(2)
+    spec = sleeper()
+    fleet.host('host1').client.remove_image('busybox:latest')
+    results = fleet.run(spec)
+    assert results['host0'].ok
+    assert isinstance(results['host1'].error, APIError)
+
+    def broken(**kwargs):
+        raise APIError('unreachable')
+
+    fleet.host('host1').client.containers = broken
+    with raises(FleetError) as info:
+        fleet.instances(spec)
+    assert list(info.value.errors) == ['host1']
+    assert [i[HOST_KEY] for i in info.value.partial] == ['host0']
+
+
+def test_placement_policies():
+    loads = OrderedDict([('a', 2), ('b', 0), ('c', 1)])
+    assert spread_by_load(range(4), loads) == ['b', 'b', 'c', 'a']
+    assert loads['b'] == 0
+    assert round_robin(range(4), loads) == [
+        'a', 'b', 'c', 'a',
+    ]
+
+
+def test_deploy_spreads_by_load():
+    fleet = make_fleet()
+    fleet.host('host0').client.populate(2, running=True)
+    fleet.host('host1').client.populate(1, running=True)
+    specs = [sleeper('fleet-%d' % i) for i in range(3)]
+    results = fleet.deploy(specs)
+    assert [spec for spec, _ in results] == specs
+    # Ties go to the earlier host.
+    assert [r.value for _, r in results] == ['host2', 'host1', 'host2']
+    assert fleet.loads() == {'host0': 2, 'host1': 2, 'host2': 2}
+    for spec, result in results:
+        instance, = fleet.instances(spec)
+        assert instance[HOST_KEY] == result.value
+
+
+def test_deploy_same_spec_twice():
+    fleet = make_fleet(2)
+    spec = sleeper()
+    placement = fleet.place([spec, spec])
+    assert [(c, h.name) for c, h in placement] == [
+        (spec, 'host0'), (spec, 'host1'),
+    ]
+    results = fleet.deploy([spec, spec])
+    assert [r.value for _, r in results] == ['host0', 'host1']
+    assert sorted(i[HOST_KEY] for i in fleet.instances(spec)) == [
+        'host0', 'host1',
+    ]
@@ -0,0 +1,227 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+from threading import Event
+import time
+
+from pytest import (
+    fixture,
+    raises,
+)
+from requests.exceptions import ConnectionError
+
+from ..build import BuildError
+from ..container import (
+    Container,
+    Link,
+    WaitCancelled,
+    WaitTimeout,
+)
+from ..fake import FakeClient
+from ..group import (
+    ContainerGroup,
+    wait_all,
+    wait_any,
+)
+from ..parallel import DependencyError
+from .utils import make_container
+
+
+@fixture
+def group(request, busybox):
+    db = make_container('busybox', name='dockorm-group-db',
+                        command=['sleep', '2147483647'])
+    app = make_container(
+        'busybox',
+        name='dockorm-group-app',
+        command=['sleep', '2147483647'],
+        links=[Link(container=db, alias='db')],
+    )
+    group = ContainerGroup(containers=[app, db])
+
+    def clean():
+        group.purge(stop_first=False, remove_volumes=True)
+
+    request.addfinalizer(clean)
+    return group
+
+
+def test_group_run_stop_purge(group):
+    app, db = group.containers
+    assert list(group.dependencies().items()) == [(app, [db]), (db, [])]
+
+    results = group.run()
+    assert list(results) == [db, app]
+    assert all(result.ok for result in results.values())
+    assert all(r.value is not None for r in group.running().values())
+
+    results = group.stop()
+    assert all(result.ok for result in results.values())
+    assert all(r.value is None for r in group.running().values())
+
+    results = group.purge()
+    assert all(result.ok for result in results.values())
+    assert app.instances() == [] and db.instances() == []
+
+
+def test_group_reports_failures(group):
+    app, db = group.containers
+    db.tag = 'dockorm_nonexistent_tag'
+    results = group.run()
+    assert not results[db].ok
+    assert not results[app].ok
+    assert app.instances() == []
+
+
+def test_wait_all_and_any(busybox, request):
+    containers = [
+        make_container('busybox', name='dockorm-wait-%d' % i)
+        for i in range(3)
+    ]
+
+    def clean():
+        for c in containers:
+            c.purge(stop_first=False, remove_volumes=True)
+
+    request.addfinalizer(clean)
+
+    containers[0].run(['sh', '-c', 'exit 3'])
+    containers[1].run(['sleep', '1'])
+    containers[2].run(['sleep', '2147483647'])
+
+    container, result = wait_any(containers, timeout=30)
+    assert container is containers[0]
+    assert result.value == 3
+
+    results = wait_all(containers[:2], timeout=30)
+    assert [r.value for r in results.values()] == [3, 0]
+
+    results = wait_all(containers, timeout=0.5)
+    assert isinstance(results[containers[2]].error, WaitTimeout)
+
+    with raises(WaitTimeout):
+        wait_any(containers[2:], timeout=0.5)
+
+    cancel = Event()
+    cancel.set()
+    with raises(WaitCancelled):
+        containers[2].wait(cancel=cancel)
+
+
+def test_wait_gives_up_on_dead_daemon():
+    client = FakeClient()
+    container = Container(image='busybox', name='dockorm-wait-dead',
+                          command=['sleep', '2147483647'])
+    container.client = client
+    container.run()
+
+    def refused(*args, **kwargs):
+        raise ConnectionError('Connection refused')
+
+    client.wait = refused
+    with raises(ConnectionError):
+        container.wait(timeout=30, cancel=Event(), poll_interval=0.01)
+
+
+def test_wait_all_bounded():
+    client = FakeClient()
+    containers = []
+    for i, command in enumerate(['sleep 0.1', 'sleep 0.1', 'sleep 1000']):
+        container = Container(image='busybox', name='dockorm-bounded-%d' % i,
+                              command=command)
+        container.client = client
+        container.run()
+        containers.append(container)
+
+    start = time.time()
+    results = wait_all(containers, timeout=1, max_workers=1)
+    assert [r.value for r in results.values()][:2] == [0, 0]
+    assert isinstance(results[containers[2]].error, WaitTimeout)
+    # The timeout is shared, not restarted for each queued wait.
+    assert time.time() - start < 2
+
+
+def test_group_build_order(busybox, capsys):
+    child = make_container('busybox_child')
+    group = ContainerGroup(containers=[child, busybox])
+    assert group.build_dependencies() == {child: [busybox], busybox: []}
+
+    busybox.remove_images()
+    events = []
+    results = group.build(callback=lambda c, e: events.append((c, e)))
+    assert list(results) == [busybox, child]
+    assert all(result.ok for result in results.values())
+
+    builders = [c for c, event in events]
+    assert busybox not in builders[builders.index(child):]
+    assert child.images()
+
+    group.build()
+    stdout, _ = capsys.readouterr()
+    assert '[dockorm_testing/busybox_child:test] Step 1/2' in stdout
+    child.remove_images()
+
+
+def test_group_build_skips_children_of_failures(capsys):
+    orphan = make_container('orphan')
+    child = make_container('busybox_child')
+    # Make the child depend on the orphan image by renaming it.
+    orphan.organization, orphan.image = 'dockorm_testing', 'busybox'
+    results = ContainerGroup(containers=[orphan, child]).build()
+    assert isinstance(results[orphan].error, BuildError)
+    assert isinstance(results[child].error, DependencyError)
+
+
+def test_group_reconcile(group):
+    app, db = group.containers
+    steps = group.plan()
+    assert [(s.container, s.action) for s in steps] == [
+        (app, 'create'), (db, 'create'),
+    ]
+    results = group.reconcile(steps=steps)
+    assert list(results) == [db, app]
+    assert all(result.ok for result in results.values())
+    first = {c: c.running()['Id'] for c in group.containers}
+
+    # Nothing to do, so nothing is touched.
+    assert [s.action for s in group.plan()] == ['keep', 'keep']
+    results = group.reconcile()
+    assert {c: r.value for c, r in results.items()} == {
+        app: 'keep', db: 'keep',
+    }
+    assert {c: c.running()['Id'] for c in group.containers} == first
+
+    # A stopped container is restarted in place.
+    app.stop()
+    assert [s.action for s in group.plan()] == ['restart', 'keep']
+    group.reconcile(stop_timeout=0)
+    assert app.running()['Id'] == first[app]
+
+    # Changing a spec recreates it, and anything linking to it.
+    db.environment = {'FOO': 'bar'}
+    steps = group.plan()
+    assert [(s.action, s.changes) for s in steps] == [
+        ('recreate', ('links',)),
+        ('recreate', ('environment',)),
+    ]
+    group.reconcile(steps=steps, stop_timeout=0)
+    assert db.running()['Id'] != first[db]
+    assert app.running()['Id'] != first[app]
+    assert [s.action for s in group.plan()] == ['keep', 'keep']
+
+
+def test_group_reconcile_prune(group):
+    app, db = group.containers
+    group.run()
+    smaller = ContainerGroup(containers=[db])
+    app_id = app.running()['Id']
+    steps = smaller.plan(prune=True)
+    removals = [s for s in steps if s.action == 'remove']
+    assert app_id in [s.instance['Id'] for s in removals]
+    # Leave other tests' containers alone.
+    steps = [
+        s for s in steps if s.action != 'remove' or s.instance['Id'] == app_id
+    ]
+    results = smaller.reconcile(steps=steps, stop_timeout=0)
+    assert results[db].value == 'keep'
+    assert results[app_id].value == 'remove'
+    assert app.instances() == []
@@ -0,0 +1,109 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+import logging
+
+from docker.errors import NotFound
+from pytest import raises
+
+from ..instrument import (
+    InstrumentedClient,
+    LoggingSink,
+    MetricsRegistry,
+    Sink,
+    TracingSink,
+)
+
+
+class FakeSpan(object):
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = dict(tags)
+        self.finished = False
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+
+    def finish(self):
+        self.finished = True
+
+
+class FakeTracer(object):
+
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, tags=None):
+        span = FakeSpan(name, tags or {})
+        self.spans.append(span)
+        return span
+
+
+def test_instrumented_container(busybox, caplog):
+    records = []
+    registry = MetricsRegistry()
+    tracer = FakeTracer()
+    busybox.client = InstrumentedClient(busybox.client, [
+        records.append,
+        registry,
+        LoggingSink(),
+        TracingSink(tracer),
+    ], measure_sizes=True)
+
+    with caplog.at_level(logging.DEBUG, logger='dockorm.docker'):
+        busybox.run(['true'])
+        busybox.join()
+        with raises(NotFound):
+            busybox.client.inspect_container('dockorm-no-such-container')
+
+    methods = [r.method for r in records]
+    assert methods[:2] == ['create_container', 'start']
+    assert 'create_host_config' not in methods
+    create = records[0]
+    assert create.container == 'busybox-running'
+    assert create.error is None and create.size > 0
+
+    failed = records[-1]
+    assert failed.outcome == 'NotFound'
+    assert registry.calls[('inspect_container', 'NotFound')] == 1
+    assert registry.calls[('create_container', 'ok')] == 1
+    _, count, _ = registry.histogram('start')
+    assert count == 1
+
+    text = registry.render()
+    assert 'dockorm_docker_calls_total{method="start",outcome="ok"} 1' in text
+    assert 'dockorm_docker_call_seconds_bucket{method="start",le="+Inf"} 1' \
+        in text
+
+    assert [s.name for s in tracer.spans][:2] == [
+        'docker.create_container',
+        'docker.start',
+    ]
+    assert all(s.finished for s in tracer.spans)
+    assert tracer.spans[-1].tags['error'] is True
+
+    log_record = caplog.records[-1]
+    assert log_record.docker_method == 'inspect_container'
+    assert log_record.docker_outcome == 'NotFound'
+    assert log_record.levelno == logging.WARNING
+
+
+class BrokenSink(Sink):
+
+    def start(self, method, container):
+        raise RuntimeError('start')
+
+    def finish(self, record, token):
+        raise RuntimeError('finish')
+
+
+def test_instrumented_sink_errors(busybox):
+    records = []
+    client = InstrumentedClient(busybox.client, [BrokenSink(), records.append])
+    # The call's own error is raised, not the sink's.
+    with raises(NotFound):
+        client.inspect_container('dockorm-no-such-container')
+    assert client.containers(all=True) is not None
+    assert [r.method for r in records] == ['inspect_container', 'containers']
+    # JSON responses are not measured by default.
+    assert records[-1].size is None
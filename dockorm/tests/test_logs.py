@@ -0,0 +1,144 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+from io import BytesIO
+import struct
+from threading import (
+    Event,
+    Timer,
+)
+
+from pytest import raises
+
+from ..fake import FakeClient
+from ..logs import (
+    _merge_by_timestamp,
+    iter_frames,
+    iter_lines,
+    LogLine,
+    merge_streams,
+    STDERR,
+    STDOUT,
+    stream_log_lines,
+)
+
+
+def frame(stream_id, data):
+    return struct.pack('>BxxxL', stream_id, len(data)) + data
+
+
+def test_iter_frames_multiplexed():
+    raw = BytesIO(frame(1, b'out') + frame(2, b'err\n') + frame(1, b' more\n'))
+    assert list(iter_frames(raw)) == [
+        (STDOUT, b'out'),
+        (STDERR, b'err\n'),
+        (STDOUT, b' more\n'),
+    ]
+
+
+def test_iter_frames_tty():
+    assert list(iter_frames(BytesIO(b'raw bytes'), tty=True)) == [
+        (STDOUT, b'raw bytes'),
+    ]
+
+
+def test_iter_lines_buffers_per_stream():
+    frames = [
+        (STDOUT, b'fo'),
+        (STDERR, b'warn\nhal'),
+        (STDOUT, b'o\nbar\n'),
+        (STDERR, b'f'),
+    ]
+    assert list(iter_lines(frames, 'abc')) == [
+        LogLine('abc', STDERR, b'warn', None),
+        LogLine('abc', STDOUT, b'foo', None),
+        LogLine('abc', STDOUT, b'bar', None),
+        LogLine('abc', STDERR, b'half', None),
+    ]
+
+
+def test_iter_lines_timestamps():
+    frames = [(STDOUT, b'2017-01-01T00:00:00.000000000Z hello\n')]
+    line, = iter_lines(frames, timestamps=True)
+    assert line.timestamp == '2017-01-01T00:00:00.000000000Z'
+    assert line.line == b'hello'
+
+
+def test_merge_streams():
+    merged = list(merge_streams([iter([1, 2, 3]), iter([4, 5])]))
+    assert sorted(merged) == [1, 2, 3, 4, 5]
+
+    def failing():
+        yield 1
+        raise ValueError('boom')
+
+    with raises(ValueError):
+        list(merge_streams([failing(), iter([2])]))
+
+
+class Blocking(object):
+    """
+    An endless source that stops once closed, like a followed log stream.
+    """
+
+    def __init__(self):
+        self.closed = Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed.wait(0.01):
+            raise StopIteration
+        return 1
+
+    next = __next__
+
+    def close(self):
+        self.closed.set()
+
+
+def test_merge_streams_closes_sources():
+    sources = [Blocking(), Blocking()]
+    merged = merge_streams(sources)
+    next(merged)
+    merged.close()
+    assert all(source.closed.is_set() for source in sources)
+
+
+def test_merge_by_timestamp():
+    def line(stream, stamp):
+        return LogLine('abc', stream, stamp.encode('ascii'), stamp)
+    out = [line(STDOUT, '2017-01-01T00:00:00.5Z'),
+           line(STDOUT, '2017-01-01T00:00:01Z')]
+    err = [line(STDERR, '2017-01-01T00:00:00.25Z'),
+           line(STDERR, '2017-01-01T00:00:00.75Z')]
+    assert [x.stream for x in _merge_by_timestamp(out, err)] == [
+        STDERR, STDOUT, STDERR, STDOUT,
+    ]
+
+
+def test_close_ends_follow():
+    client = FakeClient()
+    container = client.create_container(
+        'busybox', command=['sh', '-c', 'echo hi; sleep 2147483647'],
+    )
+    client.start(container)
+    lines = stream_log_lines(client, container['Id'], follow=True)
+    assert next(lines).line == b'hi'
+
+    closer = Timer(0.1, lines.close)
+    closer.start()
+    assert list(lines) == []
+    client.kill(container)
+
+
+def test_tail_follow_both_streams():
+    client = FakeClient()
+    container = client.create_container('busybox', command=[
+        'sh', '-c', 'echo o1; echo e1 >&2; echo o2; sleep 0.3; echo e2 >&2',
+    ])
+    client.start(container)
+    lines = stream_log_lines(client, container['Id'], follow=True, tail=2)
+    assert [(x.stream, x.line, x.timestamp) for x in lines] == [
+        (STDERR, b'e1', None), (STDOUT, b'o2', None), (STDERR, b'e2', None),
+    ]
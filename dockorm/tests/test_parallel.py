@@ -0,0 +1,73 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+from threading import Lock
+import time
+
+from pytest import raises
+
+from ..parallel import (
+    DependencyError,
+    map_concurrent,
+    map_dag,
+    toposort,
+)
+
+
+def test_map_concurrent_captures_errors():
+    def func(x):
+        if x == 2:
+            raise ValueError(x)
+        return x * 10
+
+    results = map_concurrent(func, [1, 2, 3])
+    assert list(results) == [1, 2, 3]
+    assert results[1].value == 10
+    assert results[3].value == 30
+    assert not results[2].ok
+    assert isinstance(results[2].error, ValueError)
+
+
+def test_toposort():
+    deps = {'a': ['b', 'c'], 'b': ['c'], 'c': [], 'd': ['external']}
+    order = toposort(deps)
+    assert order.index('c') < order.index('b') < order.index('a')
+    assert 'd' in order
+
+    with raises(ValueError):
+        toposort({'a': ['b'], 'b': ['a']})
+
+
+def test_map_dag_order_and_parallelism():
+    started = []
+    lock = Lock()
+
+    def func(x):
+        with lock:
+            started.append(x)
+        time.sleep(0.1)
+        return x
+
+    deps = {'db': [], 'cache': [], 'app': ['db', 'cache'], 'web': ['app']}
+    start = time.time()
+    results = map_dag(func, deps, max_workers=4)
+    elapsed = time.time() - start
+
+    assert all(r.ok for r in results.values())
+    assert set(started[:2]) == {'db', 'cache'}
+    assert started[2:] == ['app', 'web']
+    # Three levels deep, so roughly three sleeps rather than four.
+    assert elapsed < 0.35
+
+
+def test_map_dag_skips_dependents_of_failures():
+    def func(x):
+        if x == 'db':
+            raise RuntimeError('boom')
+        return x
+
+    deps = {'db': [], 'app': ['db'], 'web': ['app'], 'other': []}
+    results = map_dag(func, deps)
+    assert isinstance(results['db'].error, RuntimeError)
+    assert isinstance(results['app'].error, DependencyError)
+    assert isinstance(results['web'].error, DependencyError)
+    assert results['other'].value == 'other'
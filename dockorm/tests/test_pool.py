@@ -0,0 +1,134 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+from pytest import (
+    fixture,
+    raises,
+)
+
+from ..pool import (
+    ContainerPool,
+    POOL_LABEL,
+    PoolTimeout,
+)
+
+
+@fixture
+def pool(request, busybox):
+    pool = ContainerPool(spec=busybox, size=2, max_size=3)
+
+    def clean():
+        pool.close()
+        for member in pool_members(pool):
+            pool.client.remove_container(member, force=True)
+
+    request.addfinalizer(clean)
+    return pool
+
+
+def pool_members(pool):
+    return pool.client.containers(
+        all=True,
+        filters={'label': '{}={}'.format(POOL_LABEL, pool.spec.name)},
+    )
+
+
+def test_pool_fill_and_exec(pool):
+    pool.fill()
+    assert pool.stats() == {'idle': 2, 'leased': 0, 'pending': 0}
+    members = pool_members(pool)
+    assert len(members) == 2
+    assert all(m['State'] == 'running' for m in members)
+    # Pool members never show up as instances of the spec itself.
+    assert pool.spec.instances() == []
+
+    with pool.acquire() as lease:
+        assert pool.stats()['leased'] == 1
+        code, output = lease.exec_run(['echo', 'hello'])
+        assert code == 0
+        assert output.strip() == b'hello'
+        first = lease.id
+
+    # Released members are reused.
+    assert pool.stats() == {'idle': 2, 'leased': 0, 'pending': 0}
+    with pool.acquire() as lease:
+        assert lease.id != first
+    with pool.acquire() as lease:
+        assert lease.id == first
+
+
+def test_pool_max_size(pool):
+    leases = [pool.acquire() for _ in range(3)]
+    assert len(set(lease.id for lease in leases)) == 3
+    with raises(PoolTimeout):
+        pool.acquire(timeout=0.1)
+
+    leases[0].release()
+    assert pool.acquire(timeout=0.1).id == leases[0].id
+
+
+def test_pool_recycle_and_evict(pool):
+    pool.fill()
+    with raises(ValueError):
+        with pool.acquire() as lease:
+            failed = lease.id
+            raise ValueError()
+    # Failed members are replaced rather than reused.
+    ids = set(m['Id'] for m in pool_members(pool))
+    assert failed not in ids and len(ids) == 2
+
+    leases = [pool.acquire() for _ in range(3)]
+    for lease in leases:
+        lease.release()
+    assert pool.stats()['idle'] == 3
+
+    pool.idle_timeout = 0
+    assert pool.evict_idle() == 1
+    assert len(pool_members(pool)) == 2
+
+
+def test_pool_created_mode(pool):
+    pool.mode = 'created'
+    pool.spec.command = ['sleep', '2147483647']
+    pool.fill()
+    assert all(m['State'] == 'created' for m in pool_members(pool))
+
+    lease = pool.acquire()
+    assert pool.client.inspect_container(lease.id)['State']['Running']
+    lease.release()
+    # Created-mode members are single-use.
+    ids = set(m['Id'] for m in pool_members(pool))
+    assert lease.id not in ids and len(ids) == 2
+
+
+def test_pool_created_mode_job(pool):
+    pool.mode = 'created'
+    pool.spec.command = ['sh', '-c', 'echo working; sleep 0.2; exit 3']
+    with pool.acquire() as lease:
+        assert lease.wait(timeout=30) == 3
+        assert [line.line for line in lease.iter_logs()] == [b'working']
+
+    # Leaving the block waits for the job instead of killing it.
+    removed = []
+    remove = pool._remove_member
+
+    def checked_remove(member):
+        removed.append(pool.client.inspect_container(member.id)['State'])
+        remove(member)
+
+    pool._remove_member = checked_remove
+    with pool.acquire():
+        pass
+    assert not removed[0]['Running']
+    assert removed[0]['ExitCode'] == 3
+
+
+def test_pool_close(pool):
+    pool.fill()
+    lease = pool.acquire()
+    pool.close()
+    assert [m['Id'] for m in pool_members(pool)] == [lease.id]
+    with raises(RuntimeError):
+        pool.acquire()
+    lease.release()
+    assert pool_members(pool) == []
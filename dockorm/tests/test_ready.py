@@ -0,0 +1,127 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+import socket
+from threading import Event
+import time
+
+from pytest import raises
+
+from ..container import (
+    WaitCancelled,
+    WaitTimeout,
+)
+from ..group import wait_ready_all
+from ..ready import (
+    as_checks,
+    Check,
+    HealthCheck,
+    LogCheck,
+    NotReady,
+    TCPCheck,
+)
+from .utils import make_container
+
+
+def listener():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(5)
+    return sock
+
+
+def test_health_check_states(busybox):
+    check = HealthCheck(events=False)
+
+    def details(health):
+        return {'State': {'Running': True, 'Health': health}}
+
+    assert check(busybox, details(None))
+    assert not check(busybox, details({'Status': 'starting'}))
+    assert check(busybox, details({'Status': 'healthy'}))
+    with raises(NotReady):
+        check(busybox, details({'Status': 'unhealthy'}))
+
+
+def test_as_checks():
+    assert [type(c) for c in as_checks(None)] == [HealthCheck]
+    checks = as_checks({'health': True, 'log': 'up', 'tcp': [80]})
+    assert [type(c) for c in checks] == [HealthCheck, LogCheck, TCPCheck]
+    with raises(ValueError):
+        as_checks({'bogus': True})
+
+
+def test_wait_ready_health(busybox):
+    with raises(NotReady):
+        busybox.wait_ready(timeout=1)
+    busybox.run(['sleep', '2147483647'])
+    # No HEALTHCHECK, so running is ready.
+    details = busybox.wait_ready(timeout=1)
+    assert details['Id'] == busybox.running()['Id']
+
+
+def test_wait_ready_log(busybox):
+    busybox.run(['sh', '-c', 'echo starting; sleep 0.3; echo listening; '
+                             'sleep 2147483647'])
+    start = time.time()
+    busybox.wait_ready(timeout=5, check={'log': 'listen'})
+    assert 0.3 <= time.time() - start < 2
+
+    with raises(WaitTimeout):
+        busybox.wait_ready(timeout=0.3, check=LogCheck('never'))
+    cancel = Event()
+    cancel.set()
+    with raises(WaitCancelled):
+        busybox.wait_ready(check=LogCheck('never'), cancel=cancel)
+
+
+def test_log_check_stop(busybox):
+    busybox.run(['sleep', '2147483647'])
+    check = LogCheck('never')
+    check.start(busybox, busybox.running()['Id'], Event())
+    lines = check._lines
+    closed = []
+    close = lines.close
+    lines.close = lambda: closed.append(close())
+    check.stop()
+    assert closed == [None]
+    assert check._lines is None
+    with raises(TypeError):
+        Check()
+
+
+def test_wait_ready_exits(busybox):
+    busybox.run(['sh', '-c', 'sleep 0.2; exit 3'])
+    with raises(NotReady) as e:
+        busybox.wait_ready(timeout=5, check=LogCheck('never'))
+    assert 'code 3' in str(e.value)
+
+
+def test_wait_ready_tcp(busybox):
+    sock = listener()
+    port = sock.getsockname()[1]
+    try:
+        busybox.ports = {80: port}
+        busybox.run(['sleep', '2147483647'])
+        details = busybox.wait_ready(timeout=5, check={'tcp': True})
+        assert details['State']['Running']
+    finally:
+        sock.close()
+    with raises(WaitTimeout):
+        busybox.wait_ready(timeout=0.2, check=TCPCheck(host='127.0.0.1'))
+
+
+def test_wait_ready_all(busybox, request):
+    containers = [
+        make_container('busybox', name='dockorm-ready-%d' % i)
+        for i in range(3)
+    ]
+
+    def clean():
+        for c in containers:
+            c.purge(stop_first=False)
+
+    request.addfinalizer(clean)
+    for i, c in enumerate(containers):
+        c.run(['sh', '-c', 'sleep 0.%d; echo ready; sleep 2147483647' % i])
+    results = wait_ready_all(containers, timeout=5, check={'log': 'ready'})
+    assert all(result.ok for result in results.values())
@@ -0,0 +1,42 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+
+from ..reconcile import (
+    diff,
+    plan,
+)
+
+
+def test_diff_fields(busybox, tmpdir):
+    busybox.command = ['sleep', '2147483647']
+    busybox.ports = {80: 8080}
+    busybox.volumes_readonly = {str(tmpdir): '/data'}
+    busybox.run()
+    client = busybox.client
+    details = client.inspect_container(busybox.running()['Id'])
+    image = client.inspect_image(busybox.full_imagename())
+    assert diff(busybox, details, image) == []
+    # A missing image is not counted as a change.
+    assert diff(busybox, details) == []
+
+    busybox.command = 'sleep 2147483647'
+    assert diff(busybox, details, image) == []
+    busybox.command = ['sleep', '1']
+    busybox.ports = {80: 8081}
+    busybox.volumes_readonly = {}
+    busybox.volumes_readwrite = {str(tmpdir): '/data'}
+    busybox.extra_hosts = {'db': '10.0.0.1'}
+    busybox.network_mode = 'none'
+    assert diff(busybox, details, image) == [
+        'command', 'Binds', 'ExtraHosts', 'NetworkMode', 'PortBindings',
+    ]
+    busybox.ports = {81: 8080}
+    assert 'ports' in diff(busybox, details, image)
+
+    other = dict(image, Id='sha256:' + '0' * 64)
+    assert diff(busybox, details, other)[0] == 'image'
+
+
+def test_plan_missing(busybox):
+    (step,) = plan([busybox])
+    assert step.action == 'create' and step.instance is None
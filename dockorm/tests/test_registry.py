@@ -0,0 +1,163 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+import json
+
+from pytest import raises
+
+from ..container import Container
+from ..fake import (
+    FakeClient,
+    FakeRegistry,
+)
+from ..group import ContainerGroup
+from ..registry import (
+    consume_progress,
+    is_current,
+    iter_progress,
+    split_image_name,
+    TransferError,
+    TransferProgress,
+)
+
+
+DIGEST = 'sha256:' + 'ab' * 32
+
+PULL_OUTPUT = [
+    {'status': 'Pulling from library/app', 'id': 'latest'},
+    {'status': 'Pulling fs layer', 'progressDetail': {}, 'id': 'l1'},
+    {'status': 'Downloading', 'id': 'l1',
+     'progressDetail': {'current': 100, 'total': 400}},
+    {'status': 'Pulling fs layer', 'progressDetail': {}, 'id': 'l2'},
+    {'status': 'Downloading', 'id': 'l2',
+     'progressDetail': {'current': 300, 'total': 600}},
+    {'status': 'Pull complete', 'progressDetail': {}, 'id': 'l1'},
+    {'status': 'Digest: ' + DIGEST},
+    {'status': 'Status: Downloaded newer image for app:latest'},
+]
+
+
+def chunks(messages, size=7):
+    data = b''.join(
+        json.dumps(m).encode('utf-8') + b'\r\n' for m in messages
+    )
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def spec(client, image='app', **kwargs):
+    container = Container(image=image, **kwargs)
+    container.client = client
+    return container
+
+
+def test_split_image_name():
+    assert split_image_name('app') == ('app', 'latest')
+    assert split_image_name('host:5000/org/app:v1') == (
+        'host:5000/org/app', 'v1',
+    )
+    assert split_image_name('app@' + DIGEST) == ('app', DIGEST)
+    assert split_image_name('host:5000/org/app:v1@' + DIGEST) == (
+        'host:5000/org/app', DIGEST,
+    )
+    assert split_image_name('host:5000/app@' + DIGEST) == (
+        'host:5000/app', DIGEST,
+    )
+
+
+def test_parse_progress():
+    events = list(iter_progress('app:latest', chunks(PULL_OUTPUT)))
+    assert [e.kind for e in events] == [
+        'status', 'status', 'progress', 'status', 'progress', 'status',
+        'status', 'status',
+    ]
+    assert events[2].layer == 'l1'
+    assert (events[2].current, events[2].total) == (100, 400)
+
+    progress = TransferProgress()
+    for event in events[:5]:
+        progress.update(event)
+    assert (progress.current, progress.total) == (400, 1000)
+    assert progress.fraction() == 0.4
+    progress.update(events[5])
+    assert progress.layers['l1'] == ('Pull complete', 400, 400)
+
+    seen = []
+    assert consume_progress(iter(events), seen.append) == DIGEST
+    assert seen == events
+
+
+def test_push_reports_errors():
+    client = FakeClient()
+    results = spec(client).push()
+    assert list(results) == ['latest']
+    with raises(TransferError):
+        raise results['latest'].error
+
+
+def test_push_and_pull():
+    registry = FakeRegistry()
+    builder = FakeClient(
+        registry=registry, base_images=('busybox:latest', 'busybox:v2'),
+    )
+    runner = FakeClient(registry=registry)
+    pusher = spec(builder, image='busybox')
+    results = pusher.push(tags=['latest'])
+    digest = results['latest'].value
+    assert digest.startswith('sha256:')
+    image = builder.inspect_image('busybox')
+    assert image['RepoDigests'] == ['busybox@' + digest]
+
+    # Streamed progress from each tag, interleaved.
+    events = list(pusher.push(tags=['latest', 'v2'], stream=True))
+    assert set(e.image for e in events) == {'busybox:latest', 'busybox:v2'}
+    assert digest in [e.digest for e in events]
+    assert any(e.kind == 'progress' for e in events)
+
+    puller = spec(runner, image='busybox')
+    runner.remove_image('busybox:latest')
+    assert not is_current(runner, 'busybox')
+    assert puller.pull()['latest'].value == digest
+    assert runner.inspect_image('busybox')['Id'] == image['Id']
+    assert is_current(runner, 'busybox')
+
+
+def test_run_pull_if_missing(tmpdir):
+    registry = FakeRegistry()
+    builder = FakeClient(registry=registry)
+    runner = FakeClient(registry=registry, base_images=())
+    spec(builder, image='busybox').push()
+
+    container = spec(runner, image='busybox', command='sleep 1000')
+    container.run(pull_if_missing=True)
+    assert runner.calls['pull'] == 1
+    container.purge()
+
+    # Up to date: nothing pulled.
+    container.run(pull_if_missing=True)
+    assert runner.calls['pull'] == 1
+    assert runner.calls['inspect_distribution'] == 1
+    container.purge()
+
+    # The registry has moved on.
+    tmpdir.join('Dockerfile').write('FROM busybox\nRUN true\n')
+    list(builder.build(str(tmpdir), tag='busybox:latest'))
+    spec(builder, image='busybox').push()
+    assert container.ensure_image()
+    assert runner.calls['pull'] == 2
+    assert not container.ensure_image()
+
+
+def test_group_push_dedupes_images():
+    client = FakeClient(base_images=('app:latest', 'db:latest'))
+    group = ContainerGroup(containers=[
+        spec(client, image='app', name='a'),
+        spec(client, image='app', name='b'),
+        spec(client, image='db'),
+    ])
+    seen = []
+    results = group.push(
+        callback=lambda container, event: seen.append(container.name),
+    )
+    assert list(results) == ['app:latest', 'db:latest']
+    assert all(r.ok for r in results.values())
+    assert set(seen) == {'a', 'db-running'}
+    assert client.calls['push'] == 2
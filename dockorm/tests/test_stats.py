@@ -0,0 +1,139 @@
+# encoding: utf-8
+from __future__ import unicode_literals
+from itertools import islice
+import time
+
+from docker.errors import InvalidArgument
+from pytest import raises
+
+from ..stats import (
+    iter_stats,
+    parse_stats,
+    parse_timestamp,
+    RingBuffer,
+    StatsAggregator,
+)
+
+
+def raw_stats(read, cpu, system, net=0, blk=0, cgroup_v2=False):
+    if cgroup_v2:
+        memory = {'stats': {'inactive_file': 100, 'anon': 700}}
+    else:
+        memory = {'stats': {'cache': 100, 'rss': 700}}
+    memory.update(usage=900, limit=2000)
+    return {
+        'read': read,
+        'cpu_stats': {
+            'cpu_usage': {'total_usage': cpu, 'percpu_usage': [cpu, 0]},
+            'system_cpu_usage': system,
+        },
+        'precpu_stats': {
+            'cpu_usage': {'total_usage': cpu - 50},
+            'system_cpu_usage': system - 200,
+        },
+        'memory_stats': memory,
+        'networks': {
+            'eth0': {'rx_bytes': net, 'tx_bytes': net // 2},
+            'eth1': {'rx_bytes': net, 'tx_bytes': 0},
+        },
+        'blkio_stats': {'io_service_bytes_recursive': [
+            {'op': 'Read', 'value': blk},
+            {'op': 'Write', 'value': blk * 2},
+            {'op': 'Total', 'value': blk * 3},
+        ]},
+        'pids_stats': {'current': 3},
+    }
+
+
+def test_parse_timestamp():
+    assert parse_timestamp('1970-01-01T00:00:01.500000000Z') == 1.5
+    assert parse_timestamp('1970-01-01T01:00:01+01:00') == 1
+    assert parse_timestamp('0001-01-01T00:00:00Z') is None
+    assert parse_timestamp(None) is None
+
+
+def test_parse_stats():
+    for cgroup_v2 in (False, True):
+        first = parse_stats(raw_stats(
+            '2020-01-01T00:00:00.0Z', 1000, 10000, cgroup_v2=cgroup_v2,
+        ), 'abc')
+        assert first.container == 'abc'
+        # 50 of 200 system ticks, over two CPUs.
+        assert first.cpu_percent == 50.0
+        assert first.memory_usage == 800
+        assert first.memory_rss == 700
+        assert first.memory_percent == 40.0
+        assert first.pids == 3
+        assert first.net_rx_rate is None
+
+        second = parse_stats(raw_stats(
+            '2020-01-01T00:00:02.0Z', 1100, 10400, net=400, blk=1000,
+            cgroup_v2=cgroup_v2,
+        ), 'abc', first)
+        assert (second.net_rx_bytes, second.net_tx_bytes) == (800, 200)
+        assert (second.net_rx_rate, second.net_tx_rate) == (400, 100)
+        assert (second.blk_read_rate, second.blk_write_rate) == (500, 1000)
+
+
+def test_ring_buffer():
+    buf = RingBuffer(3)
+    assert buf.summary() is None
+    for value in (1, None, 2, 3, 4):
+        buf.append(value)
+    assert len(buf) == 3
+    assert buf.values() == [2, 3, 4]
+    assert buf.summary() == {'last': 4, 'mean': 3, 'max': 4, 'min': 2}
+
+
+def test_aggregator_window():
+    aggregator = StatsAggregator(window=2)
+    previous = None
+    for i in range(4):
+        previous = parse_stats(raw_stats(
+            '2020-01-01T00:00:0%d.0Z' % i, 1000 + 50 * i, 10000 + 200 * i,
+            net=100 * i,
+        ), 'abc', previous)
+        aggregator.add(previous)
+    assert aggregator.containers() == ['abc']
+    assert aggregator.series('abc', 'net_rx_rate') == [200, 200]
+    summary = aggregator.summary('abc')
+    assert summary['cpu_percent']['mean'] == 50.0
+    assert aggregator.totals()['memory_usage'] == 800
+    aggregator.forget('abc')
+    assert aggregator.containers() == []
+
+
+def test_container_stats(busybox):
+    busybox.run(['sleep', '2147483647'])
+    instance = busybox.running()['Id']
+
+    sample, = busybox.stats(stream=False)
+    assert sample.container == instance
+    assert sample.memory_limit > 0
+    # As with docker-py, decode requires stream.
+    with raises(InvalidArgument):
+        busybox.client.stats(instance, decode=True, stream=False)
+
+    samples = list(islice(busybox.stats(), 2))
+    assert [s.container for s in samples] == [instance, instance]
+    assert samples[1].net_rx_rate is not None
+
+    aggregator = StatsAggregator(window=4)
+    aggregator.watch(busybox.client, [instance])
+    assert aggregator.watching() == [instance]
+    deadline = time.time() + 5
+    while aggregator.latest(instance) is None and time.time() < deadline:
+        time.sleep(0.05)
+    busybox.purge()
+    while aggregator.watching() and time.time() < deadline:
+        time.sleep(0.05)
+    assert aggregator.watching() == []
+    assert aggregator.latest(instance).container == instance
+
+
+def test_close_stats_stream(busybox):
+    busybox.run(['sleep', '2147483647'])
+    samples = iter_stats(busybox.client, busybox.running()['Id'])
+    next(samples)
+    samples.close()
+    assert list(samples) == []
@@ -9,17 +9,49 @@ from os.path import (
     join,
 )
 
+from docker import APIClient as Client
+from docker.utils import kwargs_from_env
 from six import iteritems
 
 from ..container import (
     Container,
     scalar,
 )
+from ..fake import FakeClient
 
 
 TEST_ORG = 'dockorm_testing'
 TEST_TAG = 'test'
 
+# One of 'docker', 'fake' or 'auto'.  'auto' uses a real daemon if one is
+# reachable, and otherwise falls back to an in-process FakeClient.
+TEST_BACKEND = getenv('DOCKORM_TESTS_BACKEND', 'auto')
+
+_client = None
+
+
+def test_client():
+    """
+    The client shared by every container made by `make_container`.
+    """
+    global _client
+    if _client is None:
+        if TEST_BACKEND == 'fake':
+            _client = FakeClient()
+        elif TEST_BACKEND == 'docker':
+            _client = Client(version='auto', **kwargs_from_env())
+        else:
+            try:
+                _client = Client(version='auto', **kwargs_from_env())
+                _client.ping()
+            except Exception:
+                _client = FakeClient()
+    return _client
+
+
+def using_fake():
+    return isinstance(test_client(), FakeClient)
+
 
 def assert_in_logs(container, line):
     """
@@ -41,13 +73,15 @@ def dockerfile_root(path):
 
 
 def make_container(image, **kwargs):
-    return Container(
+    container = Container(
         image=image,
         build_path=dockerfile_root(image),
         organization=TEST_ORG,
         tag=TEST_TAG,
         **kwargs
     )
+    container.client = test_client()
+    return container
 
 
 def volume(path):
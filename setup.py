@@ -36,6 +36,7 @@ setup_args = dict(
     ],
     install_requires=[
         "docker>=2.0.0",
+        "futures>=3.0.0; python_version<'3'",
         "six>=1.8.0",
         "traitlets>=4.0.0",
     ],